@@ -1,11 +1,21 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 import io
+import os
+import hashlib
+import itertools
+import tempfile
 from datetime import datetime
-from fpdf import FPDF
-import base64
+
+from utils.charts import enrollment_histogram, pacing_curve, program_bars, chart_file
+from utils.data_processor import read_sheet, process_matriculados, process_leads, process_planificacion
+from utils.data_quality import profile_dataframe, quality_report
+from utils.calculations import calculate_metrics, project_results, analyze_programs
+from utils.budget_optimizer import optimize_brand_budget
+from utils.forecasting import convocatoria_end, forecast_pacing
+from utils.investment_index import build_investment_index
+from utils.report_cache import artifact_fingerprint, cached_artifact, cached_report, report_cache_stats
+from utils.report_generator import GENERADORES, report_filename, write_zip_bundle
 
 # Configuración de la página
 st.set_page_config(
@@ -93,7 +103,38 @@ if 'observaciones' not in st.session_state:
         'programas': "Los programas de Administración y Derecho muestran el mejor rendimiento."
     }
 
+# Clave del análisis de archivos cargados volcado al editor (None en edición manual)
+if 'analisis_aplicado' not in st.session_state:
+    st.session_state.analisis_aplicado = None
+    st.session_state.marca_aplicada = None
+
+# Bytes exportados en esta sesión, por huella de los datos
+if 'descargas' not in st.session_state:
+    st.session_state.descargas = {}
+
 # Funciones para exportación
+def _grafico_programas(df_programas):
+    """PNG de matrículas por programa con el color de la sección (en caché por datos y estilo)"""
+    return program_bars(
+        df_programas['programa'],
+        df_programas['matriculas'],
+        estilo={'color': st.session_state.colores_tema['programas']}
+    )
+
+def _clave_exportacion(formato):
+    """Huella de los datos de la sesión que aparecen en el reporte exportado"""
+    return artifact_fingerprint({
+        'formato': formato,
+        'fecha': datetime.now().strftime("%Y-%m-%d"),
+        'titulo': st.session_state.titulo_reporte,
+        'kpi': st.session_state.kpi_data,
+        'proyeccion': st.session_state.proyeccion_data,
+        'programas': st.session_state.programas_data,
+        'observaciones': st.session_state.observaciones,
+        'colores': st.session_state.colores_tema,
+        'datos': st.session_state.analisis_aplicado,
+    })
+
 def generate_excel():
     """Genera un reporte en formato Excel"""
     buffer = io.BytesIO()
@@ -165,12 +206,23 @@ def generate_excel():
         for col_num, value in enumerate(df_resumen.columns.values):
             worksheet.write(0, col_num, value, header_format)
     
+    # Hoja 4: reparto recomendado del presupuesto restante (solo con archivos cargados)
+    if st.session_state.get('optimizacion') is not None:
+        df_optimizacion = st.session_state.optimizacion['canales']
+        df_optimizacion.to_excel(writer, sheet_name='Optimización Presupuesto', index=False)
+        worksheet = writer.sheets['Optimización Presupuesto']
+        worksheet.set_column('A:B', 18)
+        worksheet.set_column('C:I', 16)
+        worksheet.write_row(0, 0, [str(c) for c in df_optimizacion.columns], header_format)
+    
     writer.close()
     buffer.seek(0)
     return buffer
 
 def generate_pdf():
     """Genera un reporte en formato PDF"""
+    from fpdf import FPDF
+
     class PDF(FPDF):
         def header(self):
             # Título del documento
@@ -294,6 +346,12 @@ def generate_pdf():
     
     pdf.ln(5)
     
+    # Gráfico de matrículas por programa (la misma imagen que se muestra en la app)
+    if not df_programas.empty:
+        grafico = _grafico_programas(df_programas)
+        pdf.image(chart_file(grafico), w=170, type='PNG')
+        pdf.ln(5)
+    
     # Observación
     pdf.set_font('Arial', 'B', 11)
     pdf.cell(0, 10, 'Insight Estratégico:', 0, 1)
@@ -310,9 +368,321 @@ def generate_pdf():
 st.title("Editor de Reportes Estratégicos")
 st.write("Crea, personaliza y exporta reportes estratégicos de marketing educativo")
 
+FORMATOS_EXPORTACION = {"Excel": 'excel', "PDF": 'pdf'}
+EXTENSIONES_EXPORTACION = {'excel': 'xlsx', 'pdf': 'pdf', 'zip': 'zip'}
+TIPOS_MIME = {
+    'excel': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'pdf': "application/pdf",
+    'zip': "application/zip",
+}
+
+def _bytes_formato(formato):
+    """Bytes de un formato desde la caché de disco (o generados si no están)"""
+    generador = {'excel': generate_excel, 'pdf': generate_pdf}[formato]
+    return cached_artifact(_clave_exportacion(formato), formato, generador).getvalue()
+
+def _archivo_zip():
+    """ZIP con todos los formatos del reporte, escrito en un archivo temporal
+
+    Cada formato se genera o lee al momento de agregarlo y el ZIP va directo
+    a disco, así que la memoria no crece con el número de marcas. Devuelve la
+    ruta del archivo.
+    """
+    nombre_base = f"reporte_{st.session_state.titulo_reporte.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}"
+    entradas = [
+        (f"{nombre_base}.{EXTENSIONES_EXPORTACION[formato]}", lambda formato=formato: _descarga(formato))
+        for formato in FORMATOS_EXPORTACION.values()
+    ]
+    if datos_cargados is not None and parametros_analisis is not None:
+        entradas = itertools.chain(entradas, _entradas_marcas(datos_cargados))
+    with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as destino:
+        write_zip_bundle(entradas, destino)
+    return destino.name
+
+def _entradas_marcas(datos):
+    """Reportes Excel, PDF y PPTX de cada marca de los archivos cargados, para el ZIP
+
+    Cada marca usa el análisis en caché con los parámetros actuales y el
+    reporte en caché de disco, así que solo se calcula lo que falta.
+    """
+    # El día va con el mismo formato que en el análisis de la barra lateral,
+    # así _analizar_marca reutiliza su caché; fecha solo nombra los archivos
+    dia = datetime.now().strftime('%Y-%m-%d')
+    fecha = datetime.now().strftime('%Y%m%d')
+    comentarios = "\n\n".join(st.session_state.observaciones.values())
+    for marca in datos['marcas']:
+        def generar(formato, marca=marca):
+            metrics, projections, program_analysis, optimizacion = _analizar_marca(
+                datos['huellas'], marca, parametros_analisis['objetivo'], parametros_analisis['simulaciones'],
+                parametros_analisis['metodo'], parametros_analisis['semilla'], dia, datos
+            )
+            # La hoja de optimización del presupuesto solo existe en el Excel
+            extra = {'optimizacion': optimizacion} if formato == 'excel' else {}
+            return cached_report(formato, metrics, projections, program_analysis, comentarios, marca, **extra)
+        for formato in GENERADORES:
+            yield (f"marcas/{marca.lower()}/{report_filename(marca, formato, fecha)}",
+                   lambda formato=formato, generar=generar: generar(formato))
+
+def _descarga(formato, generar=True):
+    """Exportación guardada en la sesión para los datos actuales
+
+    Bytes para Excel y PDF, y la ruta del archivo temporal para el ZIP. Solo
+    se generan al pedirlos (generar=True); con generar=False devuelve None si
+    todavía no se exportaron. Se conservan únicamente los de los datos
+    actuales, así la sesión no acumula versiones viejas.
+    """
+    clave = _clave_exportacion(formato)
+    descargas = st.session_state.descargas
+    if isinstance(descargas.get(clave), str) and not os.path.exists(descargas[clave]):
+        # El sistema limpió el archivo temporal del ZIP: hay que volver a generarlo
+        del descargas[clave]
+    if clave not in descargas and generar:
+        descargas[clave] = _archivo_zip() if formato == 'zip' else _bytes_formato(formato)
+        vigentes = {_clave_exportacion(f) for f in list(FORMATOS_EXPORTACION.values()) + ['zip']}
+        for vieja in [c for c in descargas if c not in vigentes]:
+            if isinstance(descargas[vieja], str) and os.path.exists(descargas[vieja]):
+                os.remove(descargas[vieja])
+            del descargas[vieja]
+    return descargas.get(clave)
+
+# Modo basado en datos: ingesta y cálculos en caché
+def _huella_archivo(archivo):
+    """SHA-256 del contenido de un archivo subido"""
+    return hashlib.sha256(archivo.getvalue()).hexdigest()
+
+@st.cache_resource(max_entries=4, show_spinner="Procesando archivos...")
+def _cargar_datos(huellas, nombres, _matriculados, _leads, _planificacion):
+    """Frames procesados de los archivos subidos, compartidos entre reruns y sesiones
+
+    La caché se indexa por `huellas` (hash del contenido de cada archivo) y
+    los nombres de archivo que se muestran en el informe de calidad;
+    los contenidos llevan prefijo _ para que Streamlit no los vuelva a hashear.
+    Los frames se comparten sin copiar: se tratan como de solo lectura. Antes
+    de procesar se perfila la calidad de cada archivo; si algún chequeo es
+    bloqueante se devuelve solo el informe de calidad (aceptado=False).
+    """
+    crudos_matriculados = [read_sheet(io.BytesIO(c), 'matriculados') for c in _matriculados]
+    crudos_leads = [read_sheet(io.BytesIO(c), 'leads_activos') for c in _leads]
+    df_plan_mensual, df_inversion, df_calendario = process_planificacion(io.BytesIO(_planificacion))
+
+    perfiles = (
+        [profile_dataframe(df, nombre) for nombre, df in zip(nombres[0], crudos_matriculados)]
+        + [profile_dataframe(df, nombre) for nombre, df in zip(nombres[1], crudos_leads)]
+        + [profile_dataframe(df_inversion, "Planificación: inversion_acumulada"),
+           profile_dataframe(df_calendario, "Planificación: calendario_convocatoria")]
+    )
+    calidad = {
+        'tabla': quality_report(perfiles),
+        'aceptado': all(perfil['aceptado'] for perfil in perfiles),
+        'motivos': [f"{perfil['fuente']}: {motivo}" for perfil in perfiles for motivo in perfil['motivos']],
+    }
+    if not calidad['aceptado']:
+        return {'huellas': huellas, 'calidad': calidad}
+
+    df_matriculados = pd.concat([process_matriculados(df) for df in crudos_matriculados], ignore_index=True)
+    df_leads = pd.concat([process_leads(df) for df in crudos_leads], ignore_index=True)
+    marcas = sorted(set(df_matriculados['Marca'].dropna().astype(str)) | set(df_leads['Marca'].dropna().astype(str)))
+    return {
+        'huellas': huellas,
+        'calidad': calidad,
+        'matriculados': df_matriculados,
+        'leads': df_leads,
+        'plan_mensual': df_plan_mensual,
+        'inversion': df_inversion,
+        'calendario': df_calendario,
+        'indice_inversion': build_investment_index(df_inversion),
+        'marcas': marcas,
+    }
+
+@st.cache_data(max_entries=32, show_spinner="Calculando métricas y proyecciones...")
+def _analizar_marca(huellas, marca, objetivo, simulaciones, metodo, semilla, dia, _datos):
+    """Métricas, proyecciones y análisis de programas de una marca
+
+    Se indexa por las huellas de los archivos, los parámetros y el día
+    (calculate_metrics usa la fecha actual); _datos es el resultado de
+    _cargar_datos para esas mismas huellas.
+    """
+    import numpy as np
+
+    # Generador propio de la llamada: los reruns de Streamlit corren en hilos y
+    # el generador global de numpy se compartiría entre sesiones
+    rng = np.random.default_rng(semilla)
+    # El filtrado crea frames nuevos: los compartidos no se modifican
+    df_matriculados = _datos['matriculados'][_datos['matriculados']['Marca'] == marca]
+    df_leads = _datos['leads'][_datos['leads']['Marca'] == marca]
+    metrics = calculate_metrics(df_matriculados, df_leads, _datos['calendario'], _datos['inversion'], marca,
+                                objetivo_matriculas=objetivo, indice_inversion=_datos['indice_inversion'])
+    plan_marca = _datos['plan_mensual'][_datos['plan_mensual']['Marca'] == marca]
+    pronostico = forecast_pacing(df_leads, plan_marca, _datos['calendario'],
+                                 indice_inversion=_datos['indice_inversion']).get(marca)
+    projections = project_results(metrics, _datos['inversion'], marca, num_simulations=simulaciones, metodo=metodo,
+                                  pronostico=pronostico, rng=rng)
+    program_analysis = analyze_programs(df_matriculados, df_leads, _datos['calendario'], ajustar_tasas=True,
+                                        metrics=metrics, pronostico=pronostico, seed=semilla)
+    optimizacion = optimize_brand_budget(_datos['plan_mensual'], marca, metrics, pronostico)
+    return metrics, projections, program_analysis, optimizacion
+
+def _serie_ritmo(datos, marca, objetivo):
+    """Matrículas acumuladas por día de la marca y el avance lineal hasta el objetivo
+
+    El plan va de 0 al inicio de la convocatoria al objetivo en su fecha de
+    fin; sin convocatoria en el calendario solo se devuelve la curva real.
+    """
+    import numpy as np
+
+    matriculas = datos['matriculados'][datos['matriculados']['Marca'] == marca]
+    columna = 'Fecha matrícula' if 'Fecha matrícula' in matriculas.columns else 'Fecha ingreso'
+    dias = np.sort(pd.to_datetime(matriculas[columna], errors='coerce').dropna().to_numpy(dtype='datetime64[D]'))
+    if len(dias) == 0:
+        return None
+
+    calendario = datos['calendario'][datos['calendario']['Marca'] == marca]
+    general = calendario[calendario['Programa'] == 'Todos los programas']
+    inicio = (general if not general.empty else calendario)['Fecha inicio'].min()
+    fin = convocatoria_end(datos['calendario'], marca)
+    con_plan = pd.notna(inicio) and fin is not None and fin > inicio
+    if con_plan:
+        desde = np.datetime64(pd.Timestamp(inicio), 'D')
+        hasta = max(np.datetime64(min(pd.Timestamp(fin), pd.Timestamp(datetime.now())), 'D'), dias[-1])
+    else:
+        desde, hasta = dias[0], dias[-1]
+
+    fechas = np.arange(desde, hasta + 1)
+    real = np.searchsorted(dias, fechas, side='right')
+    plan = None
+    if con_plan:
+        duracion = (np.datetime64(pd.Timestamp(fin), 'D') - desde).astype(float)
+        plan = objetivo * np.clip((fechas - desde).astype(float) / duracion, 0, 1)
+    return {'fechas': fechas, 'real': real, 'plan': plan}
+
+# Widgets del editor que se reinician al volcar un nuevo análisis
+WIDGETS_DATOS = ['mat_actual', 'mat_objetivo', 'leads_actual', 'leads_objetivo', 'proy_matriculas', 'proy_leads']
+
+def _aplicar_analisis(clave, marca, datos, metrics, projections, program_analysis, optimizacion):
+    """Volcar el análisis al editor solo cuando cambian los datos o los parámetros
+
+    Así los cambios de título, colores u observaciones (y las ediciones
+    manuales posteriores) se conservan entre reruns.
+    """
+    if st.session_state.analisis_aplicado == clave:
+        return
+
+    plan_marca = datos['plan_mensual'][datos['plan_mensual']['Marca'] == marca]
+    objetivo_leads = int(plan_marca['Leads estimados'].sum()) if 'Leads estimados' in plan_marca.columns else 0
+    st.session_state.kpi_data = {
+        'matriculas': {'actual': int(metrics['matriculas_acumuladas']), 'objetivo': max(int(metrics['objetivo_matriculas']), 1)},
+        'leads': {'actual': int(metrics['leads_acumulados']), 'objetivo': max(objetivo_leads, 1)},
+        # tiempo_transcurrido es None si la marca no tiene convocatoria en el calendario
+        'tiempo': {'valor': int(round(metrics['tiempo_transcurrido'] or 0))}
+    }
+    st.session_state.proyeccion_data = {
+        'matriculas': int(round(projections['matriculas_proyectadas_mean'])),
+        'leads': int(round(projections['leads_proyectados']))
+    }
+    tabla = program_analysis['tabla_completa']
+    st.session_state.programas_data = [
+        {'programa': programa, 'leads': int(leads), 'matriculas': int(matriculas), 'conversion': round(float(conversion), 1)}
+        for programa, leads, matriculas, conversion in zip(
+            tabla['Programa'], tabla['Leads'], tabla['Matrículas'], tabla['Tasa Conversión (%)']
+        )
+    ]
+    st.session_state.proyeccion_programas = program_analysis.get('proyeccion_programas')
+    # La simulación cubre las matrículas por venir: se suman las ya confirmadas
+    simulacion = projections.get('simulacion_matriculas')
+    st.session_state.simulacion_matriculas = None if simulacion is None else {
+        'totales': [metrics['matriculas_acumuladas'] + valor for valor in simulacion],
+        'objetivo': int(metrics['objetivo_matriculas']),
+    }
+    st.session_state.ritmo_matriculas = _serie_ritmo(datos, marca, metrics['objetivo_matriculas'])
+    st.session_state.optimizacion = optimizacion
+    if marca != st.session_state.marca_aplicada:
+        st.session_state.titulo_reporte = f"{marca} - REPORTE ESTRATÉGICO"
+        st.session_state.marca_aplicada = marca
+    for widget in WIDGETS_DATOS:
+        if widget in st.session_state:
+            del st.session_state[widget]
+    st.session_state.analisis_aplicado = clave
+
 # SIDEBAR - Configuración general
 st.sidebar.title("Configuración")
 
+# Fuente de datos: edición manual o archivos cargados
+st.sidebar.subheader("Fuente de Datos")
+fuente_datos = st.sidebar.radio("", ["Edición manual", "Archivos cargados"], key="fuente_datos")
+datos_cargados = None
+parametros_analisis = None
+
+if fuente_datos == "Archivos cargados":
+    archivos_matriculados = st.sidebar.file_uploader("Matriculados", type=['xlsx'], accept_multiple_files=True)
+    archivos_leads = st.sidebar.file_uploader("Leads activos", type=['xlsx'], accept_multiple_files=True)
+    archivo_planificacion = st.sidebar.file_uploader("Planificación", type=['xlsx'])
+
+    if archivos_matriculados and archivos_leads and archivo_planificacion:
+        try:
+            huellas = (
+                tuple(_huella_archivo(a) for a in archivos_matriculados),
+                tuple(_huella_archivo(a) for a in archivos_leads),
+                _huella_archivo(archivo_planificacion),
+            )
+            datos_cargados = _cargar_datos(
+                huellas,
+                (tuple(a.name for a in archivos_matriculados), tuple(a.name for a in archivos_leads)),
+                [a.getvalue() for a in archivos_matriculados],
+                [a.getvalue() for a in archivos_leads],
+                archivo_planificacion.getvalue()
+            )
+        except Exception as e:
+            st.sidebar.error(f"Error al procesar los archivos: {str(e)}")
+
+    if datos_cargados is not None:
+        calidad = datos_cargados['calidad']
+        with st.sidebar.expander("Calidad de los archivos", expanded=not calidad['aceptado']):
+            st.dataframe(calidad['tabla'][['Archivo', 'Chequeo', 'Filas Afectadas', 'Proporción (%)', 'Estado']],
+                         hide_index=True)
+        if not calidad['aceptado']:
+            # Un chequeo bloqueante detiene la carga: no se calcula nada con estos archivos
+            st.sidebar.error("Archivos rechazados por calidad:\n\n" + "\n\n".join(calidad['motivos']))
+            datos_cargados = None
+
+    if datos_cargados is not None and datos_cargados['marcas']:
+        marca = st.sidebar.selectbox("Marca", datos_cargados['marcas'], key="marca_datos")
+        parametros_analisis = {
+            'objetivo': st.sidebar.number_input("Objetivo de matrículas", min_value=1, value=100, key="objetivo_datos"),
+            'metodo': {"Monte Carlo": 'montecarlo', "Analítico": 'analitico'}[
+                st.sidebar.selectbox("Método de proyección", ["Monte Carlo", "Analítico"], key="metodo_datos")
+            ],
+            'simulaciones': st.sidebar.number_input("Simulaciones", min_value=1000, max_value=100000, value=10000,
+                                                    step=1000, key="simulaciones_datos"),
+            'semilla': 42,
+        }
+        try:
+            dia = datetime.now().strftime('%Y-%m-%d')
+            metrics, projections, program_analysis, optimizacion = _analizar_marca(
+                datos_cargados['huellas'], marca, parametros_analisis['objetivo'], parametros_analisis['simulaciones'],
+                parametros_analisis['metodo'], parametros_analisis['semilla'], dia, datos_cargados
+            )
+            _aplicar_analisis(
+                artifact_fingerprint({'huellas': datos_cargados['huellas'], 'marca': marca, 'dia': dia, **parametros_analisis}),
+                marca, datos_cargados, metrics, projections, program_analysis, optimizacion
+            )
+            st.sidebar.caption(
+                f"{marca}: {metrics['leads_acumulados']} leads, {metrics['matriculas_acumuladas']} matrículas, "
+                f"cumplimiento proyectado {projections['pct_cumplimiento_proyectado']:.1f}%"
+            )
+        except Exception as e:
+            st.sidebar.error(f"Error al calcular el reporte: {str(e)}")
+    elif datos_cargados is not None:
+        st.sidebar.warning("Los archivos no contienen marcas")
+    elif not (archivos_matriculados and archivos_leads and archivo_planificacion):
+        st.sidebar.info("Cargar matriculados, leads activos y planificación para calcular el reporte")
+else:
+    # Al volver a los archivos se vuelca de nuevo el análisis al editor
+    st.session_state.analisis_aplicado = None
+    # Los gráficos de simulación y ritmo solo existen con archivos cargados
+    st.session_state.simulacion_matriculas = None
+    st.session_state.ritmo_matriculas = None
+    st.session_state.optimizacion = None
+
 # Título del reporte
 st.sidebar.subheader("Título del Reporte")
 nuevo_titulo = st.sidebar.text_input("", st.session_state.titulo_reporte)
@@ -340,30 +710,10 @@ with col3:
     if nuevo_color3 != st.session_state.colores_tema['programas']:
         st.session_state.colores_tema['programas'] = nuevo_color3
 
-# Opciones de exportación
+# Opciones de exportación: el contenedor se reserva aquí y se llena al final
+# del script, cuando las pestañas ya aplicaron los cambios de esta ejecución
 st.sidebar.subheader("Exportar Reporte")
-formato_exportacion = st.sidebar.selectbox("Formato", ["Excel", "PDF"])
-
-if st.sidebar.button("Exportar Reporte"):
-    try:
-        if formato_exportacion == "Excel":
-            buffer = generate_excel()
-            # Crear link de descarga
-            b64 = base64.b64encode(buffer.read()).decode()
-            href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="reporte_{st.session_state.titulo_reporte.replace(" ", "_")}_{datetime.now().strftime("%Y%m%d")}.xlsx">Descargar Excel</a>'
-            st.sidebar.markdown(href, unsafe_allow_html=True)
-            st.sidebar.success("Excel generado correctamente")
-        
-        elif formato_exportacion == "PDF":
-            buffer = generate_pdf()
-            # Crear link de descarga
-            b64 = base64.b64encode(buffer.read()).decode()
-            href = f'<a href="data:application/pdf;base64,{b64}" download="reporte_{st.session_state.titulo_reporte.replace(" ", "_")}_{datetime.now().strftime("%Y%m%d")}.pdf">Descargar PDF</a>'
-            st.sidebar.markdown(href, unsafe_allow_html=True)
-            st.sidebar.success("PDF generado correctamente")
-
-    except Exception as e:
-        st.sidebar.error(f"Error al generar el reporte: {str(e)}")
+seccion_exportacion = st.sidebar.container()
 
 # CONTENIDO PRINCIPAL - Tres pestañas para las secciones
 tab1, tab2, tab3 = st.tabs(["ESTADO ACTUAL", "PROYECCIÓN", "PROGRAMAS"])
@@ -443,6 +793,13 @@ with tab1:
     
     # Mostrar estado
     st.write(f"**Estado:** {estado_actual}")
+
+    # Curva de matrículas acumuladas frente al avance lineal del objetivo
+    ritmo = st.session_state.get('ritmo_matriculas')
+    if ritmo is not None:
+        st.image(pacing_curve(ritmo['fechas'], ritmo['real'], ritmo['plan'],
+                              estilo={'color': st.session_state.colores_tema['estado_actual']}),
+                 use_column_width=True)
     
     # Observación estratégica (editable)
     st.subheader("Observación estratégica")
@@ -513,6 +870,27 @@ with tab2:
     
     df_proyeccion = pd.DataFrame(data)
     st.table(df_proyeccion)
+
+    # Distribución de las matrículas simuladas hasta el cierre
+    simulacion = st.session_state.get('simulacion_matriculas')
+    if simulacion is not None:
+        st.subheader("Distribución de la Proyección")
+        st.image(enrollment_histogram(simulacion['totales'], objetivo=simulacion['objetivo'],
+                                      estilo={'color': st.session_state.colores_tema['proyeccion']}),
+                 use_column_width=True)
+
+    # Reparto por canal de la inversión que queda según el pronóstico
+    optimizacion = st.session_state.get('optimizacion')
+    if optimizacion is not None and not optimizacion['resumen'].empty:
+        st.subheader("Optimización del Presupuesto Restante")
+        resumen = optimizacion['resumen'].iloc[0]
+        if resumen['Presupuesto'] > 0:
+            st.caption(f"Presupuesto restante: {resumen['Presupuesto']:,.0f} · matrículas esperadas "
+                       f"{resumen['Matrículas Plan']:.1f} con el reparto del plan y {resumen['Matrículas Recomendadas']:.1f} "
+                       f"con el recomendado ({resumen['Estado']})")
+            st.dataframe(optimizacion['canales'].drop(columns='Marca'), hide_index=True, use_container_width=True)
+        else:
+            st.info("El pronóstico no deja inversión pendiente para repartir entre canales")
     
     # Observación (editable)
     st.subheader("Observación")
@@ -565,8 +943,65 @@ with tab3:
         menor_conversion = programas_con_leads.sort_values('conversion', ascending=True).head(5)
         st.dataframe(menor_conversion)
     
+    # Proyección por programa del análisis de datos (inversión restante del pronóstico)
+    if st.session_state.get('proyeccion_programas') is not None:
+        st.subheader("Matrículas proyectadas por programa")
+        st.dataframe(st.session_state.proyeccion_programas, hide_index=True, use_container_width=True)
+    
+    # Gráfico de matrículas por programa
+    programas_validos = edited_df.dropna(subset=['programa', 'matriculas'])
+    if not programas_validos.empty:
+        st.image(_grafico_programas(programas_validos), use_column_width=True)
+    
     # Observación estratégica (editable)
     st.subheader("Insight estratégico")
     nueva_observacion = st.text_area("", st.session_state.observaciones['programas'], key="obs_programas")
     if nueva_observacion != st.session_state.observaciones['programas']:
         st.session_state.observaciones['programas'] = nueva_observacion
+
+# EXPORTACIÓN (barra lateral)
+with seccion_exportacion:
+    formato_exportacion = st.selectbox("Formato", list(FORMATOS_EXPORTACION))
+    formato = FORMATOS_EXPORTACION[formato_exportacion]
+    nombre_base = f"reporte_{st.session_state.titulo_reporte.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}"
+
+    if st.button("Exportar Reporte"):
+        try:
+            _descarga(formato)
+            st.success(f"{formato_exportacion} generado correctamente")
+        except Exception as e:
+            st.error(f"Error al generar el reporte: {str(e)}")
+
+    # El botón de descarga aparece mientras los datos no cambien desde la exportación
+    contenido = _descarga(formato, generar=False)
+    if contenido is not None:
+        st.download_button(
+            f"Descargar {formato_exportacion}",
+            data=contenido,
+            file_name=f"{nombre_base}.{EXTENSIONES_EXPORTACION[formato]}",
+            mime=TIPOS_MIME[formato],
+            key=f"descargar_{formato}",
+        )
+
+    if st.button("Exportar todo (ZIP)"):
+        try:
+            _descarga('zip')
+        except Exception as e:
+            st.error(f"Error al generar el ZIP: {str(e)}")
+    ruta_zip = _descarga('zip', generar=False)
+    if ruta_zip is not None:
+        with open(ruta_zip, 'rb') as archivo_zip:
+            st.download_button(
+                "Descargar ZIP",
+                data=archivo_zip,
+                file_name=f"{nombre_base}.zip",
+                mime=TIPOS_MIME['zip'],
+                key="descargar_zip",
+            )
+
+    estadisticas_cache = report_cache_stats()
+    st.caption(
+        f"Caché de reportes: {estadisticas_cache['aciertos']} aciertos, {estadisticas_cache['fallos']} fallos "
+        f"({estadisticas_cache['tasa_aciertos']}%) · {estadisticas_cache['archivos']} archivos, "
+        f"{estadisticas_cache['bytes'] / 1024 / 1024:.1f} MB"
+    )
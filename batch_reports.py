@@ -0,0 +1,249 @@
+# batch_reports.py
+"""Generación de reportes por lote para todas las marcas, sin Streamlit
+
+Uso:
+    python batch_reports.py --entrada sample_data --salida reportes
+
+En la carpeta de entrada se espera la misma estructura de sample_data:
+matriculados_<marca>.xlsx, leads_activos_<marca>.xlsx y planificacion.xlsx
+(o bien matriculados.xlsx / leads_activos.xlsx con todas las marcas).
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# Los nombres y extensiones de archivo vienen de utils.report_generator (report_filename)
+FORMATOS = ('excel', 'pdf', 'pptx')
+ARCHIVO_ESTADO = '.estado_lote.json'
+
+def _archivo_marca(entrada, prefijo, marca):
+    """Archivo propio de la marca o, si no existe, el archivo común con todas las marcas"""
+    propio = os.path.join(entrada, f'{prefijo}_{marca.lower()}.xlsx')
+    if os.path.exists(propio):
+        return propio
+    comun = os.path.join(entrada, f'{prefijo}.xlsx')
+    return comun if os.path.exists(comun) else None
+
+def discover_brands(entrada):
+    """Marcas con archivo de matriculados en la carpeta de entrada"""
+    marcas = set()
+    for ruta in glob.glob(os.path.join(entrada, 'matriculados_*.xlsx')):
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        marcas.add(nombre[len('matriculados_'):].upper())
+    return sorted(marcas)
+
+def _huella(rutas, parametros):
+    """Hash de los archivos de entrada y de los parámetros que afectan al resultado"""
+    h = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode('utf-8'))
+    for ruta in rutas:
+        h.update(os.path.basename(ruta).encode('utf-8'))
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+    return h.hexdigest()
+
+def _leer_estado(salida):
+    ruta = os.path.join(salida, ARCHIVO_ESTADO)
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _guardar_estado(salida, estado):
+    ruta = os.path.join(salida, ARCHIVO_ESTADO)
+    with open(f'{ruta}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=1, sort_keys=True)
+    os.replace(f'{ruta}.tmp', ruta)
+
+def process_brand(marca, rutas, salida, formatos, seed=None, num_simulaciones=10000,
+                  objetivo_matriculas=100, comentarios=''):
+    """Cargar, calcular y escribir los reportes de una marca (se ejecuta en un proceso del pool)"""
+    # Importaciones dentro del proceso: el proceso principal no necesita pandas ni los generadores
+    from utils.data_processor import read_sheet, process_matriculados, process_leads, process_planificacion
+    from utils.data_quality import profile_dataframe, quality_report
+    from utils.calculations import calculate_metrics, project_results, analyze_programs
+    from utils.budget_optimizer import optimize_brand_budget
+    from utils.forecasting import forecast_pacing
+    from utils.investment_index import build_investment_index
+    from utils.report_generator import export_reports, report_filename
+    import numpy as np
+
+    inicio = time.perf_counter()
+    tiempos = {}
+    rng = np.random.default_rng(seed)
+
+    crudo_matriculados = read_sheet(rutas['matriculados'], 'matriculados')
+    crudo_leads = read_sheet(rutas['leads'], 'leads_activos')
+    df_plan_mensual, df_inversion, df_calendario = process_planificacion(rutas['planificacion'])
+    tiempos['carga'] = time.perf_counter() - inicio
+
+    # Calidad de los archivos antes de calcular; un chequeo bloqueante omite la marca.
+    # La marca solo se exige en los archivos propios (los comunes traen todas las marcas).
+    t = time.perf_counter()
+    def marca_esperada(ruta):
+        return marca if os.path.basename(ruta).lower().endswith(f'_{marca.lower()}.xlsx') else None
+    perfiles = [
+        profile_dataframe(crudo_matriculados, os.path.basename(rutas['matriculados']),
+                          marca=marca_esperada(rutas['matriculados'])),
+        profile_dataframe(crudo_leads, os.path.basename(rutas['leads']), marca=marca_esperada(rutas['leads'])),
+        profile_dataframe(df_inversion, 'planificacion: inversion_acumulada'),
+        profile_dataframe(df_calendario, 'planificacion: calendario_convocatoria'),
+    ]
+    calidad = quality_report(perfiles).to_dict('records')
+    tiempos['calidad'] = time.perf_counter() - t
+    motivos = [f"{perfil['fuente']}: {motivo}" for perfil in perfiles for motivo in perfil['motivos']]
+    if motivos:
+        return {
+            'marca': marca,
+            'estado': 'rechazado',
+            'motivos': motivos,
+            'calidad': calidad,
+            'tiempos': {k: round(v, 3) for k, v in tiempos.items()},
+            'total': round(time.perf_counter() - inicio, 3),
+        }
+
+    df_matriculados = process_matriculados(crudo_matriculados)
+    df_leads = process_leads(crudo_leads)
+    df_matriculados = df_matriculados[df_matriculados['Marca'] == marca]
+    df_leads = df_leads[df_leads['Marca'] == marca]
+
+    t = time.perf_counter()
+    indice_inversion = build_investment_index(df_inversion)
+    metrics = calculate_metrics(df_matriculados, df_leads, df_calendario, df_inversion, marca,
+                                objetivo_matriculas=objetivo_matriculas, indice_inversion=indice_inversion)
+    pronostico = forecast_pacing(df_leads, df_plan_mensual[df_plan_mensual['Marca'] == marca], df_calendario,
+                                 indice_inversion=indice_inversion).get(marca)
+    projections = project_results(metrics, df_inversion, marca, num_simulations=num_simulaciones,
+                                  pronostico=pronostico, rng=rng)
+    program_analysis = analyze_programs(df_matriculados, df_leads, df_calendario, ajustar_tasas=True,
+                                        metrics=metrics, pronostico=pronostico, seed=seed)
+    optimizacion = optimize_brand_budget(df_plan_mensual, marca, metrics, pronostico) if 'excel' in formatos else None
+    tiempos['calculo'] = time.perf_counter() - t
+
+    # Las marcas ya se reparten entre los procesos del lote: dentro de cada
+    # proceso los formatos se generan en serie en lugar de abrir otro pool
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        exportacion = export_reports(metrics, projections, program_analysis, comentarios, marca,
+                                     formatos=formatos, executor=executor, optimizacion=optimizacion)
+    tiempos.update(exportacion['tiempos'])
+
+    t = time.perf_counter()
+    archivos = {}
+    for formato, buffer in exportacion['buffers'].items():
+        ruta = os.path.join(salida, report_filename(marca, formato))
+        with open(ruta, 'wb') as f:
+            f.write(buffer.getbuffer())
+        archivos[formato] = ruta
+    tiempos['escritura'] = time.perf_counter() - t
+
+    return {
+        'marca': marca,
+        'estado': 'generado',
+        'archivos': archivos,
+        'tiempos': {k: round(v, 3) for k, v in tiempos.items()},
+        'total': round(time.perf_counter() - inicio, 3),
+        'leads': int(metrics['leads_acumulados']),
+        'matriculas': int(metrics['matriculas_acumuladas']),
+        'cumplimiento_proyectado': round(float(projections['pct_cumplimiento_proyectado']), 1),
+        'calidad': calidad,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Genera los reportes Excel, PDF y PPTX de todas las marcas.')
+    parser.add_argument('--entrada', default='sample_data', help='Carpeta con los archivos de entrada')
+    parser.add_argument('--salida', default='reportes', help='Carpeta donde se escriben los reportes')
+    parser.add_argument('--marcas', nargs='*', help='Marcas a procesar (por defecto todas las encontradas)')
+    parser.add_argument('--formatos', nargs='*', default=list(FORMATOS), choices=list(FORMATOS),
+                        help='Formatos a generar')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos en paralelo (por defecto, núcleos)')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla de la simulación Monte Carlo')
+    parser.add_argument('--simulaciones', type=int, default=10000, help='Número de simulaciones por marca')
+    parser.add_argument('--objetivo', type=int, default=100, help='Objetivo de matrículas por marca')
+    parser.add_argument('--comentarios', default='', help='Comentarios a incluir en los reportes')
+    parser.add_argument('--solo-cambios', action='store_true',
+                        help='Omitir marcas cuyos archivos y parámetros no cambiaron desde la última ejecución')
+    parser.add_argument('--resumen', default=None, help='Ruta del resumen JSON (por defecto <salida>/resumen.json)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    inicio = time.perf_counter()
+    os.makedirs(args.salida, exist_ok=True)
+
+    marcas = [m.upper() for m in args.marcas] if args.marcas else discover_brands(args.entrada)
+    planificacion = os.path.join(args.entrada, 'planificacion.xlsx')
+    estado = _leer_estado(args.salida)
+    parametros = {'formatos': sorted(args.formatos), 'seed': args.seed, 'simulaciones': args.simulaciones,
+                  'objetivo': args.objetivo, 'comentarios': args.comentarios}
+
+    resultados = []
+    trabajos = {}
+    for marca in marcas:
+        rutas = {
+            'matriculados': _archivo_marca(args.entrada, 'matriculados', marca),
+            'leads': _archivo_marca(args.entrada, 'leads_activos', marca),
+            'planificacion': planificacion if os.path.exists(planificacion) else None,
+        }
+        faltantes = [k for k, v in rutas.items() if v is None]
+        if faltantes:
+            resultados.append({'marca': marca, 'estado': 'error', 'error': f'Faltan archivos: {faltantes}'})
+            continue
+
+        huella = _huella(sorted(rutas.values()), parametros)
+        previo = estado.get(marca, {})
+        if (args.solo_cambios and previo.get('huella') == huella
+                and all(os.path.exists(r) for r in previo.get('archivos', {}).values())):
+            resultados.append({'marca': marca, 'estado': 'sin cambios', 'archivos': previo['archivos']})
+            continue
+        trabajos[marca] = (rutas, huella)
+
+    if trabajos:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futuros = {
+                executor.submit(process_brand, marca, rutas, args.salida, args.formatos, args.seed,
+                                args.simulaciones, args.objetivo, args.comentarios): marca
+                for marca, (rutas, _) in trabajos.items()
+            }
+            for futuro in as_completed(futuros):
+                marca = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    resultado = {'marca': marca, 'estado': 'error', 'error': str(e)}
+                if resultado['estado'] == 'generado':
+                    estado[marca] = {'huella': trabajos[marca][1], 'archivos': resultado['archivos'],
+                                     'fecha': datetime.now().isoformat(timespec='seconds')}
+                resultados.append(resultado)
+                print(f"{marca}: {resultado['estado']}" + (f" ({resultado['total']} s)" if 'total' in resultado else ''))
+                for motivo in resultado.get('motivos', []):
+                    print(f"  {motivo}")
+
+    _guardar_estado(args.salida, estado)
+
+    resumen = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entrada': os.path.abspath(args.entrada),
+        'salida': os.path.abspath(args.salida),
+        'parametros': parametros,
+        'duracion': round(time.perf_counter() - inicio, 3),
+        'marcas': sorted(resultados, key=lambda r: r['marca']),
+    }
+    ruta_resumen = args.resumen or os.path.join(args.salida, 'resumen.json')
+    with open(ruta_resumen, 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    print(f"Resumen escrito en {ruta_resumen}")
+
+    return 1 if any(r['estado'] in ('error', 'rechazado') for r in resultados) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# import_benchmark.py
+"""Tiempo de importación de los módulos de la app y del CLI por lote
+
+Uso:
+    python import_benchmark.py            # todos los módulos con su presupuesto
+    python import_benchmark.py --repeticiones 5 utils.calculations
+
+Cada módulo se importa en un intérprete nuevo con `python -X importtime`; se
+toma la mediana del tiempo acumulado del módulo y se compara con su
+presupuesto en milisegundos. La app de Streamlit (`app`) no se puede importar
+sin ejecutarla: se miden las importaciones de nivel superior de app.py con un
+módulo streamlit vacío en su lugar, es decir, lo que la app agrega al
+arranque de Streamlit. Además se verifica que la importación no cargue
+bibliotecas pesadas que solo deben cargarse al generar un documento o un
+gráfico (fpdf, python-pptx, matplotlib, scipy.stats, Faker). Sale con código
+1 si algún módulo supera su presupuesto o carga una biblioteca prohibida.
+"""
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+# Presupuesto en ms por módulo (mediana del tiempo acumulado en frío)
+PRESUPUESTOS = {
+    'app': 500,
+    'batch_reports': 100,
+    'utils.charts': 250,
+    'utils.report_cache': 500,
+    'utils.data_processor': 500,
+    'utils.calculations': 500,
+    'utils.report_generator': 500,
+    'utils.data_generator': 500,
+    'utils.budget_optimizer': 500,
+}
+
+# Scripts que ejecutan la interfaz al importarse: se miden solo sus importaciones
+SCRIPTS = {'app': 'app.py'}
+
+# Bibliotecas que ningún módulo debe cargar al importarse
+PROHIBIDOS = ['fpdf', 'pptx', 'matplotlib', 'scipy.stats', 'faker', 'xlsxwriter']
+
+def _importaciones_script(ruta):
+    """Sentencias import de nivel superior del script, precedidas de un streamlit vacío"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        arbol = ast.parse(f.read(), filename=ruta)
+    importaciones = [ast.unparse(nodo) for nodo in arbol.body if isinstance(nodo, (ast.Import, ast.ImportFrom))]
+    return "\n".join(["import sys, types", "sys.modules['streamlit'] = types.ModuleType('streamlit')"] + importaciones)
+
+def medir_importacion(modulo, python=sys.executable):
+    """Tiempo acumulado (ms) de `modulo` y conjunto de módulos cargados en un intérprete nuevo
+
+    Para los scripts de SCRIPTS el tiempo es la suma de las importaciones de
+    nivel superior que hace el script.
+    """
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    codigo = (_importaciones_script(os.path.join(directorio, SCRIPTS[modulo])) if modulo in SCRIPTS
+              else f'import {modulo}')
+    salida = subprocess.run(
+        [python, '-X', 'importtime', '-c', codigo],
+        cwd=directorio,
+        capture_output=True, text=True, check=True
+    ).stderr
+
+    # Formato de cada línea: "import time: <propio> | <acumulado> | <indentación><módulo>"
+    acumulado = None
+    nivel_superior = 0.0
+    cargados = set()
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        partes = linea[len('import time:'):].split('|')
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        nombre = partes[2].strip()
+        cargados.add(nombre)
+        if nombre == modulo:
+            acumulado = int(partes[1]) / 1000
+        if len(partes[2]) - len(partes[2].lstrip()) == 1:
+            nivel_superior += int(partes[1]) / 1000
+    if modulo in SCRIPTS:
+        acumulado = nivel_superior
+    if acumulado is None:
+        raise RuntimeError(f"No se encontró {modulo} en la salida de -X importtime")
+    return acumulado, cargados
+
+def evaluar(modulos, repeticiones=3):
+    """Mediana de tiempo, presupuesto y bibliotecas prohibidas cargadas por módulo"""
+    resultados = []
+    for modulo in modulos:
+        tiempos = []
+        cargados = set()
+        for _ in range(repeticiones):
+            tiempo, cargados = medir_importacion(modulo)
+            tiempos.append(tiempo)
+        mediana = statistics.median(tiempos)
+        presupuesto = PRESUPUESTOS.get(modulo)
+        prohibidos = sorted(p for p in PROHIBIDOS if p in cargados)
+        resultados.append({
+            'modulo': modulo,
+            'ms': round(mediana, 1),
+            'presupuesto': presupuesto,
+            'prohibidos': prohibidos,
+            'ok': (presupuesto is None or mediana <= presupuesto) and not prohibidos,
+        })
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mide el tiempo de importación en frío con python -X importtime.')
+    parser.add_argument('modulos', nargs='*', help='Módulos a medir (por defecto los de PRESUPUESTOS)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Importaciones por módulo (se usa la mediana)')
+    args = parser.parse_args(argv)
+
+    resultados = evaluar(args.modulos or list(PRESUPUESTOS), args.repeticiones)
+    for r in resultados:
+        presupuesto = f"{r['presupuesto']} ms" if r['presupuesto'] is not None else '-'
+        extra = f"  carga: {', '.join(r['prohibidos'])}" if r['prohibidos'] else ''
+        print(f"{'OK   ' if r['ok'] else 'FALLA'} {r['modulo']:<26} {r['ms']:>8.1f} ms  (presupuesto {presupuesto}){extra}")
+
+    return 0 if all(r['ok'] for r in resultados) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# pptx_benchmark.py
+"""Comparación de las dos presentaciones PPTX sobre los datos de ejemplo
+
+Uso:
+    python pptx_benchmark.py                          # GRADO en sample_data, 7 repeticiones
+    python pptx_benchmark.py --marca UNISUD --repeticiones 15
+
+Calcula el reporte de la marca una sola vez (con semilla fija) y genera la
+presentación con formas (generate_pptx, la usada por la app y el lote) y la
+de gráficos nativos (graficos_nativos=True). Para cada una informa la mediana
+del tiempo de generación, el tamaño del archivo y la cantidad de formas.
+"""
+
+import argparse
+import glob
+import io
+import os
+import statistics
+import sys
+import time
+
+def cargar_reporte(entrada, marca, semilla=42, num_simulaciones=10000, objetivo_matriculas=100):
+    """Argumentos de los generadores (metrics, projections, program_analysis, comentarios, marca)"""
+    import numpy as np
+    import pandas as pd
+    from utils.data_processor import process_matriculados, process_leads, process_planificacion
+    from utils.calculations import calculate_metrics, project_results, analyze_programs
+    from utils.forecasting import forecast_pacing
+
+    df_matriculados = pd.concat([process_matriculados(r) for r in sorted(glob.glob(os.path.join(entrada, 'matriculados*.xlsx')))],
+                                ignore_index=True)
+    df_leads = pd.concat([process_leads(r) for r in sorted(glob.glob(os.path.join(entrada, 'leads_activos*.xlsx')))],
+                         ignore_index=True)
+    df_plan_mensual, df_inversion, df_calendario = process_planificacion(os.path.join(entrada, 'planificacion.xlsx'))
+    df_matriculados = df_matriculados[df_matriculados['Marca'] == marca]
+    df_leads = df_leads[df_leads['Marca'] == marca]
+
+    metrics = calculate_metrics(df_matriculados, df_leads, df_calendario, df_inversion, marca,
+                                objetivo_matriculas=objetivo_matriculas)
+    pronostico = forecast_pacing(df_leads, df_plan_mensual[df_plan_mensual['Marca'] == marca], df_calendario,
+                                 df_inversion=df_inversion).get(marca)
+    projections = project_results(metrics, df_inversion, marca, num_simulations=num_simulaciones,
+                                  pronostico=pronostico, rng=np.random.default_rng(semilla))
+    program_analysis = analyze_programs(df_matriculados, df_leads, df_calendario, seed=semilla)
+    return metrics, projections, program_analysis, "Comparación de presentaciones", marca
+
+def comparar(argumentos, repeticiones=7):
+    """Mediana de tiempo (ms), tamaño (KB) y formas de cada variante de la presentación"""
+    from pptx import Presentation
+    from utils.report_generator import generate_pptx
+
+    resultados = []
+    for nombre, opciones in [('formas', {}), ('nativos', {'graficos_nativos': True})]:
+        # La primera generación carga python-pptx, matplotlib y la plantilla: no se mide
+        contenido = generate_pptx(*argumentos, **opciones).getvalue()
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            generate_pptx(*argumentos, **opciones)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        presentacion = Presentation(io.BytesIO(contenido))
+        resultados.append({
+            'variante': nombre,
+            'ms': round(statistics.median(tiempos), 1),
+            'kb': round(len(contenido) / 1024, 1),
+            'formas': sum(len(slide.shapes) for slide in presentacion.slides),
+            'diapositivas': len(presentacion.slides),
+        })
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compara la presentación con formas y la de gráficos nativos.')
+    parser.add_argument('--entrada', default='sample_data', help='Carpeta con la estructura de sample_data')
+    parser.add_argument('--marca', default='GRADO')
+    parser.add_argument('--repeticiones', type=int, default=7, help='Generaciones por variante (se usa la mediana)')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de la simulación del reporte')
+    args = parser.parse_args(argv)
+
+    argumentos = cargar_reporte(args.entrada, args.marca, semilla=args.seed)
+    for r in comparar(argumentos, args.repeticiones):
+        print(f"{r['variante']:<8} {r['ms']:>8.1f} ms  {r['kb']:>7.1f} KB  "
+              f"{r['formas']:>4} formas  {r['diapositivas']} diapositivas")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Los módulos se importan como en la app: utils.<módulo> desde la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+# tests/test_backtest.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.backtest import backtest_projections
+
+INICIO = pd.Timestamp('2025-03-01')
+FIN = pd.Timestamp('2025-04-29')
+
+def _datos(gasto_final):
+    """Convocatoria cerrada de 60 días; el gasto diario cambia en la segunda mitad"""
+    fechas = pd.date_range(INICIO, FIN, freq='D')
+    gasto = np.where(np.arange(len(fechas)) < 30, 50.0, gasto_final)
+    df_inversion = pd.DataFrame({'Fecha': fechas, 'Marca': 'TEST', 'Canal': 'Google',
+                                 'Inversión acumulada': np.cumsum(gasto)})
+    df_leads = pd.DataFrame({'ID lead': [f'L{i}' for i in range(len(fechas) * 4)],
+                             'Fecha ingreso': np.repeat(fechas, 4), 'Marca': 'TEST', 'Programa': 'Derecho'})
+    df_matriculados = pd.DataFrame({'ID lead': [f'L{i}' for i in range(0, len(fechas) * 4, 10)],
+                                    'Fecha ingreso': np.repeat(fechas, 4)[::10],
+                                    'Fecha matrícula': np.repeat(fechas, 4)[::10], 'Marca': 'TEST',
+                                    'Programa': 'Derecho'})
+    df_calendario = pd.DataFrame({'Marca': ['TEST'], 'Programa': ['Todos los programas'],
+                                  'Fecha inicio': [INICIO], 'Fecha fin': [FIN]})
+    df_plan = pd.DataFrame({'Marca': ['TEST'], 'Canal': ['Google'], 'Presupuesto total mes': [3000.0]})
+    return df_matriculados, df_leads, df_calendario, df_inversion, df_plan
+
+def _proyeccion_dia(gasto_final, dia=20):
+    df_matriculados, df_leads, df_calendario, df_inversion, df_plan = _datos(gasto_final)
+    resultado = backtest_projections(df_matriculados, df_leads, df_calendario, 'TEST', df_inversion=df_inversion,
+                                     df_plan_mensual=df_plan, fecha_corte='2025-06-01')
+    detalle = resultado['detalle']
+    return detalle.loc[detalle['Día'] == dia, ['Proyección P5', 'Proyección P50', 'Proyección P95']].iloc[0]
+
+def test_la_proyeccion_no_usa_el_gasto_futuro():
+    # El gasto posterior al día 20 no puede cambiar la proyección hecha ese día
+    pd.testing.assert_series_equal(_proyeccion_dia(gasto_final=10.0), _proyeccion_dia(gasto_final=200.0))
+
+def test_sin_presupuesto_conocido_falla():
+    df_matriculados, df_leads, df_calendario, df_inversion, _ = _datos(50.0)
+    with pytest.raises(ValueError):
+        backtest_projections(df_matriculados, df_leads, df_calendario, 'TEST', df_inversion=df_inversion,
+                             fecha_corte='2025-06-01')
@@ -0,0 +1,35 @@
+# tests/test_budget_optimizer.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.budget_optimizer import optimize_brand_budget
+
+PLAN = pd.DataFrame({
+    'Marca': ['GRADO', 'GRADO', 'POSGRADO'],
+    'Canal': ['Google', 'Facebook', 'Google'],
+    'Presupuesto total mes': [30000.0, 30000.0, 10000.0],
+    'CPL estimado': [20.0, 10.0, 15.0],
+})
+METRICS = {'tasa_conversion': 8.0}
+
+def test_reparte_la_inversion_restante_del_pronostico():
+    resultado = optimize_brand_budget(PLAN, 'GRADO', METRICS, {'inversion_restante': 6000.0})
+    canales = resultado['canales'].set_index('Canal')
+    resumen = resultado['resumen'].iloc[0]
+
+    # El presupuesto es lo que queda según el pronóstico, no el total del plan
+    assert resumen['Presupuesto'] == 6000.0
+    assert canales['Inversión Recomendada'].sum() == pytest.approx(6000.0)
+    # Facebook (CPL 10) recibe el máximo de su cota (150% de su parte del plan)
+    assert canales.loc['Facebook', 'Inversión Recomendada'] == pytest.approx(4500.0)
+    # Las matrículas usan la tasa de la marca
+    assert canales.loc['Facebook', 'Matrículas Recomendadas'] == pytest.approx(450 * 0.08, abs=0.05)
+    assert not canales[['Matrículas Plan', 'Matrículas Recomendadas']].isna().any().any()
+    assert resumen['Matrículas Recomendadas'] > resumen['Matrículas Plan']
+
+def test_sin_pronostico_no_hay_inversion_que_repartir():
+    resumen = optimize_brand_budget(PLAN, 'GRADO', METRICS)['resumen'].iloc[0]
+    assert resumen['Presupuesto'] == 0.0
+    assert resumen['Matrículas Recomendadas'] == 0.0
@@ -0,0 +1,65 @@
+# tests/test_conversion_model.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.calculations import analyze_programs
+from utils.conversion_model import estimate_program_conversion, fit_beta_prior, project_program_results
+
+METRICS = {'tasa_conversion': 10.0, 'cpl_promedio': 12.5, 'inversion_acumulada': 1500.0}
+
+def _estimacion():
+    tabla = pd.DataFrame({
+        'Programa': ['A', 'B', 'C'],
+        'Leads': [300, 150, 50],
+        'Matrículas': [30, 30, 2],
+        'Tasa Conversión (%)': [10.0, 20.0, 4.0],
+    })
+    return estimate_program_conversion(tabla)
+
+def test_prior_recupera_la_concentracion_con_programas_desiguales():
+    # 10 programas grandes y 290 chicos con tasas de una Beta(2, 18) (concentración 20)
+    concentraciones = []
+    for seed in range(10):
+        rng = np.random.default_rng(seed)
+        leads = np.concatenate([np.full(10, 3000), rng.integers(3, 31, 290)])
+        matriculas = rng.binomial(leads, rng.beta(2, 18, len(leads)))
+        alpha, beta, _ = fit_beta_prior(leads, matriculas)
+        concentraciones.append(float(alpha[0] + beta[0]))
+
+    # Antes el ruido binomial sobreestimado llevaba al pooling total (~36000)
+    assert 12 < np.median(concentraciones) < 35
+    assert max(concentraciones) < 100
+
+def test_proyeccion_usa_la_inversion_restante_del_pronostico():
+    estimacion = _estimacion()
+    pronostico = {'inversion_restante': 2000.0, 'leads_pronosticados': 250}
+    proyeccion = project_program_results(METRICS, estimacion, pronostico, num_simulations=20000, seed=7)
+
+    # Los leads pronosticados se reparten por participación y se convierten con la tasa posterior
+    tabla = estimacion['tabla'].set_index('Programa')
+    esperado = 250 * tabla['Leads'] / tabla['Leads'].sum() * tabla['alpha'] / (tabla['alpha'] + tabla['beta'])
+    obtenido = proyeccion.set_index('Programa')['Matrículas Proyectadas']
+    for programa in esperado.index:
+        assert obtenido[programa] == pytest.approx(esperado[programa], rel=0.03, abs=0.2), programa
+    assert (proyeccion['Matrículas P5'] <= proyeccion['Matrículas Proyectadas']).all()
+    assert (proyeccion['Matrículas Proyectadas'] <= proyeccion['Matrículas P95']).all()
+
+def test_sin_pronostico_no_hay_inversion_que_proyectar():
+    proyeccion = project_program_results(METRICS, _estimacion(), seed=7)
+    assert (proyeccion['Matrículas Proyectadas'] == 0).all()
+
+def test_analyze_programs_incluye_la_proyeccion_con_metricas():
+    df_leads = pd.DataFrame({'Programa': ['A'] * 40 + ['B'] * 20})
+    df_matriculados = pd.DataFrame({'Programa': ['A'] * 4 + ['B'] * 3})
+    pronostico = {'inversion_restante': 600.0, 'leads_pronosticados': 60}
+
+    sin_metricas = analyze_programs(df_matriculados, df_leads, pd.DataFrame())
+    con_metricas = analyze_programs(df_matriculados, df_leads, pd.DataFrame(), metrics=METRICS,
+                                    pronostico=pronostico, seed=7)
+
+    assert 'proyeccion_programas' not in sin_metricas
+    proyeccion = con_metricas['proyeccion_programas']
+    assert set(proyeccion['Programa']) == {'A', 'B'}
+    assert proyeccion['Matrículas Proyectadas'].sum() > 0
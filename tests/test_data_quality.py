@@ -0,0 +1,43 @@
+# tests/test_data_quality.py
+
+import pandas as pd
+
+from utils.data_processor import process_matriculados
+from utils.data_quality import profile_dataframe, quality_report
+
+def _matriculados(filas=20, ids_vacios=0):
+    ids = [None] * ids_vacios + [f'L{i}' for i in range(filas - ids_vacios)]
+    return pd.DataFrame({
+        'ID lead': ids,
+        'Fecha ingreso': pd.Timestamp('2025-03-01'),
+        'Fecha matrícula': pd.Timestamp('2025-03-20'),
+        'Marca': 'GRADO',
+        'Programa': 'Derecho',
+    })
+
+def test_archivo_limpio_se_acepta_y_se_procesa_sin_releer():
+    crudo = _matriculados()
+    perfil = profile_dataframe(crudo, 'matriculados.xlsx', marca='GRADO', fecha_corte='2025-06-01')
+    assert perfil['aceptado']
+    # process_matriculados acepta el DataFrame ya perfilado y no lo modifica
+    procesado = process_matriculados(crudo)
+    assert len(procesado) == len(crudo)
+    assert crudo['Programa'].tolist() == ['Derecho'] * len(crudo)
+
+def test_ids_vacios_sobre_el_umbral_bloquean():
+    perfil = profile_dataframe(_matriculados(ids_vacios=5), 'matriculados.xlsx', fecha_corte='2025-06-01')
+    assert not perfil['aceptado']
+    assert any(motivo.startswith('ID vacío') for motivo in perfil['motivos'])
+
+    tabla = quality_report([perfil])
+    fila = tabla[tabla['Chequeo'] == 'ID vacío'].iloc[0]
+    assert fila['Archivo'] == 'matriculados.xlsx'
+    assert fila['Estado'] == 'Rechazo'
+    assert fila['Filas de Ejemplo'] == '2, 3, 4, 5, 6'
+
+def test_duplicados_entre_id_numerico_y_texto():
+    crudo = _matriculados(filas=4)
+    crudo['ID lead'] = pd.Series([101.0, '101', 102, None], dtype=object)
+    perfil = profile_dataframe(crudo, 'matriculados.xlsx', fecha_corte='2025-06-01')
+    fila = quality_report([perfil]).set_index('Chequeo').loc['ID duplicado']
+    assert fila['Filas Afectadas'] == 1
@@ -0,0 +1,79 @@
+# tests/test_forecasting.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.calculations import remaining_investment, project_results
+from utils.forecasting import forecast_pacing
+
+CORTE = pd.Timestamp('2025-05-31')
+
+def _datos_marca(presupuesto=5000.0, gasto_diario=50.0, dias_historia=30, fin='2025-08-30'):
+    """Marca con gasto y leads constantes desde hace `dias_historia` días y convocatoria hasta `fin`"""
+    fechas = pd.date_range(end=CORTE, periods=dias_historia, freq='D')
+    df_inversion = pd.DataFrame({
+        'Fecha': fechas,
+        'Marca': 'TEST',
+        'Canal': 'Google',
+        'Inversión acumulada': gasto_diario * np.arange(1, dias_historia + 1),
+    })
+    df_leads = pd.DataFrame({
+        'ID lead': [f'L{i}' for i in range(dias_historia * 4)],
+        'Fecha ingreso': np.repeat(fechas, 4),
+        'Marca': 'TEST',
+        'Programa': 'Derecho',
+    })
+    df_plan = pd.DataFrame({'Marca': ['TEST'], 'Canal': ['Google'], 'Presupuesto total mes': [presupuesto]})
+    df_calendario = pd.DataFrame({
+        'Marca': ['TEST'], 'Programa': ['Todos los programas'],
+        'Fecha inicio': [pd.Timestamp('2025-03-01')], 'Fecha fin': [pd.Timestamp(fin)],
+    })
+    return df_leads, df_plan, df_calendario, df_inversion
+
+def _metrics(inversion_acumulada):
+    return {
+        'tasa_conversion': 10.0,
+        'cpl_promedio': 12.5,
+        'inversion_acumulada': inversion_acumulada,
+        'matriculas_acumuladas': 20,
+        'objetivo_matriculas': 100,
+    }
+
+def test_inversion_restante_sale_del_plan():
+    df_leads, df_plan, df_calendario, df_inversion = _datos_marca(presupuesto=5000.0)
+    pronostico = forecast_pacing(df_leads, df_plan, df_calendario, df_inversion, fecha_corte=CORTE)['TEST']
+
+    # Presupuesto 5000 - 1500 invertidos; el ritmo (50/día por 91 días) alcanza a gastarlo
+    assert pronostico['inversion_acumulada'] == pytest.approx(1500.0)
+    assert remaining_investment(pronostico) == pytest.approx(3500.0)
+    # Ya no se usa el presupuesto fijo de 10000
+    assert remaining_investment(pronostico) != pytest.approx(10000 - 1500.0)
+
+def test_inversion_restante_limitada_por_el_ritmo():
+    df_leads, df_plan, df_calendario, df_inversion = _datos_marca(presupuesto=50000.0, fin='2025-06-10')
+    pronostico = forecast_pacing(df_leads, df_plan, df_calendario, df_inversion, fecha_corte=CORTE)['TEST']
+
+    # 10 días restantes a ~50/día: el gasto pronosticado limita la inversión restante
+    assert pronostico['dias_restantes'] == 10
+    assert remaining_investment(pronostico) == pytest.approx(500.0, rel=0.05)
+
+def test_sin_pronostico_no_hay_inversion_pendiente():
+    assert remaining_investment(None) == 0.0
+    proyeccion = project_results(_metrics(1500.0), None, 'TEST', metodo='analitico')
+    assert proyeccion['leads_proyectados'] == 0
+    assert proyeccion['matriculas_proyectadas_mean'] == 0
+
+@pytest.mark.parametrize('metodo', ['montecarlo', 'analitico'])
+def test_leads_proyectados_siguen_el_pronostico(metodo):
+    df_leads, df_plan, df_calendario, df_inversion = _datos_marca(presupuesto=5000.0)
+    pronostico = forecast_pacing(df_leads, df_plan, df_calendario, df_inversion, fecha_corte=CORTE)['TEST']
+
+    np.random.seed(0)
+    proyeccion = project_results(_metrics(1500.0), df_inversion, 'TEST', num_simulations=5000, metodo=metodo,
+                                 pronostico=pronostico)
+    # 4 leads/día a 50/día (CPL 12.5) durante 91 días serían 364 leads, pero el
+    # presupuesto solo alcanza para 3500 de los 4550 pronosticados: 3500 / 12.5 = 280
+    assert pronostico['inversion_pronosticada'] == pytest.approx(4550, rel=0.05)
+    assert pronostico['leads_pronosticados'] == pytest.approx(280, rel=0.05)
+    assert proyeccion['leads_proyectados'] == pytest.approx(pronostico['leads_pronosticados'], rel=0.05)
@@ -0,0 +1,52 @@
+# tests/test_funnel.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.funnel import expected_enrollments_by_stage, stage_transition_matrix, stage_weights
+
+# Etapas de leads_activos en sample_data, fuera de ETAPAS_EMBUDO
+ETAPAS = ['Contactado', 'En proceso', 'Postulante']
+# Por foto: Contactado avanza 40% y sale 10%; En proceso avanza 30% y sale 20%; Postulante se matricula 50% y sale 10%
+DESTINOS = {
+    'Contactado': (['Contactado', 'En proceso', 'Salida'], [0.5, 0.4, 0.1]),
+    'En proceso': (['En proceso', 'Postulante', 'Salida'], [0.5, 0.3, 0.2]),
+    'Postulante': (['Postulante', 'Matriculado', 'Salida'], [0.4, 0.5, 0.1]),
+}
+
+def _fotos(num_fotos=6, leads_por_etapa=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    foto = pd.DataFrame({'ID lead': [f'L{i}' for i in range(leads_por_etapa * 3)],
+                         'Estado actual': np.repeat(ETAPAS, leads_por_etapa)})
+    fotos = [foto]
+    for _ in range(num_fotos - 1):
+        estados = foto['Estado actual'].to_numpy(dtype=object).copy()
+        for etapa, (destinos, probabilidades) in DESTINOS.items():
+            en_etapa = estados == etapa
+            estados[en_etapa] = rng.choice(destinos, en_etapa.sum(), p=probabilidades)
+        foto = foto.assign(**{'Estado actual': estados})
+        foto = foto[foto['Estado actual'] != 'Salida'].reset_index(drop=True)
+        fotos.append(foto)
+    return fotos
+
+def test_pesos_estimados_de_las_transiciones():
+    fotos = _fotos()
+    pesos = stage_weights([stage_transition_matrix(a, b) for a, b in zip(fotos[:-1], fotos[1:])])
+
+    # Probabilidad de absorción en 'Matriculado' de la cadena que generó las fotos
+    postulante = 0.5 / 0.6
+    en_proceso = 0.3 / 0.5 * postulante
+    contactado = 0.4 / 0.5 * en_proceso
+    assert set(pesos) == set(ETAPAS)
+    assert pesos['Postulante'] == pytest.approx(postulante, abs=0.03)
+    assert pesos['En proceso'] == pytest.approx(en_proceso, abs=0.03)
+    assert pesos['Contactado'] == pytest.approx(contactado, abs=0.03)
+
+def test_matriculas_esperadas_requieren_pesos_para_cada_etapa():
+    leads = pd.DataFrame({'Marca': 'GRADO', 'Programa': 'Derecho', 'Estado actual': ETAPAS * 10})
+    with pytest.raises(ValueError, match='Contactado'):
+        expected_enrollments_by_stage(leads, {'Postulante': 0.8, 'En proceso': 0.5})
+
+    esperadas = expected_enrollments_by_stage(leads, {'Postulante': 0.8, 'En proceso': 0.5, 'Contactado': 0.2})
+    assert esperadas['Matrículas Esperadas'].iloc[0] == pytest.approx(15.0)
@@ -0,0 +1,18 @@
+# tests/test_id_index.py
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import pack_lead_ids
+from utils.id_index import build_id_index, enrolled_in_leads
+
+def test_ids_numericos_con_vacios_cruzan_con_los_enteros():
+    # Una columna con un vacío se lee como float (101.0) y debe coincidir con 101 y '101'
+    assert (pack_lead_ids(pd.Series([101, 102, 103]))[:2] == pack_lead_ids(pd.Series([101, 102, None]))[:2]).all()
+    assert (pack_lead_ids(pd.Series([101.0, '102'], dtype=object)) == pack_lead_ids(pd.Series(['101', '102']))).all()
+    assert pack_lead_ids(pd.Series([101.5]))[0] != pack_lead_ids(pd.Series([101]))[0]
+
+    df_matriculados = pd.DataFrame({'ID lead': [101, 102, 103]})
+    df_leads = pd.DataFrame({'ID lead': [101, 102, None]})
+    indice = build_id_index(df_matriculados, df_leads)
+    assert enrolled_in_leads(indice).tolist() == [True, True, False]
@@ -0,0 +1,55 @@
+# tests/test_program_names.py
+
+import json
+
+import pandas as pd
+import pytest
+
+from utils.program_names import build_program_index, canonicalize_program_names, match_program_name
+
+CATALOGO = ['Administración De Empresas', 'Derecho', 'Diploma En Marketing Digital', 'Doctorado En Ciencias',
+            'Especialización En Recursos Humanos', 'Ingeniería Civil', 'Ingeniería Industrial',
+            'Maestría En Derecho Corporativo', 'Maestría En Finanzas', 'Mba Ejecutivo', 'Medicina', 'Psicología']
+
+@pytest.fixture(scope='module')
+def indice():
+    return build_program_index(CATALOGO)
+
+@pytest.mark.parametrize('nombre', [
+    'Ingenieria Ambiental',
+    'Doctorado en Derecho',
+    'Medicina Veterinaria',
+    'Derecho Penal',
+    'Psicologia Clinica',
+    'Mtria. en Adm. de Empresas',
+])
+def test_no_une_programas_distintos(indice, nombre):
+    assert match_program_name(nombre, indice) is None
+
+@pytest.mark.parametrize('nombre, esperado', [
+    ('Admin. de Empresas', 'Administración De Empresas'),
+    ('Ingenieria Civl', 'Ingeniería Civil'),
+    ('Ing Industrial', 'Ingeniería Industrial'),
+    ('Mtria Finanzas', 'Maestría En Finanzas'),
+    ('Maestría en Derecho Corporat.', 'Maestría En Derecho Corporativo'),
+    ('Diplomado Marketing Digital', 'Diploma En Marketing Digital'),
+    ('Esp. RRHH', 'Especialización En Recursos Humanos'),
+    ('MBA Ejec', 'Mba Ejecutivo'),
+])
+def test_resuelve_variantes_del_mismo_programa(indice, nombre, esperado):
+    assert match_program_name(nombre, indice) == esperado
+
+def test_cache_guarda_los_no_resueltos_y_se_invalida_con_otras_reglas(indice, tmp_path):
+    ruta = tmp_path / 'programas.json'
+    programas = pd.Series(['Derecho Penal', 'Ingenieria Civl'])
+
+    resultado = canonicalize_program_names(programas, indice, str(ruta))
+    assert resultado.tolist() == ['Derecho Penal', 'Ingeniería Civil']
+    assert json.loads(ruta.read_text(encoding='utf-8'))['mapeo']['Derecho Penal'] is None
+
+    # Una caché escrita con reglas anteriores no se reutiliza
+    datos = json.loads(ruta.read_text(encoding='utf-8'))
+    datos['criterio'] = 'v1|0.5|0'
+    datos['mapeo']['Derecho Penal'] = 'Derecho'
+    ruta.write_text(json.dumps(datos), encoding='utf-8')
+    assert canonicalize_program_names(programas, indice, str(ruta)).tolist() == ['Derecho Penal', 'Ingeniería Civil']
@@ -0,0 +1,74 @@
+# tests/test_projections.py
+
+import numpy as np
+import pytest
+
+from utils.calculations import project_results
+
+CLAVES_PERCENTIL = ['matriculas_proyectadas_min', 'matriculas_proyectadas_q1', 'matriculas_proyectadas_median',
+                    'matriculas_proyectadas_q3', 'matriculas_proyectadas_max']
+CLAVES_PROBABILIDAD = ['prob_meta_80', 'prob_meta_90', 'prob_meta_100', 'prob_meta_110', 'prob_meta_120']
+
+def _metrics(tasa_conversion, objetivo):
+    return {
+        'tasa_conversion': tasa_conversion,
+        'cpl_promedio': 12.5,
+        'inversion_acumulada': 1500.0,
+        'matriculas_acumuladas': 20,
+        'objetivo_matriculas': objetivo,
+    }
+
+def _proyecciones(metrics, inversion_restante):
+    """Monte Carlo con semilla fija y la versión analítica con los mismos supuestos"""
+    pronostico = {'inversion_restante': inversion_restante, 'leads_pronosticados': 0}
+    montecarlo = project_results(metrics, None, 'TEST', num_simulations=20000, metodo='montecarlo', pronostico=pronostico,
+                                 rng=np.random.default_rng(1234))
+    analitico = project_results(metrics, None, 'TEST', metodo='analitico', pronostico=pronostico)
+    return montecarlo, analitico
+
+@pytest.mark.parametrize('caso, tasa, objetivo, inversion_restante', [
+    ('marca normal', 10.0, 48, 3500.0),
+    ('tasa cero', 0.0, 22, 3500.0),
+    ('tasa 100%', 100.0, 297, 3500.0),
+    ('sin tiempo restante', 10.0, 48, 0.0),
+])
+def test_analitico_coincide_con_montecarlo(caso, tasa, objetivo, inversion_restante):
+    montecarlo, analitico = _proyecciones(_metrics(tasa, objetivo), inversion_restante)
+
+    assert analitico['leads_proyectados'] == pytest.approx(montecarlo['leads_proyectados'], rel=0.02, abs=1)
+    assert analitico['matriculas_proyectadas_mean'] == pytest.approx(montecarlo['matriculas_proyectadas_mean'],
+                                                                     rel=0.03, abs=1)
+    assert analitico['matriculas_proyectadas_std'] == pytest.approx(montecarlo['matriculas_proyectadas_std'],
+                                                                    rel=0.05, abs=0.5)
+    for clave in CLAVES_PERCENTIL:
+        assert analitico[clave] == pytest.approx(montecarlo[clave], rel=0.05, abs=1), clave
+    # Probabilidades de alcanzar el objetivo en puntos porcentuales
+    for clave in CLAVES_PROBABILIDAD:
+        assert analitico[clave] == pytest.approx(montecarlo[clave], abs=3.0), clave
+    assert analitico['pct_cumplimiento_proyectado'] == pytest.approx(montecarlo['pct_cumplimiento_proyectado'],
+                                                                     rel=0.02, abs=0.5)
+
+def test_objetivo_cerca_de_la_mediana():
+    # Con el objetivo en la mediana la probabilidad no es trivial (ni 0 ni 100)
+    montecarlo, analitico = _proyecciones(_metrics(10.0, 48), 3500.0)
+    assert 20 < montecarlo['prob_meta_100'] < 80
+    assert analitico['prob_meta_100'] == pytest.approx(montecarlo['prob_meta_100'], abs=3.0)
+
+def test_sin_tiempo_restante_solo_cuenta_lo_acumulado():
+    montecarlo, analitico = _proyecciones(_metrics(10.0, 40), 0.0)
+    for proyeccion in (montecarlo, analitico):
+        assert proyeccion['matriculas_proyectadas_mean'] == 0
+        assert proyeccion['pct_cumplimiento_proyectado'] == pytest.approx(50.0)
+        assert proyeccion['prob_meta_100'] == 0
+
+def test_generador_propio_no_depende_del_estado_global():
+    metrics = _metrics(10.0, 48)
+    pronostico = {'inversion_restante': 3500.0, 'leads_pronosticados': 0}
+
+    def simular():
+        # Otra sesión mueve el generador global entre llamadas
+        np.random.seed(np.random.randint(1000))
+        return project_results(metrics, None, 'TEST', num_simulations=2000, pronostico=pronostico,
+                               rng=np.random.default_rng(7))['simulacion_matriculas']
+
+    assert simular() == simular()
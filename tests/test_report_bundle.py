@@ -0,0 +1,41 @@
+# tests/test_report_bundle.py
+
+import io
+import zipfile
+
+from utils.report_generator import write_zip_bundle
+
+def test_zip_en_archivo_temporal_con_entradas_perezosas():
+    pedidas = []
+
+    def generar(nombre, contenido):
+        def _generar():
+            pedidas.append(nombre)
+            return contenido
+        return _generar
+
+    def entradas():
+        yield 'a/reporte.xlsx', io.BytesIO(b'x' * 5000)
+        yield 'a/reporte.pdf', generar('pdf', b'%PDF' + b'0' * 5000)
+        # Se pide recién cuando el ZIP llega a esta entrada
+        assert pedidas == ['pdf']
+        yield 'b/reporte.pptx', generar('pptx', io.BytesIO(b'p' * 100))
+
+    destino = write_zip_bundle(entradas())
+
+    # Por defecto el ZIP va a un archivo temporal, no a memoria
+    assert not isinstance(destino, io.BytesIO)
+    assert destino.tell() == 0
+    with zipfile.ZipFile(destino) as archivo_zip:
+        assert archivo_zip.testzip() is None
+        assert archivo_zip.read('a/reporte.xlsx') == b'x' * 5000
+        assert archivo_zip.read('b/reporte.pptx') == b'p' * 100
+        assert archivo_zip.getinfo('a/reporte.xlsx').compress_type == zipfile.ZIP_STORED
+        assert archivo_zip.getinfo('a/reporte.pdf').compress_type == zipfile.ZIP_DEFLATED
+    destino.close()
+
+def test_zip_en_ruta(tmp_path):
+    ruta = tmp_path / 'reportes.zip'
+    assert write_zip_bundle([('r.pdf', b'pdf')], str(ruta)) == str(ruta)
+    with zipfile.ZipFile(ruta) as archivo_zip:
+        assert archivo_zip.namelist() == ['r.pdf']
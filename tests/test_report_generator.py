@@ -0,0 +1,81 @@
+# tests/test_report_generator.py
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pptx = pytest.importorskip('pptx')
+
+from utils.report_generator import GENERADORES, generate_pptx
+
+def _reporte(marca='GRADO'):
+    metrics = {
+        'tiempo_transcurrido': 60.0,
+        'leads_acumulados': 400,
+        'matriculas_acumuladas': 40,
+        'objetivo_matriculas': 100,
+        'tasa_conversion': 10.0,
+        'pct_matriculas_nuevos': 55.0,
+        'pct_matriculas_remarketing': 45.0,
+        'inversion_acumulada': 5000.0,
+        'cpl_promedio': 12.5,
+    }
+    rng = np.random.default_rng(0)
+    simulacion = rng.normal(50, 8, 2000)
+    projections = {
+        'leads_proyectados': 500, 'leads_proyectados_std': 40.0,
+        'matriculas_proyectadas_min': 37, 'matriculas_proyectadas_max': 63,
+        'matriculas_proyectadas_mean': 50, 'matriculas_proyectadas_std': 8.0,
+        'pct_cumplimiento_proyectado': 90.0,
+        'prob_meta_80': 95.0, 'prob_meta_90': 60.0, 'prob_meta_100': 30.0, 'prob_meta_110': 10.0, 'prob_meta_120': 2.0,
+        'simulacion_matriculas': simulacion.tolist(),
+    }
+    tabla = pd.DataFrame({
+        'Programa': ['Derecho', 'Medicina', 'Psicología'],
+        'Leads': [200, 120, 80],
+        'Matrículas': [25, 10, 5],
+        'Tasa Conversión (%)': [12.5, 8.3, 6.25],
+    })
+    program_analysis = {'tabla_completa': tabla, 'top_matriculas': tabla, 'menor_conversion': tabla.iloc[::-1]}
+    return metrics, projections, program_analysis, "Comentario de prueba", marca
+
+def _presentacion(buffer):
+    return pptx.Presentation(io.BytesIO(buffer.getvalue()))
+
+def _titulos(presentacion):
+    return [slide.shapes.title.text for slide in presentacion.slides if slide.shapes.title is not None]
+
+def test_pptx_registrado_es_el_de_formas():
+    assert GENERADORES['pptx'] is generate_pptx
+    presentacion = _presentacion(generate_pptx(*_reporte()))
+    formas = [forma for slide in presentacion.slides for forma in slide.shapes]
+
+    # Por defecto las barras son formas y el histograma va junto a la estimación de cierre
+    assert not any(forma.has_chart for forma in formas)
+    assert any(forma.shape_type == 13 for forma in formas)  # MSO_SHAPE_TYPE.PICTURE
+    assert "Distribución de Matrículas Proyectadas" not in _titulos(presentacion)
+
+def test_pptx_con_graficos_nativos_e_histograma():
+    presentacion = _presentacion(generate_pptx(*_reporte(), graficos_nativos=True))
+    formas = [forma for slide in presentacion.slides for forma in slide.shapes]
+    titulos = _titulos(presentacion)
+
+    # Avance, composición y probabilidades como gráficos de python-pptx
+    assert sum(forma.has_chart for forma in formas) == 3
+    # Histograma de la simulación como imagen
+    assert "Distribución de Matrículas Proyectadas" in titulos
+    assert any(forma.shape_type == 13 for forma in formas)  # MSO_SHAPE_TYPE.PICTURE
+    assert "Comentarios" in titulos
+
+def test_pptx_ambas_variantes_tienen_las_mismas_secciones():
+    formas = _titulos(_presentacion(generate_pptx(*_reporte())))
+    nativos = _titulos(_presentacion(generate_pptx(*_reporte(), graficos_nativos=True)))
+    assert [t for t in nativos if t != "Distribución de Matrículas Proyectadas"] == formas
+
+def test_pptx_sin_simulacion_omite_el_histograma():
+    metrics, projections, program_analysis, comentarios, marca = _reporte()
+    projections = {**projections, 'simulacion_matriculas': []}
+    buffer = generate_pptx(metrics, projections, program_analysis, comentarios, marca, graficos_nativos=True)
+    assert "Distribución de Matrículas Proyectadas" not in _titulos(_presentacion(buffer))
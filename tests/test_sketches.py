@@ -0,0 +1,78 @@
+# tests/test_sketches.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.sketches import build_lead_sketches, load_sketches, merge_sketches, save_sketches, unique_leads
+
+CORTE = '2025-12-31'
+
+def _leads(n, num_ids, num_dias, programas, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'ID lead': rng.integers(1, num_ids, n).astype(str),
+        'Fecha ingreso': pd.Timestamp('2025-06-01') + pd.to_timedelta(rng.integers(0, num_dias, n), unit='D'),
+        'Marca': rng.choice(['A', 'B'], n),
+        'Programa': rng.choice(programas, n),
+    })
+
+def _bloques(df, tamano):
+    return [df.iloc[i:i + tamano] for i in range(0, len(df), tamano)]
+
+def _exactos(df):
+    return df.groupby(['Marca', 'Programa'])['ID lead'].nunique()
+
+def test_filas_con_pocos_leads_quedan_dispersas():
+    df = _leads(20000, 10 ** 9, 120, [f'P{i}' for i in range(20)])
+    sketches = build_lead_sketches(_bloques(df, 3000))
+
+    # ~4 leads por (Marca, Programa, día): ninguna fila pasa a la matriz densa
+    assert (sketches['densas'] < 0).all()
+    assert sketches['registros'].shape[0] == 0
+
+    estimados = unique_leads(sketches, dias=365, fecha_corte=CORTE).set_index(['Marca', 'Programa'])['Leads Únicos']
+    exactos = _exactos(df)
+    assert np.abs(estimados[exactos.index] / exactos - 1).max() < 0.1
+
+def test_filas_llenas_pasan_a_densas():
+    df = _leads(60000, 10 ** 9, 5, ['P1'])
+    sketches = build_lead_sketches(_bloques(df, 4000))
+
+    assert (sketches['densas'] >= 0).all()
+    assert len(sketches['dispersos']) == 0
+    estimados = unique_leads(sketches, dias=365, fecha_corte=CORTE).set_index(['Marca', 'Programa'])['Leads Únicos']
+    exactos = _exactos(df)
+    assert np.abs(estimados[exactos.index] / exactos - 1).max() < 0.05
+
+def test_bloques_union_y_guardado_dan_el_mismo_resultado(tmp_path):
+    # Mezcla de filas dispersas (muchos programas) y densas (P0 concentra leads)
+    df = pd.concat([_leads(30000, 10 ** 9, 60, [f'P{i}' for i in range(30)]),
+                    _leads(30000, 10 ** 9, 3, ['P0'], seed=1)], ignore_index=True)
+    referencia = unique_leads(build_lead_sketches([df]), dias=365, fecha_corte=CORTE)
+
+    por_bloques = build_lead_sketches(_bloques(df, 2500))
+    unidos = merge_sketches(build_lead_sketches([df.iloc[:25000]]), build_lead_sketches([df.iloc[25000:]]))
+    ruta = tmp_path / 'sketches.npz'
+    save_sketches(por_bloques, ruta)
+
+    for sketches in (por_bloques, unidos, load_sketches(ruta)):
+        pd.testing.assert_frame_equal(unique_leads(sketches, dias=365, fecha_corte=CORTE), referencia)
+
+def test_lee_archivos_con_registros_densos(tmp_path):
+    df = _leads(5000, 10 ** 9, 10, ['P1', 'P2'])
+    sketches = build_lead_sketches([df])
+    referencia = unique_leads(sketches, dias=365, fecha_corte=CORTE)
+
+    # Formato anterior: una fila densa por clave y sin registros dispersos
+    densos = np.zeros((len(sketches['claves']), 2 ** sketches['precision']), dtype=np.uint8)
+    filas = sketches['dispersos'] >> sketches['precision']
+    densos[filas, sketches['dispersos'] & (2 ** sketches['precision'] - 1)] = sketches['rangos']
+    ruta = tmp_path / 'anterior.npz'
+    np.savez_compressed(ruta, precision=np.int64(sketches['precision']),
+                        marca=sketches['claves']['Marca'].to_numpy(dtype=str),
+                        programa=sketches['claves']['Programa'].to_numpy(dtype=str),
+                        dia=sketches['claves']['Día'].to_numpy(dtype=np.int64),
+                        registros=densos, count_min=sketches['count_min'])
+
+    pd.testing.assert_frame_equal(unique_leads(load_sketches(ruta), dias=365, fecha_corte=CORTE), referencia)
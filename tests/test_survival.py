@@ -0,0 +1,45 @@
+# tests/test_survival.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.survival import expected_conversions_open_leads
+
+CORTE = pd.Timestamp('2025-06-30')
+RIESGO = 0.01
+
+def _datos(edad_abiertos, num_abiertos=50, num_matriculas=20000, seed=3):
+    """Matrículas con riesgo diario constante y leads abiertos de una misma edad"""
+    rng = np.random.default_rng(seed)
+    lags = rng.geometric(RIESGO, size=num_matriculas) - 1
+    ingreso = CORTE - pd.to_timedelta(lags + 1000, unit='D')
+    df_matriculados = pd.DataFrame({
+        'ID lead': np.arange(num_matriculas),
+        'Marca': 'TEST',
+        'Fecha ingreso': ingreso,
+        'Fecha matrícula': ingreso + pd.to_timedelta(lags, unit='D'),
+    })
+    df_leads = pd.DataFrame({
+        'ID lead': np.arange(num_matriculas, num_matriculas + num_abiertos),
+        'Marca': 'TEST',
+        'Estado actual': 'En proceso',
+        'Fecha ingreso': CORTE - pd.Timedelta(days=edad_abiertos),
+    })
+    return df_matriculados, df_leads
+
+@pytest.mark.parametrize('max_dias, edad', [(None, 500), (365, 500), (365, 2000)])
+def test_leads_mas_antiguos_que_la_curva_siguen_convirtiendo(max_dias, edad):
+    df_matriculados, df_leads = _datos(edad_abiertos=edad)
+    resultado = expected_conversions_open_leads(df_matriculados, df_leads, CORTE + pd.Timedelta(days=30),
+                                                fecha_corte=CORTE, max_dias=max_dias)
+
+    # Con riesgo constante la probabilidad restante no depende de la edad
+    esperado = 50 * (1 - (1 - RIESGO) ** 30)
+    assert resultado['matriculas_esperadas'] == pytest.approx(esperado, rel=0.1)
+
+def test_leads_dentro_de_la_curva():
+    df_matriculados, df_leads = _datos(edad_abiertos=10)
+    resultado = expected_conversions_open_leads(df_matriculados, df_leads, CORTE + pd.Timedelta(days=30),
+                                                fecha_corte=CORTE, max_dias=365)
+    assert resultado['matriculas_esperadas'] == pytest.approx(50 * (1 - (1 - RIESGO) ** 30), rel=0.1)
@@ -0,0 +1,150 @@
+# utils/backtest.py
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from utils.calculations import analytic_distribution
+from utils.forecasting import budget_from_plan
+from utils.investment_index import build_investment_index
+
+def _conteo_diario(fechas, dia_inicio, num_dias, pesos=None):
+    """Contar registros por día relativo al inicio de la ventana (fuera de rango se descarta)"""
+    dias = pd.to_datetime(fechas, errors='coerce').to_numpy(dtype='datetime64[D]')
+    relativo = dias.astype(np.int64) - dia_inicio
+    validos = ~np.isnat(dias) & (relativo >= 0) & (relativo < num_dias)
+    w = None if pesos is None else np.asarray(pesos, dtype=float)[validos]
+    return np.bincount(relativo[validos], weights=w, minlength=num_dias)[:num_dias]
+
+def backtest_projections(df_matriculados, df_leads, df_calendario, marca, df_inversion=None,
+                         indice_inversion=None, df_plan_mensual=None, presupuesto_total=None, fecha_corte=None):
+    """Re-ejecutar la proyección para cada día de las convocatorias cerradas
+
+    Para cada día D de cada ventana ya finalizada se usan solo los datos hasta
+    D: los acumulados de leads, matrículas e inversión salen de sumas
+    acumuladas diarias (sin volver a filtrar DataFrames) y todas las
+    proyecciones de la ventana se evalúan juntas con el modo analítico.
+    Se compara la proyección con las matrículas finales reales.
+
+    El presupuesto es el conocido de antemano: presupuesto_total o, si no se
+    entrega, el del plan de la marca (df_plan_mensual). No se usa la inversión
+    real final de la ventana, que en el día D todavía no se conoce. En las
+    cohortes por programa se reparte según la participación en leads a D.
+    """
+    result = {}
+
+    if presupuesto_total is None:
+        presupuesto_total = float(budget_from_plan(df_plan_mensual).get(marca, 0.0))
+        if presupuesto_total <= 0:
+            raise ValueError(f"Sin presupuesto para {marca}: entregue presupuesto_total o df_plan_mensual")
+
+    if fecha_corte is None:
+        fecha_corte = datetime.now()
+    if indice_inversion is None:
+        indice_inversion = build_investment_index(df_inversion)
+
+    columnas = ['Convocatoria', 'Fecha', 'Día', 'Tiempo Transcurrido (%)', 'Matrículas a la Fecha',
+                'Proyección P5', 'Proyección P50', 'Proyección P95', 'Matrículas Finales',
+                'Error', 'Error (%)', 'Dentro del Intervalo']
+
+    calendario = df_calendario[df_calendario['Marca'] == marca].dropna(subset=['Fecha inicio', 'Fecha fin'])
+    calendario = calendario[calendario['Fecha fin'] < pd.Timestamp(fecha_corte)]
+    general = calendario[calendario['Programa'] == 'Todos los programas']
+    if not general.empty:
+        calendario = general
+
+    matriculas_marca = df_matriculados[df_matriculados['Marca'] == marca]
+    leads_marca = df_leads[df_leads['Marca'] == marca]
+    fecha_matricula = matriculas_marca['Fecha matrícula'] if 'Fecha matrícula' in matriculas_marca.columns else matriculas_marca['Fecha ingreso']
+
+    # Gasto diario de la marca (todos los canales) a partir del índice
+    grupos_marca = indice_inversion['canales_marca'].get(marca, np.array([], dtype=np.int64))
+    de_la_marca = np.isin(indice_inversion['codigos'], grupos_marca)
+    dias_gasto = indice_inversion['dias'][de_la_marca]
+    gasto_diario = indice_inversion['diario'][de_la_marca]
+
+    tablas = []
+    for _, ventana in calendario.iterrows():
+        dia_inicio = np.datetime64(pd.Timestamp(ventana['Fecha inicio']), 'D').astype(np.int64)
+        dia_fin = np.datetime64(pd.Timestamp(ventana['Fecha fin']), 'D').astype(np.int64)
+        num_dias = int(dia_fin - dia_inicio + 1)
+        if num_dias <= 1:
+            continue
+
+        if ventana['Programa'] == 'Todos los programas':
+            mask_m = np.ones(len(matriculas_marca), dtype=bool)
+            mask_l = np.ones(len(leads_marca), dtype=bool)
+        else:
+            mask_m = (matriculas_marca['Programa'] == ventana['Programa']).to_numpy()
+            mask_l = (leads_marca['Programa'] == ventana['Programa']).to_numpy()
+
+        # Prefijos acumulados por día
+        leads_acum = np.cumsum(_conteo_diario(leads_marca['Fecha ingreso'][mask_l], dia_inicio, num_dias))
+        matriculas_acum = np.cumsum(_conteo_diario(fecha_matricula[mask_m], dia_inicio, num_dias))
+        relativo = dias_gasto - dia_inicio
+        en_rango = (relativo >= 0) & (relativo < num_dias)
+        inversion_acum = np.cumsum(np.bincount(relativo[en_rango], weights=gasto_diario[en_rango], minlength=num_dias))
+
+        # Para cohortes por programa, la inversión y el presupuesto de la marca se
+        # reparten según los leads del programa
+        participacion = np.ones(num_dias)
+        if ventana['Programa'] != 'Todos los programas':
+            leads_todos = np.cumsum(_conteo_diario(leads_marca['Fecha ingreso'], dia_inicio, num_dias))
+            participacion = np.where(leads_todos > 0, leads_acum / np.maximum(leads_todos, 1), 0)
+            inversion_acum = inversion_acum * participacion
+
+        final = matriculas_acum[-1]
+
+        # Proyección de todos los días de la ventana en un solo lote
+        dias = np.arange(num_dias - 1)
+        leads_d = leads_acum[dias]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tasa = np.where(leads_d > 0, matriculas_acum[dias] / np.maximum(leads_d, 1), 0)
+            cpl = np.where(leads_d > 0, inversion_acum[dias] / np.maximum(leads_d, 1), 0)
+        restante = np.maximum(0, presupuesto_total * participacion[dias] - inversion_acum[dias])
+
+        dist = analytic_distribution(restante, cpl, tasa, matriculas_acum[dias], max(final, 1))
+        p5 = matriculas_acum[dias] + dist['p5']
+        p50 = matriculas_acum[dias] + dist['p50']
+        p95 = matriculas_acum[dias] + dist['p95']
+
+        error = p50 - final
+        tablas.append(pd.DataFrame({
+            'Convocatoria': f"{ventana['Programa']} ({pd.Timestamp(ventana['Fecha inicio']).date()})",
+            'Fecha': (dia_inicio + dias).astype('datetime64[D]'),
+            'Día': dias,
+            'Tiempo Transcurrido (%)': np.round(dias / (num_dias - 1) * 100, 1),
+            'Matrículas a la Fecha': matriculas_acum[dias].astype(int),
+            'Proyección P5': np.round(p5, 1),
+            'Proyección P50': np.round(p50, 1),
+            'Proyección P95': np.round(p95, 1),
+            'Matrículas Finales': int(final),
+            'Error': np.round(error, 1),
+            'Error (%)': np.round(np.where(final > 0, error / max(final, 1) * 100, np.nan), 1),
+            'Dentro del Intervalo': (final >= p5) & (final <= p95)
+        }))
+
+    if not tablas:
+        result['detalle'] = pd.DataFrame(columns=columnas)
+        result['calibracion'] = pd.DataFrame(columns=['Tramo Tiempo (%)', 'Días', 'Cobertura P5-P95 (%)',
+                                                      'Error Medio', 'Error Absoluto Medio (%)'])
+        result['cobertura'] = np.nan
+        return result
+
+    detalle = pd.concat(tablas, ignore_index=True)
+    result['detalle'] = detalle
+
+    # Calibración por tramo de avance de la convocatoria
+    tramo = pd.cut(detalle['Tiempo Transcurrido (%)'], bins=[-0.1, 20, 40, 60, 80, 100],
+                   labels=['0-20', '20-40', '40-60', '60-80', '80-100'])
+    agrupado = detalle.groupby(tramo, observed=False)
+    result['calibracion'] = pd.DataFrame({
+        'Tramo Tiempo (%)': agrupado.size().index.astype(str),
+        'Días': agrupado.size().to_numpy(),
+        'Cobertura P5-P95 (%)': np.round(agrupado['Dentro del Intervalo'].mean().to_numpy() * 100, 1),
+        'Error Medio': np.round(agrupado['Error'].mean().to_numpy(), 1),
+        'Error Absoluto Medio (%)': np.round(agrupado['Error (%)'].apply(lambda s: s.abs().mean()).to_numpy(), 1)
+    })
+    result['cobertura'] = float(detalle['Dentro del Intervalo'].mean() * 100)
+
+    return result
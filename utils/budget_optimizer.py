@@ -0,0 +1,146 @@
+# utils/budget_optimizer.py
+
+import pandas as pd
+import numpy as np
+
+def optimize_budget_allocation(df_plan_mensual, presupuesto_restante=None, tasas_conversion=None,
+                               limite_inferior=0.5, limite_superior=1.5, limites_canal=None, pronosticos=None):
+    """Repartir el presupuesto restante entre canales para maximizar matrículas esperadas
+
+    Resuelve un único programa lineal (scipy.optimize.linprog, HiGHS) con todas
+    las marcas a la vez: una restricción de igualdad de presupuesto por marca y
+    cotas por canal. Con CPL constante por canal el objetivo es lineal
+    (leads = inversión / CPL estimado). Las cotas por defecto van del 50% al
+    150% del reparto del plan; limites_canal (Marca, Canal, Mínimo, Máximo)
+    permite fijarlas en valores absolutos.
+
+    presupuesto_restante: dict marca -> monto. Por defecto, la inversión
+    restante de pronosticos (dict marca -> resultado de forecast_pacing o
+    None); las marcas que no figuran en pronosticos usan el presupuesto del plan.
+    tasas_conversion: dict marca -> tasa en % para expresar el resultado en
+    matrículas (las marcas sin tasa quedan con matrículas NaN).
+    """
+    from scipy.optimize import linprog
+
+    result = {}
+
+    columnas = ['Marca', 'Canal', 'CPL estimado', 'Inversión Plan', 'Inversión Recomendada',
+                'Leads Plan', 'Leads Recomendados', 'Matrículas Plan', 'Matrículas Recomendadas']
+    if df_plan_mensual is None or df_plan_mensual.empty:
+        result['canales'] = pd.DataFrame(columns=columnas)
+        result['resumen'] = pd.DataFrame(columns=['Marca', 'Presupuesto', 'Matrículas Plan',
+                                                  'Matrículas Recomendadas', 'Mejora (%)', 'Estado'])
+        return result
+
+    plan = df_plan_mensual.groupby(['Marca', 'Canal'], as_index=False).agg({
+        'Presupuesto total mes': 'sum',
+        'CPL estimado': 'mean'
+    })
+    marcas, codigo_marca = np.unique(plan['Marca'].astype(str), return_inverse=True)
+
+    presupuesto_plan = pd.to_numeric(plan['Presupuesto total mes'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    total_plan_marca = np.bincount(codigo_marca, weights=presupuesto_plan, minlength=len(marcas))
+    participacion = np.where(total_plan_marca[codigo_marca] > 0,
+                             presupuesto_plan / np.where(total_plan_marca[codigo_marca] > 0, total_plan_marca[codigo_marca], 1),
+                             1 / np.bincount(codigo_marca)[codigo_marca])
+
+    if presupuesto_restante is None:
+        from utils.calculations import remaining_investment
+
+        pronosticos = pronosticos or {}
+        presupuesto_marca = np.array([
+            remaining_investment(pronosticos[m]) if m in pronosticos else total
+            for m, total in zip(marcas, total_plan_marca)
+        ])
+    else:
+        presupuesto_marca = np.array([float(presupuesto_restante.get(m, 0.0)) for m in marcas])
+
+    tasa = np.array([
+        (tasas_conversion or {}).get(m, np.nan) / 100 for m in marcas
+    ])[codigo_marca]
+
+    # Leads por unidad de inversión en cada canal
+    cpl = pd.to_numeric(plan['CPL estimado'], errors='coerce').to_numpy(dtype=float)
+    rendimiento = np.where(cpl > 0, 1 / np.where(cpl > 0, cpl, 1), 0.0)
+
+    inversion_plan = participacion * presupuesto_marca[codigo_marca]
+    minimo = limite_inferior * inversion_plan
+    maximo = np.minimum(limite_superior * inversion_plan, presupuesto_marca[codigo_marca])
+    if limites_canal is not None and not limites_canal.empty:
+        limites = limites_canal.set_index(['Marca', 'Canal'])
+        claves = pd.MultiIndex.from_frame(plan[['Marca', 'Canal']])
+        if 'Mínimo' in limites.columns:
+            minimo = np.where(claves.isin(limites.index), limites['Mínimo'].reindex(claves).fillna(0).to_numpy(dtype=float), minimo)
+        if 'Máximo' in limites.columns:
+            maximo = np.where(claves.isin(limites.index), limites['Máximo'].reindex(claves).fillna(np.inf).to_numpy(dtype=float), maximo)
+
+    # Una fila de igualdad por marca: la suma de sus canales es su presupuesto
+    num_variables = len(plan)
+    a_eq = np.zeros((len(marcas), num_variables))
+    a_eq[codigo_marca, np.arange(num_variables)] = 1
+
+    solucion = linprog(
+        c=-rendimiento,
+        A_eq=a_eq,
+        b_eq=presupuesto_marca,
+        bounds=np.column_stack([minimo, maximo]),
+        method='highs'
+    )
+
+    if solucion.success:
+        inversion_recomendada = solucion.x
+        estado = np.full(len(marcas), 'Óptimo', dtype=object)
+    else:
+        # Restricciones incompatibles: se mantiene el reparto del plan
+        inversion_recomendada = inversion_plan
+        estado = np.full(len(marcas), f'Sin solución: {solucion.message}', dtype=object)
+
+    leads_plan = inversion_plan * rendimiento
+    leads_recomendados = inversion_recomendada * rendimiento
+
+    result['canales'] = pd.DataFrame({
+        'Marca': plan['Marca'],
+        'Canal': plan['Canal'],
+        'CPL estimado': cpl,
+        'Inversión Plan': np.round(inversion_plan, 2),
+        'Inversión Recomendada': np.round(inversion_recomendada, 2),
+        'Leads Plan': np.round(leads_plan, 1),
+        'Leads Recomendados': np.round(leads_recomendados, 1),
+        'Matrículas Plan': np.round(leads_plan * tasa, 1),
+        'Matrículas Recomendadas': np.round(leads_recomendados * tasa, 1)
+    })
+
+    leads_plan_marca = np.bincount(codigo_marca, weights=leads_plan, minlength=len(marcas))
+    leads_rec_marca = np.bincount(codigo_marca, weights=leads_recomendados, minlength=len(marcas))
+    tasa_marca = np.array([(tasas_conversion or {}).get(m, np.nan) / 100 for m in marcas])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mejora = np.where(leads_plan_marca > 0, (leads_rec_marca / leads_plan_marca - 1) * 100, 0)
+
+    result['resumen'] = pd.DataFrame({
+        'Marca': marcas,
+        'Presupuesto': presupuesto_marca,
+        'Leads Plan': np.round(leads_plan_marca, 1),
+        'Leads Recomendados': np.round(leads_rec_marca, 1),
+        'Matrículas Plan': np.round(leads_plan_marca * tasa_marca, 1),
+        'Matrículas Recomendadas': np.round(leads_rec_marca * tasa_marca, 1),
+        'Mejora (%)': np.round(mejora, 1),
+        'Estado': estado
+    })
+
+    return result
+
+def optimize_brand_budget(df_plan_mensual, marca, metrics, pronostico=None, **kwargs):
+    """Reparto óptimo por canal de la inversión que le queda a una marca
+
+    El presupuesto es la inversión restante del pronóstico de ritmo
+    (remaining_investment: cero sin pronóstico) y las matrículas se calculan
+    con la tasa de conversión de la marca. kwargs pasa las cotas a
+    optimize_budget_allocation.
+    """
+    plan_marca = df_plan_mensual[df_plan_mensual['Marca'] == marca] if df_plan_mensual is not None else None
+    return optimize_budget_allocation(
+        plan_marca,
+        tasas_conversion={marca: float(metrics['tasa_conversion'])},
+        pronosticos={marca: pronostico},
+        **kwargs
+    )
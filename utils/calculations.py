@@ -3,10 +3,17 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from scipy import stats
+from utils.conversion_model import estimate_program_conversion, project_program_results
+from utils.cohorts import build_cohort_calendar, split_new_remarketing
+from utils.investment_index import build_investment_index, cumulative_investment
 
-def calculate_metrics(df_matriculados, df_leads, df_calendario, df_inversion, marca, objetivo_matriculas=100):
-    """Calcular métricas para el reporte estratégico"""
+def calculate_metrics(df_matriculados, df_leads, df_calendario, df_inversion, marca, objetivo_matriculas=100,
+                      indice_inversion=None):
+    """Calcular métricas para el reporte estratégico
+    
+    indice_inversion permite reutilizar un índice ya construido con
+    build_investment_index en lugar de indexar df_inversion en cada llamada.
+    """
     metrics = {}
     
     # Fecha actual para cálculos
@@ -61,50 +68,20 @@ def calculate_metrics(df_matriculados, df_leads, df_calendario, df_inversion, ma
         metrics['tasa_conversion'] = 0
     
     # 6. Composición de matrículas (nuevos vs remarketing)
+    # Cada matrícula se asigna a su cohorte (o a la convocatoria general de la marca)
+    # con una búsqueda binaria y se compara la fecha de ingreso con su inicio
     matriculas_marca = df_matriculados[df_matriculados['Marca'] == marca]
-    matriculas_nuevas = 0
-    matriculas_remarketing = 0
-    
-    # Obtener la fecha de inicio para esta marca
-    fecha_inicio_marca = None
-    if not df_calendario.empty:
-        # Si hay una fila con 'Todos los programas', usar esa
-        if 'Todos los programas' in df_calendario['Programa'].values:
-            fecha_inicio_df = df_calendario[df_calendario['Programa'] == 'Todos los programas']['Fecha inicio']
-            if not fecha_inicio_df.empty:
-                fecha_inicio_marca = fecha_inicio_df.iloc[0]
-    
-    # Inicializar contador para programas procesados
-    programas_procesados = set()
-    
-    for _, matricula in matriculas_marca.iterrows():
-        programa = matricula['Programa']
-        fecha_ingreso = matricula['Fecha ingreso']
-        
-        programas_procesados.add(programa)
-        
-        # Usar la fecha de inicio de la marca para todos los programas
-        if fecha_inicio_marca is not None and pd.notna(fecha_ingreso):
-            if fecha_ingreso >= fecha_inicio_marca:
-                matriculas_nuevas += 1
-            else:
-                matriculas_remarketing += 1
-        else:
-            # Si no tenemos fecha de inicio, intentar con la fecha específica del programa
-            calendario_programa = df_calendario[(df_calendario['Marca'] == marca) & 
-                                              (df_calendario['Programa'] == programa)]
-            
-            if not calendario_programa.empty and pd.notna(fecha_ingreso):
-                fecha_inicio = calendario_programa['Fecha inicio'].iloc[0]
-                
-                if pd.notna(fecha_inicio):
-                    if fecha_ingreso >= fecha_inicio:
-                        matriculas_nuevas += 1
-                    else:
-                        matriculas_remarketing += 1
-            else:
-                # Si no hay fecha específica, consideramos como lead nuevo (es lo más común)
-                matriculas_nuevas += 1
+    
+    if not df_calendario.empty and not matriculas_marca.empty:
+        indice_cohortes = build_cohort_calendar(df_calendario, marca)
+        _, remarketing = split_new_remarketing(matriculas_marca, indice_cohortes)
+        matriculas_remarketing = int(remarketing.sum())
+    else:
+        # Si no hay calendario, consideramos como lead nuevo (es lo más común)
+        matriculas_remarketing = 0
+    matriculas_nuevas = len(matriculas_marca) - matriculas_remarketing
+    
+    programas_procesados = set(matriculas_marca['Programa'].unique())
     
     total_matriculas = matriculas_nuevas + matriculas_remarketing
     
@@ -119,7 +96,10 @@ def calculate_metrics(df_matriculados, df_leads, df_calendario, df_inversion, ma
     metrics['programas_procesados'] = len(programas_procesados)
     
     # 7. Inversión acumulada
-    metrics['inversion_acumulada'] = df_inversion['Inversión acumulada'].sum()
+    # La columna ya es acumulada: se toma el último registro de cada canal de la marca
+    if indice_inversion is None:
+        indice_inversion = build_investment_index(df_inversion)
+    metrics['inversion_acumulada'] = cumulative_investment(indice_inversion, marca, now)
     
     # 8. CPL promedio
     if metrics['leads_acumulados'] > 0:
@@ -129,17 +109,64 @@ def calculate_metrics(df_matriculados, df_leads, df_calendario, df_inversion, ma
     
     return metrics
 
-def project_results(metrics, df_inversion, marca, num_simulations=10000):
-    """Proyectar resultados futuros usando simulación Monte Carlo"""
+def _parametros_beta(tasa_conversion_media):
+    """Calcular alpha y beta de la distribución beta centrada en la tasa histórica"""
+    # Varianza deseada (ajustable según la confianza en los datos históricos)
+    var_deseada = (tasa_conversion_media * 0.3)**2
+    
+    # Cálculo de parámetros alpha y beta para distribución beta
+    total = tasa_conversion_media * (1 - tasa_conversion_media) / var_deseada - 1
+    alpha = tasa_conversion_media * total
+    beta = (1 - tasa_conversion_media) * total
+    
+    return max(0.1, alpha), max(0.1, beta)
+
+def remaining_investment(pronostico=None):
+    """Inversión pendiente de la marca tomada del pronóstico de ritmo
+
+    forecast_pacing ya la calcula (gasto pronosticado hasta el fin de la
+    convocatoria, limitado al presupuesto del plan que queda); aquí solo se
+    acota en cero. Sin pronóstico no hay inversión pendiente conocida y se
+    proyecta solo lo acumulado.
+    """
+    if pronostico is None:
+        return 0.0
+    return max(0.0, float(pronostico['inversion_restante']))
+
+def projected_cpl(metrics, pronostico, inversion_restante):
+    """CPL medio de la proyección
+
+    Con pronóstico, el implícito en la inversión restante y los leads
+    pronosticados, de modo que la media de leads proyectados coincide con el
+    pronóstico; si no hay leads o inversión pronosticados, el CPL histórico.
+    """
+    if pronostico is not None and inversion_restante > 0 and pronostico.get('leads_pronosticados', 0) > 0:
+        return inversion_restante / pronostico['leads_pronosticados']
+    return metrics['cpl_promedio']
+
+def project_results(metrics, df_inversion, marca, num_simulations=10000, metodo='montecarlo', pronostico=None,
+                    rng=None):
+    """Proyectar resultados futuros usando simulación Monte Carlo
+    
+    Con metodo='analitico' se evalúa la misma distribución por integración
+    numérica (ver project_results_analytic), pensado para uso interactivo.
+    pronostico es el resultado de forecast_pacing para la marca: la inversión
+    restante sale del plan y los leads proyectados siguen el pronóstico de
+    ritmo (ver remaining_investment). rng es el np.random.Generator de la
+    simulación; sin él se usa el generador global de numpy.
+    """
+    if metodo == 'analitico':
+        return project_results_analytic(metrics, df_inversion, marca, pronostico=pronostico)
+    
     projections = {}
+    rng = np.random if rng is None else rng
     
     # Parámetros base
-    inversion_total = 10000  # Este valor debería calcularse o extraerse de los datos
-    inversion_restante = max(0, inversion_total - metrics['inversion_acumulada'])
+    inversion_restante = remaining_investment(pronostico)
     
     # Parámetros históricos (valores medios)
     tasa_conversion_media = metrics['tasa_conversion'] / 100  # Convertir a decimal
-    cpl_medio = metrics['cpl_promedio']
+    cpl_medio = projected_cpl(metrics, pronostico, inversion_restante)
     
     # Inicializar arrays para resultados de simulación
     matriculas_simuladas = np.zeros(num_simulations)
@@ -149,7 +176,7 @@ def project_results(metrics, df_inversion, marca, num_simulations=10000):
     for i in range(num_simulations):
         # 1. Simular CPL con distribución normal (±15% alrededor de la media)
         cpl_std_dev = cpl_medio * 0.15
-        cpl_simulado = np.random.normal(cpl_medio, cpl_std_dev)
+        cpl_simulado = rng.normal(cpl_medio, cpl_std_dev)
         cpl_simulado = max(1, cpl_simulado)  # Asegurar CPL positivo
         
         # 2. Simular leads generados con la inversión restante
@@ -159,19 +186,13 @@ def project_results(metrics, df_inversion, marca, num_simulations=10000):
         # La distribución beta es adecuada para tasas/proporciones (valores entre 0 y 1)
         # Calculamos alpha y beta para centrar la distribución alrededor de nuestra tasa histórica
         if 0 < tasa_conversion_media < 1:
-            # Varianza deseada (ajustable según la confianza en los datos históricos)
-            var_deseada = (tasa_conversion_media * 0.3)**2
-            
-            # Cálculo de parámetros alpha y beta para distribución beta
-            total = tasa_conversion_media * (1 - tasa_conversion_media) / var_deseada - 1
-            alpha = tasa_conversion_media * total
-            beta = (1 - tasa_conversion_media) * total
+            alpha, beta = _parametros_beta(tasa_conversion_media)
             
             # Simular tasa de conversión
-            tasa_simulada = np.random.beta(max(0.1, alpha), max(0.1, beta))
+            tasa_simulada = rng.beta(alpha, beta)
         else:
             # Fallback a una distribución normal truncada si la tasa está en los extremos
-            tasa_simulada = np.random.normal(tasa_conversion_media, 0.02)
+            tasa_simulada = rng.normal(tasa_conversion_media, 0.02)
             tasa_simulada = max(0.001, min(0.999, tasa_simulada))
         
         # 4. Calcular matrículas esperadas para esta simulación
@@ -222,8 +243,179 @@ def project_results(metrics, df_inversion, marca, num_simulations=10000):
     
     return projections
 
-def analyze_programs(df_matriculados, df_leads, df_calendario):
-    """Analizar programas para identificar los mejores y con oportunidades"""
+def _nodos_proyeccion(inversion_restante, cpl_medio, tasa_conversion_media, num_nodos=64):
+    """Calcular nodos de cuadratura (cuantiles equiespaciados) para CPL y tasa de conversión
+    
+    Acepta escalares o arrays de la misma forma; devuelve arrays (k, num_nodos).
+    """
+    from scipy import special
+
+    inversion_restante = np.atleast_1d(np.asarray(inversion_restante, dtype=float))
+    cpl_medio = np.atleast_1d(np.asarray(cpl_medio, dtype=float))
+    tasa = np.atleast_1d(np.asarray(tasa_conversion_media, dtype=float))
+    
+    # Cuantiles en el punto medio de cada celda de probabilidad
+    u = (np.arange(num_nodos) + 0.5) / num_nodos
+    z = special.ndtri(u)
+    
+    # Tasa: beta centrada en la tasa histórica, o normal truncada en los extremos
+    usa_beta = (tasa > 0) & (tasa < 1)
+    tasa_segura = np.where(usa_beta, tasa, 0.5)
+    var_deseada = (tasa_segura * 0.3)**2
+    total = tasa_segura * (1 - tasa_segura) / var_deseada - 1
+    alpha = np.maximum(0.1, tasa_segura * total)
+    beta = np.maximum(0.1, (1 - tasa_segura) * total)
+    
+    tasa_beta = special.betaincinv(alpha[:, None], beta[:, None], u[None, :])
+    tasa_normal = np.clip(tasa[:, None] + 0.02 * z[None, :], 0.001, 0.999)
+    nodos_tasa = np.where(usa_beta[:, None], tasa_beta, tasa_normal)
+    
+    # CPL: normal ±15% truncada en 1 (igual que la simulación)
+    cpl_std = cpl_medio * 0.15
+    nodos_cpl = np.maximum(1, cpl_medio[:, None] + cpl_std[:, None] * z[None, :])
+    
+    return inversion_restante, cpl_medio, cpl_std, nodos_cpl, nodos_tasa
+
+def _cdf_matriculas(m, inversion_restante, cpl_medio, cpl_std, nodos_tasa):
+    """P(matrículas <= m) integrando sobre la tasa con la CDF normal cerrada del CPL
+    
+    m tiene forma (k, p); el resto de parámetros tiene forma (k,) o (k, n).
+    """
+    from scipy import special
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # matrículas <= m  <=>  CPL >= inversion_restante * tasa / m
+        umbral_cpl = inversion_restante[:, None, None] * nodos_tasa[:, None, :] / m[:, :, None]
+        umbral_cpl = np.where(np.isnan(umbral_cpl), 0, umbral_cpl)
+        
+        cpl_efectivo = np.maximum(1, cpl_medio)[:, None, None]
+        std = cpl_std[:, None, None]
+        z = (umbral_cpl - cpl_medio[:, None, None]) / np.where(std > 0, std, 1)
+        prob_normal = np.where(std > 0, 1 - special.ndtr(z), (umbral_cpl <= cpl_efectivo).astype(float))
+        prob = np.where(umbral_cpl <= 1, 1.0, prob_normal)
+    
+    return prob.mean(axis=2)
+
+def _invertir_cdf(grid, cdf, q):
+    """Interpolar el cuantil q de cada fila de una CDF tabulada (monótona)"""
+    idx = np.clip((cdf < q).sum(axis=1), 1, grid.shape[1] - 1)
+    filas = np.arange(grid.shape[0])
+    x0, x1 = grid[filas, idx - 1], grid[filas, idx]
+    c0, c1 = cdf[filas, idx - 1], cdf[filas, idx]
+    peso = np.where(c1 > c0, (q - c0) / np.where(c1 > c0, c1 - c0, 1), 1.0)
+    return x0 + np.clip(peso, 0, 1) * (x1 - x0)
+
+def analytic_distribution(inversion_restante, cpl_medio, tasa_conversion_media,
+                          matriculas_acumuladas, objetivo_matriculas,
+                          num_nodos=64, num_puntos=256):
+    """Resumir la distribución de matrículas proyectadas sin muestreo
+    
+    Vectorizado sobre escenarios: todos los argumentos pueden ser arrays (k,).
+    Devuelve un diccionario de arrays con percentiles, momentos y probabilidades.
+    Es la base de project_results_analytic y del backtest (utils/backtest.py),
+    que la evalúa para muchos cortes a la vez.
+    """
+    inversion_restante, cpl_medio, cpl_std, nodos_cpl, nodos_tasa = _nodos_proyeccion(
+        inversion_restante, cpl_medio, tasa_conversion_media, num_nodos
+    )
+    k = inversion_restante.shape[0]
+    matriculas_acumuladas = np.broadcast_to(np.asarray(matriculas_acumuladas, dtype=float), (k,))
+    objetivo_matriculas = np.broadcast_to(np.asarray(objetivo_matriculas, dtype=float), (k,))
+    
+    # Momentos: leads = inversión / CPL y tasa son independientes
+    nodos_leads = inversion_restante[:, None] / nodos_cpl
+    leads_mean = nodos_leads.mean(axis=1)
+    leads_std = nodos_leads.std(axis=1)
+    matriculas_mean = leads_mean * nodos_tasa.mean(axis=1)
+    segundo_momento = (nodos_leads**2).mean(axis=1) * (nodos_tasa**2).mean(axis=1)
+    matriculas_std = np.sqrt(np.maximum(0, segundo_momento - matriculas_mean**2))
+    
+    # CDF tabulada en una rejilla fija hasta el máximo alcanzable por los nodos
+    maximo = np.maximum(nodos_leads.max(axis=1) * nodos_tasa.max(axis=1) * 1.05, 1e-9)
+    grid = maximo[:, None] * np.linspace(0, 1, num_puntos)[None, :]
+    cdf = _cdf_matriculas(grid, inversion_restante, cpl_medio, cpl_std, nodos_tasa)
+    cdf = np.maximum.accumulate(cdf, axis=1)
+    
+    resultado = {
+        'leads_mean': leads_mean,
+        'leads_std': leads_std,
+        'matriculas_mean': matriculas_mean,
+        'matriculas_std': matriculas_std,
+        'grid': grid,
+        'cdf': cdf,
+    }
+    for q in [5, 25, 50, 75, 95]:
+        resultado[f'p{q}'] = _invertir_cdf(grid, cdf, q / 100)
+    
+    # Probabilidad de alcanzar cada umbral del objetivo evaluada exactamente
+    umbrales = np.array([0.8, 0.9, 1.0, 1.1, 1.2])
+    faltantes = objetivo_matriculas[:, None] * umbrales[None, :] - matriculas_acumuladas[:, None]
+    cdf_faltantes = _cdf_matriculas(np.maximum(faltantes, 1e-12), inversion_restante, cpl_medio, cpl_std, nodos_tasa)
+    resultado['prob_metas'] = np.where(faltantes <= 0, 100.0, (1 - cdf_faltantes) * 100)
+    
+    return resultado
+
+def project_results_analytic(metrics, df_inversion, marca, num_muestras=1000, pronostico=None):
+    """Proyectar resultados por integración numérica (modo rápido para uso interactivo)
+    
+    Devuelve las mismas claves que project_results. La distribución del producto
+    (inversión restante / CPL) x tasa se obtiene por cuadratura sobre la tasa beta
+    con la CDF normal del CPL en forma cerrada, sin muestreo aleatorio.
+    """
+    projections = {}
+    
+    # Parámetros base (mismos supuestos que la simulación Monte Carlo)
+    inversion_restante = remaining_investment(pronostico)
+    tasa_conversion_media = metrics['tasa_conversion'] / 100
+    cpl_medio = projected_cpl(metrics, pronostico, inversion_restante)
+    
+    dist = analytic_distribution(
+        inversion_restante, cpl_medio, tasa_conversion_media,
+        metrics['matriculas_acumuladas'], metrics['objetivo_matriculas']
+    )
+    
+    projections['leads_proyectados'] = int(dist['leads_mean'][0])
+    projections['leads_proyectados_std'] = float(dist['leads_std'][0])
+    
+    projections['matriculas_proyectadas_min'] = int(dist['p5'][0])  # P5
+    projections['matriculas_proyectadas_q1'] = int(dist['p25'][0])  # P25
+    projections['matriculas_proyectadas_median'] = int(dist['p50'][0])  # P50
+    projections['matriculas_proyectadas_q3'] = int(dist['p75'][0])  # P75
+    projections['matriculas_proyectadas_max'] = int(dist['p95'][0])  # P95
+    
+    matriculas_mean = float(dist['matriculas_mean'][0])
+    projections['matriculas_proyectadas_mean'] = int(matriculas_mean)
+    projections['matriculas_proyectadas_std'] = float(dist['matriculas_std'][0])
+    
+    if metrics['objetivo_matriculas'] > 0:
+        for umbral, prob in zip([0.8, 0.9, 1.0, 1.1, 1.2], dist['prob_metas'][0]):
+            projections[f'prob_meta_{int(umbral*100)}'] = float(prob)
+        
+        projections['pct_cumplimiento_proyectado'] = ((metrics['matriculas_acumuladas'] + matriculas_mean) / 
+                                                     metrics['objetivo_matriculas']) * 100
+    else:
+        for umbral in [0.8, 0.9, 1.0, 1.1, 1.2]:
+            projections[f'prob_meta_{int(umbral*100)}'] = 0
+        projections['pct_cumplimiento_proyectado'] = 0
+    
+    # Muestra determinista por cuantiles para las visualizaciones
+    u = (np.arange(num_muestras) + 0.5) / num_muestras
+    projections['simulacion_matriculas'] = np.interp(u, dist['cdf'][0], dist['grid'][0]).tolist()
+    
+    return projections
+
+def analyze_programs(df_matriculados, df_leads, df_calendario, ajustar_tasas=False, metrics=None,
+                     pronostico=None, seed=None):
+    """Analizar programas para identificar los mejores y con oportunidades
+    
+    Con ajustar_tasas=True se agregan las tasas ajustadas por contracción
+    beta-binomial y la clasificación se hace sobre ellas, de modo que los
+    programas con pocos leads no cambien de etiqueta por ruido.
+    
+    Si se pasan las métricas de la marca se agrega 'proyeccion_programas' con
+    las matrículas proyectadas por programa (project_program_results) para la
+    inversión restante del pronóstico.
+    """
     result = {}
     
     # Mejorado: Crear un conjunto de todos los programas únicos presentes en todos los datos disponibles
@@ -288,8 +480,22 @@ def analyze_programs(df_matriculados, df_leads, df_calendario):
         result['tabla_completa'] = empty_df
         result['top_matriculas'] = empty_df
         result['menor_conversion'] = empty_df
+        if metrics is not None:
+            result['proyeccion_programas'] = project_program_results(metrics, {'tabla': empty_df}, pronostico)
         return result
     
+    # Tasa usada para clasificar (observada o ajustada)
+    columna_tasa = 'Tasa Conversión (%)'
+    estimacion = None
+    if ajustar_tasas or metrics is not None:
+        estimacion = estimate_program_conversion(df_programas)
+    if ajustar_tasas:
+        # Los parámetros posteriores solo los usa la proyección por programa
+        df_programas = estimacion['tabla'].drop(columns=['alpha', 'beta'])
+        columna_tasa = 'Tasa Ajustada (%)'
+    if metrics is not None:
+        result['proyeccion_programas'] = project_program_results(metrics, estimacion, pronostico, seed=seed)
+    
     # Clasificar automáticamente los programas
     # Añadir columna de clasificación
     df_programas['Clasificación'] = ''
@@ -301,7 +507,7 @@ def analyze_programs(df_matriculados, df_leads, df_calendario):
         
         # Programas con baja conversión (menos del 5% pero con más de 10 leads)
         baja_conversion = df_programas[
-            (df_programas['Tasa Conversión (%)'] < 5) & 
+            (df_programas[columna_tasa] < 5) & 
             (df_programas['Leads'] > 10) &
             (~df_programas['Programa'].isin(top_matriculas))
         ]['Programa'].tolist()
@@ -309,7 +515,7 @@ def analyze_programs(df_matriculados, df_leads, df_calendario):
         
         # Oportunidades (programas con alta conversión pero pocos leads)
         oportunidades = df_programas[
-            (df_programas['Tasa Conversión (%)'] > 15) & 
+            (df_programas[columna_tasa] > 15) & 
             (df_programas['Leads'] < 20) &
             (~df_programas['Programa'].isin(top_matriculas)) &
             (~df_programas['Programa'].isin(baja_conversion))
@@ -325,7 +531,7 @@ def analyze_programs(df_matriculados, df_leads, df_calendario):
     # Crear copias para evitar problemas de referencias
     if len(df_programas) > 0:
         result['top_matriculas'] = df_programas.nlargest(min(5, len(df_programas)), 'Matrículas').copy()
-        result['menor_conversion'] = df_programas.nsmallest(min(5, len(df_programas)), 'Tasa Conversión (%)').copy()
+        result['menor_conversion'] = df_programas.nsmallest(min(5, len(df_programas)), columna_tasa).copy()
     else:
         result['top_matriculas'] = pd.DataFrame(columns=df_programas.columns)
         result['menor_conversion'] = pd.DataFrame(columns=df_programas.columns)
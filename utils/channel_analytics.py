@@ -0,0 +1,145 @@
+# utils/channel_analytics.py
+
+import pandas as pd
+import numpy as np
+
+from utils.investment_index import build_investment_index
+
+def _suma_movil(matriz, ventana):
+    """Suma móvil por filas (grupos) con cumsum; los primeros días usan lo disponible"""
+    acumulado = np.cumsum(matriz, axis=1)
+    resultado = acumulado.copy()
+    resultado[:, ventana:] = acumulado[:, ventana:] - acumulado[:, :-ventana]
+    return resultado
+
+def channel_performance(df_leads, df_plan_mensual, df_inversion=None, indice_inversion=None,
+                        ventanas=(7, 28), tolerancia=0.20):
+    """Gasto, leads y CPL real diarios y móviles por (Marca, Canal)
+
+    Construye matrices densas (marca-canal x día) para todas las marcas y
+    canales a la vez y calcula las ventanas móviles con sumas acumuladas.
+    Si los leads no traen columna 'Canal', los leads diarios de cada marca se
+    reparten entre sus canales según la participación del gasto de ese día.
+    Compara el CPL real de la ventana más larga con el 'CPL estimado' del plan.
+    """
+    result = {}
+
+    if indice_inversion is None:
+        indice_inversion = build_investment_index(df_inversion)
+
+    grupos = indice_inversion['grupos']
+    codigos = indice_inversion['codigos']
+    num_grupos = len(grupos)
+    columnas_resumen = ['Marca', 'Canal', 'Inversión', 'Leads', 'CPL Real', 'CPL Plan', 'Desviación (%)', 'Estado']
+    if num_grupos == 0:
+        result['diario'] = pd.DataFrame(columns=['Marca', 'Canal', 'Fecha', 'Inversión', 'Leads', 'CPL'])
+        result['resumen'] = pd.DataFrame(columns=columnas_resumen)
+        return result
+
+    dia_min = int(indice_inversion['dias'].min())
+    num_dias = int(indice_inversion['dias'].max()) - dia_min + 1
+    marcas_grupo = np.asarray(grupos.get_level_values(0))
+    canales_grupo = np.asarray(grupos.get_level_values(1))
+
+    # 1. Gasto diario denso (grupo x día)
+    celda = codigos * num_dias + (indice_inversion['dias'] - dia_min)
+    gasto = np.bincount(celda, weights=indice_inversion['diario'], minlength=num_grupos * num_dias)
+    gasto = gasto.reshape(num_grupos, num_dias)
+
+    # 2. Leads diarios por grupo
+    fechas = pd.to_datetime(df_leads['Fecha ingreso'], errors='coerce').to_numpy(dtype='datetime64[D]')
+    dia_lead = fechas.astype(np.int64) - dia_min
+    en_rango = ~np.isnat(fechas) & (dia_lead >= 0) & (dia_lead < num_dias)
+
+    if 'Canal' in df_leads.columns:
+        grupo_lead = grupos.get_indexer(pd.MultiIndex.from_arrays([
+            df_leads['Marca'].astype(str), df_leads['Canal'].astype(str)
+        ]))
+        validos = en_rango & (grupo_lead >= 0)
+        leads = np.bincount(grupo_lead[validos] * num_dias + dia_lead[validos],
+                            minlength=num_grupos * num_dias).reshape(num_grupos, num_dias).astype(float)
+    else:
+        marcas, codigo_marca_grupo = np.unique(marcas_grupo, return_inverse=True)
+        codigo_marca_lead = pd.Index(marcas).get_indexer(df_leads['Marca'].astype(str))
+        validos = en_rango & (codigo_marca_lead >= 0)
+        leads_marca = np.bincount(codigo_marca_lead[validos] * num_dias + dia_lead[validos],
+                                  minlength=len(marcas) * num_dias).reshape(len(marcas), num_dias)
+
+        # Participación del gasto de cada canal dentro de su marca y día
+        gasto_positivo = np.maximum(gasto, 0)
+        gasto_marca = np.zeros((len(marcas), num_dias))
+        np.add.at(gasto_marca, codigo_marca_grupo, gasto_positivo)
+        canales_por_marca = np.bincount(codigo_marca_grupo, minlength=len(marcas))
+        total = gasto_marca[codigo_marca_grupo]
+        participacion = np.where(total > 0, gasto_positivo / np.where(total > 0, total, 1),
+                                 1 / canales_por_marca[codigo_marca_grupo][:, None])
+        leads = leads_marca[codigo_marca_grupo] * participacion
+
+    # 3. Ventanas móviles y CPL real (sin CPL cuando el gasto no es positivo,
+    # p. ej. correcciones del acumulado)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cpl_diario = np.where((leads > 0) & (gasto > 0), gasto / leads, np.nan)
+
+    columnas = {
+        'Marca': np.repeat(marcas_grupo, num_dias),
+        'Canal': np.repeat(canales_grupo, num_dias),
+        'Fecha': np.tile(np.arange(dia_min, dia_min + num_dias).astype('datetime64[D]'), num_grupos),
+        'Inversión': gasto.ravel(),
+        'Leads': leads.ravel(),
+        'CPL': cpl_diario.ravel(),
+    }
+    moviles = {}
+    for ventana in ventanas:
+        gasto_v = _suma_movil(gasto, ventana)
+        leads_v = _suma_movil(leads, ventana)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cpl_v = np.where((leads_v > 0) & (gasto_v > 0), gasto_v / leads_v, np.nan)
+        moviles[ventana] = (gasto_v, leads_v, cpl_v)
+        columnas[f'Inversión {ventana}d'] = gasto_v.ravel()
+        columnas[f'Leads {ventana}d'] = leads_v.ravel()
+        columnas[f'CPL {ventana}d'] = cpl_v.ravel()
+
+    diario = pd.DataFrame(columnas)
+
+    # Solo días dentro del rango con datos de cada grupo
+    primer_dia = np.full(num_grupos, num_dias)
+    ultimo_dia = np.full(num_grupos, -1)
+    np.minimum.at(primer_dia, codigos, indice_inversion['dias'] - dia_min)
+    np.maximum.at(ultimo_dia, codigos, indice_inversion['dias'] - dia_min)
+    dia_relativo = np.tile(np.arange(num_dias), num_grupos)
+    activo = (dia_relativo >= np.repeat(primer_dia, num_dias)) & (dia_relativo <= np.repeat(ultimo_dia, num_dias))
+    result['diario'] = diario[activo].reset_index(drop=True)
+
+    # 4. Comparación con el plan en la última ventana disponible de cada grupo
+    ventana = max(ventanas)
+    gasto_v, leads_v, cpl_v = moviles[ventana]
+    filas = np.arange(num_grupos)
+    cpl_real = cpl_v[filas, ultimo_dia]
+
+    cpl_plan = np.full(num_grupos, np.nan)
+    if df_plan_mensual is not None and not df_plan_mensual.empty and 'CPL estimado' in df_plan_mensual.columns:
+        plan = df_plan_mensual.groupby(['Marca', 'Canal'])['CPL estimado'].mean()
+        plan.index = pd.MultiIndex.from_arrays([plan.index.get_level_values(0).astype(str),
+                                                plan.index.get_level_values(1).astype(str)])
+        cpl_plan = plan.reindex(grupos).to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        desviacion = (cpl_real / cpl_plan - 1) * 100
+    estado = np.select(
+        [np.isnan(desviacion), desviacion > tolerancia * 100, desviacion < -tolerancia * 100],
+        ['Sin datos', 'CPL sobre plan', 'CPL bajo plan'],
+        default='En plan'
+    )
+
+    result['resumen'] = pd.DataFrame({
+        'Marca': marcas_grupo,
+        'Canal': canales_grupo,
+        'Inversión': np.round(gasto_v[filas, ultimo_dia], 2),
+        'Leads': np.round(leads_v[filas, ultimo_dia], 1),
+        'CPL Real': np.round(cpl_real, 2),
+        'CPL Plan': cpl_plan,
+        'Desviación (%)': np.round(desviacion, 1),
+        'Estado': estado
+    })
+
+    return result
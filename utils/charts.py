@@ -0,0 +1,165 @@
+# utils/charts.py
+
+import collections
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+# Estilo base de los gráficos (se puede sobrescribir por llamada)
+ESTILO_BASE = {
+    'color': '#2196F3',
+    'color_secundario': '#9C27B0',
+    'color_objetivo': '#C00000',
+    'ancho': 8.0,
+    'alto': 4.0,
+    'dpi': 110,
+    'fuente': 10,
+}
+
+MAX_GRAFICOS_CACHE = 64
+
+# PNG por huella de datos y estilo (LRU) y una figura reutilizable por tipo de gráfico
+_cache_png = collections.OrderedDict()
+_figuras = {}
+_estadisticas = {'aciertos': 0, 'fallos': 0}
+# Las figuras y la caché se comparten entre sesiones (hilos) de Streamlit
+_bloqueo = threading.Lock()
+
+def _huella(tipo, datos, estilo):
+    """Hash de los arrays graficados, los parámetros y el estilo"""
+    h = hashlib.sha1(tipo.encode('utf-8'))
+    for valor in datos:
+        if isinstance(valor, np.ndarray):
+            h.update(str(valor.dtype).encode('utf-8'))
+            h.update(np.ascontiguousarray(valor).tobytes())
+        else:
+            h.update(json.dumps(valor, sort_keys=True, default=str).encode('utf-8'))
+        h.update(b'|')
+    h.update(json.dumps(estilo, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+def _figura(tipo, estilo):
+    """Figura Agg reutilizada para cada tipo de gráfico (se limpia antes de dibujar)"""
+    figura = _figuras.get(tipo)
+    if figura is None:
+        # matplotlib se carga con el primer gráfico que no está en caché
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figura = Figure()
+        FigureCanvasAgg(figura)
+        _figuras[tipo] = figura
+    figura.clear()
+    figura.set_size_inches(estilo['ancho'], estilo['alto'])
+    figura.set_dpi(estilo['dpi'])
+    return figura
+
+def _png(figura, estilo):
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format='png', dpi=estilo['dpi'], bbox_inches='tight')
+    return buffer.getvalue()
+
+def _renderizar(tipo, datos, estilo, dibujar):
+    """Devolver el PNG en caché o dibujarlo con `dibujar(ax, estilo)` y guardarlo"""
+    estilo = {**ESTILO_BASE, **(estilo or {})}
+    clave = _huella(tipo, datos, estilo)
+    with _bloqueo:
+        if clave in _cache_png:
+            _cache_png.move_to_end(clave)
+            _estadisticas['aciertos'] += 1
+            return _cache_png[clave]
+
+        _estadisticas['fallos'] += 1
+        figura = _figura(tipo, estilo)
+        ax = figura.add_subplot(111)
+        dibujar(ax, estilo)
+        for eje in ('top', 'right'):
+            ax.spines[eje].set_visible(False)
+        png = _png(figura, estilo)
+
+        _cache_png[clave] = png
+        if len(_cache_png) > MAX_GRAFICOS_CACHE:
+            _cache_png.popitem(last=False)
+        return png
+
+def enrollment_histogram(simulacion, objetivo=None, intervalo=(5, 95), titulo="Distribución de Matrículas Proyectadas",
+                         estilo=None):
+    """Histograma de las matrículas simuladas con el intervalo y el objetivo marcados"""
+    valores = np.asarray(simulacion, dtype=float)
+    valores = valores[np.isfinite(valores)]
+
+    def dibujar(ax, e):
+        if len(valores) == 0:
+            ax.text(0.5, 0.5, "Sin simulación disponible", ha='center', va='center', transform=ax.transAxes)
+            return
+        bins = min(50, max(10, int(np.ptp(valores)) + 1))
+        ax.hist(valores, bins=bins, color=e['color'], alpha=0.8, edgecolor='white')
+        bajo, alto = np.percentile(valores, intervalo)
+        ax.axvspan(bajo, alto, color=e['color_secundario'], alpha=0.12,
+                   label=f"Intervalo P{intervalo[0]}-P{intervalo[1]}: {bajo:.0f} - {alto:.0f}")
+        if objetivo is not None:
+            ax.axvline(objetivo, color=e['color_objetivo'], linestyle='--', linewidth=2, label=f"Objetivo: {objetivo}")
+        ax.set_title(titulo, fontsize=e['fuente'] + 2)
+        ax.set_xlabel("Matrículas al cierre", fontsize=e['fuente'])
+        ax.set_ylabel("Simulaciones", fontsize=e['fuente'])
+        ax.legend(fontsize=e['fuente'] - 1, frameon=False)
+
+    return _renderizar('histograma', [valores, objetivo, list(intervalo), titulo], estilo, dibujar)
+
+def pacing_curve(fechas, real, plan=None, titulo="Ritmo de Avance", etiqueta="Matrículas acumuladas", estilo=None):
+    """Curva acumulada real frente al plan (ambas sobre las mismas fechas)"""
+    fechas = np.asarray(fechas, dtype='datetime64[D]')
+    real = np.asarray(real, dtype=float)
+    plan = None if plan is None else np.asarray(plan, dtype=float)
+
+    def dibujar(ax, e):
+        ax.plot(fechas, real, color=e['color'], linewidth=2, label="Real")
+        if plan is not None:
+            ax.plot(fechas, plan, color=e['color_secundario'], linewidth=1.5, linestyle='--', label="Plan")
+        ax.set_title(titulo, fontsize=e['fuente'] + 2)
+        ax.set_ylabel(etiqueta, fontsize=e['fuente'])
+        ax.tick_params(axis='x', labelrotation=30, labelsize=e['fuente'] - 1)
+        ax.legend(fontsize=e['fuente'] - 1, frameon=False)
+
+    return _renderizar('ritmo', [fechas, real, plan if plan is not None else 'sin plan', titulo, etiqueta], estilo, dibujar)
+
+def program_bars(programas, valores, titulo="Matrículas por Programa", etiqueta="Matrículas", max_programas=15,
+                 estilo=None):
+    """Barras horizontales por programa, ordenadas de mayor a menor"""
+    programas = np.asarray([str(p) for p in programas], dtype=object)
+    valores = np.asarray(valores, dtype=float)
+    orden = np.argsort(-valores, kind='stable')[:max_programas]
+    programas, valores = programas[orden], valores[orden]
+
+    def dibujar(ax, e):
+        posiciones = np.arange(len(valores))
+        ax.barh(posiciones, valores, color=e['color'])
+        ax.set_yticks(posiciones)
+        ax.set_yticklabels(programas, fontsize=e['fuente'] - 1)
+        ax.invert_yaxis()
+        for y, v in zip(posiciones, valores):
+            ax.text(v, y, f" {v:g}", va='center', fontsize=e['fuente'] - 1)
+        ax.set_title(titulo, fontsize=e['fuente'] + 2)
+        ax.set_xlabel(etiqueta, fontsize=e['fuente'])
+
+    return _renderizar('programas', [programas.astype(str).tolist(), valores, titulo, etiqueta], estilo, dibujar)
+
+def chart_file(png):
+    """Ruta de un archivo temporal con el PNG (FPDF necesita una ruta); se escribe una vez por contenido"""
+    nombre = hashlib.sha1(png).hexdigest()
+    ruta = os.path.join(tempfile.gettempdir(), f'grafico_{nombre}.png')
+    if not os.path.exists(ruta):
+        temporal = f'{ruta}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(png)
+        os.replace(temporal, ruta)
+    return ruta
+
+def chart_cache_stats():
+    """Aciertos, fallos y tamaño actual de la caché de gráficos"""
+    with _bloqueo:
+        return {**_estadisticas, 'graficos': len(_cache_png)}
@@ -0,0 +1,160 @@
+# utils/cohorts.py
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+TODOS_LOS_PROGRAMAS = 'Todos los programas'
+
+def _dias(fechas):
+    """Convertir fechas a días enteros y devolver la máscara de fechas vacías"""
+    valores = pd.to_datetime(pd.Series(fechas), errors='coerce').to_numpy(dtype='datetime64[D]')
+    return valores.astype(np.int64), np.isnat(valores)
+
+def build_cohort_calendar(df_calendario, marca=None):
+    """Ordenar el calendario por (Marca, Programa, Fecha inicio) para búsquedas binarias
+
+    Devuelve un diccionario con el calendario ordenado, el código de clave de
+    cada cohorte, la primera cohorte de cada clave y las claves compuestas
+    (clave, día de inicio) sobre las que se hace searchsorted.
+    """
+    calendario = df_calendario
+    if marca is not None and 'Marca' in calendario.columns:
+        calendario = calendario[calendario['Marca'] == marca]
+    calendario = calendario.dropna(subset=['Fecha inicio'])
+    calendario = calendario.sort_values(['Marca', 'Programa', 'Fecha inicio']).reset_index(drop=True)
+
+    claves = pd.MultiIndex.from_frame(calendario[['Marca', 'Programa']].astype(str))
+    codigos, uniques = claves.factorize()
+    inicio, _ = _dias(calendario['Fecha inicio'])
+
+    dia_min = int(inicio.min()) if len(inicio) else 0
+    dia_max = int(inicio.max()) if len(inicio) else 0
+    # El desplazamiento 0 queda reservado para fechas anteriores a todo el calendario
+    ancho = dia_max - dia_min + 3
+
+    primera = np.full(len(uniques), -1, dtype=np.int64)
+    if len(codigos):
+        es_primera = np.r_[True, codigos[1:] != codigos[:-1]]
+        primera[codigos[es_primera]] = np.flatnonzero(es_primera)
+
+    return {
+        'calendario': calendario,
+        'claves': uniques,
+        'codigos': np.asarray(codigos, dtype=np.int64),
+        'primera': primera,
+        'dia_min': dia_min,
+        'ancho': ancho,
+        'compuesto': np.asarray(codigos, dtype=np.int64) * ancho + (inicio - dia_min + 1),
+    }
+
+def assign_cohorts(df, indice, columna_fecha):
+    """Asignar cada fila a su cohorte con np.searchsorted sobre las fechas de inicio
+
+    La cohorte de una fila es la última de su (Marca, Programa) que empezó en o
+    antes de su fecha; las fechas anteriores a la primera cohorte (o vacías) se
+    asignan a la primera. Si el programa no tiene calendario propio se usa la
+    fila 'Todos los programas' de la marca. Devuelve -1 cuando no hay cohorte.
+    """
+    if df.empty or len(indice['compuesto']) == 0:
+        return np.full(len(df), -1, dtype=np.int64)
+
+    claves = indice['claves']
+    marcas = df['Marca'].astype(str)
+    codigo = claves.get_indexer(pd.MultiIndex.from_arrays([marcas, df['Programa'].astype(str)]))
+    sin_calendario = codigo < 0
+    if sin_calendario.any():
+        general = claves.get_indexer(pd.MultiIndex.from_arrays([marcas, pd.Series(TODOS_LOS_PROGRAMAS, index=df.index)]))
+        codigo = np.where(sin_calendario, general, codigo)
+
+    dias, nulos = _dias(df[columna_fecha])
+    desplazamiento = np.clip(dias - indice['dia_min'] + 1, 0, indice['ancho'] - 1)
+    compuesto = np.maximum(codigo, 0) * indice['ancho'] + desplazamiento
+
+    posicion = np.searchsorted(indice['compuesto'], compuesto, side='right') - 1
+    posicion_segura = np.clip(posicion, 0, len(indice['compuesto']) - 1)
+    misma_clave = (posicion >= 0) & (indice['codigos'][posicion_segura] == codigo)
+
+    primera = indice['primera'][np.maximum(codigo, 0)]
+    cohorte = np.where(misma_clave & ~nulos, posicion, primera)
+    return np.where(codigo >= 0, cohorte, -1)
+
+def split_new_remarketing(df_matriculados, indice):
+    """Clasificar matrículas en leads nuevos o remarketing según su cohorte
+
+    Una matrícula es de lead nuevo si el lead ingresó en o después del inicio de
+    la cohorte en la que se matriculó. Sin cohorte o sin fecha se considera
+    nuevo. Devuelve la cohorte asignada y una máscara booleana de remarketing.
+    """
+    columna = 'Fecha matrícula' if 'Fecha matrícula' in df_matriculados.columns else 'Fecha ingreso'
+    if columna == 'Fecha matrícula' and 'Fecha ingreso' in df_matriculados.columns:
+        fecha = df_matriculados['Fecha matrícula'].fillna(df_matriculados['Fecha ingreso'])
+        df_asignacion = df_matriculados[['Marca', 'Programa']].assign(_fecha=fecha)
+        cohorte = assign_cohorts(df_asignacion, indice, '_fecha')
+    else:
+        cohorte = assign_cohorts(df_matriculados, indice, columna)
+
+    if 'Fecha ingreso' not in df_matriculados.columns or len(cohorte) == 0:
+        return cohorte, np.zeros(len(df_matriculados), dtype=bool)
+
+    # La comparación con el inicio se hace con la marca de tiempo completa
+    ingreso = pd.to_datetime(df_matriculados['Fecha ingreso'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+    ingreso_nulo = np.isnat(ingreso)
+    inicio = indice['calendario']['Fecha inicio'].to_numpy(dtype='datetime64[ns]')
+    inicio_cohorte = inicio[np.maximum(cohorte, 0)] if len(inicio) else np.full(len(cohorte), np.datetime64('NaT', 'ns'))
+    remarketing = (cohorte >= 0) & ~ingreso_nulo & (ingreso < inicio_cohorte)
+
+    return cohorte, remarketing
+
+def cohort_metrics(df_matriculados, df_leads, df_calendario, marca=None, fecha_corte=None):
+    """Calcular métricas por cohorte en una sola pasada
+
+    Asigna leads (por Fecha ingreso) y matrículas (por Fecha matrícula) a su
+    cohorte y agrega con bincount: leads, matrículas, nuevos/remarketing,
+    tasa de conversión y porcentaje de tiempo transcurrido de cada ventana.
+    """
+    if fecha_corte is None:
+        fecha_corte = datetime.now()
+
+    indice = build_cohort_calendar(df_calendario, marca)
+    calendario = indice['calendario']
+    num_cohortes = len(calendario)
+
+    if marca is not None:
+        df_matriculados = df_matriculados[df_matriculados['Marca'] == marca]
+        df_leads = df_leads[df_leads['Marca'] == marca]
+
+    cohorte_leads = assign_cohorts(df_leads, indice, 'Fecha ingreso')
+    cohorte_mat, remarketing = split_new_remarketing(df_matriculados, indice)
+
+    def contar(cohortes, pesos=None):
+        validas = cohortes >= 0
+        w = None if pesos is None else pesos[validas]
+        return np.bincount(cohortes[validas], weights=w, minlength=num_cohortes)[:num_cohortes]
+
+    leads = contar(cohorte_leads)
+    matriculas = contar(cohorte_mat)
+    mat_remarketing = contar(cohorte_mat, remarketing.astype(float))
+
+    # Tiempo transcurrido de cada ventana al corte
+    inicio = calendario['Fecha inicio']
+    fin = calendario['Fecha fin']
+    duracion = (fin - inicio).dt.total_seconds().to_numpy()
+    transcurrido = (pd.Timestamp(fecha_corte) - inicio).dt.total_seconds().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_tiempo = np.where(duracion > 0, np.clip(transcurrido / duracion * 100, 0, 100), 0)
+        tasa = np.where(leads > 0, matriculas / np.maximum(leads, 1) * 100, 0)
+        pct_remarketing = np.where(matriculas > 0, mat_remarketing / np.maximum(matriculas, 1) * 100, 0)
+
+    resultado = calendario[['Marca', 'Programa', 'Fecha inicio', 'Fecha fin']].copy()
+    if 'Tipo' in calendario.columns:
+        resultado['Tipo'] = calendario['Tipo']
+    resultado['Leads'] = leads.astype(int)
+    resultado['Matrículas'] = matriculas.astype(int)
+    resultado['Matrículas Nuevos'] = (matriculas - mat_remarketing).astype(int)
+    resultado['Matrículas Remarketing'] = mat_remarketing.astype(int)
+    resultado['% Remarketing'] = np.round(pct_remarketing, 1)
+    resultado['Tasa Conversión (%)'] = np.round(tasa, 2)
+    resultado['Tiempo Transcurrido (%)'] = np.round(pct_tiempo, 1)
+
+    return resultado
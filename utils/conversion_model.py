@@ -0,0 +1,210 @@
+# utils/conversion_model.py
+
+import pandas as pd
+import numpy as np
+
+def fit_beta_prior(leads, matriculas, grupos=None):
+    """Ajustar hiperparámetros beta por método de momentos (empirical Bayes)
+
+    Ajusta un prior beta por grupo (por ejemplo, por marca) sobre todos los
+    programas a la vez. Devuelve arrays alpha y beta con un valor por grupo y
+    el índice de grupo de cada programa.
+    """
+    leads = np.asarray(leads, dtype=float)
+    matriculas = np.minimum(np.asarray(matriculas, dtype=float), leads)
+
+    if grupos is None:
+        codigos = np.zeros(len(leads), dtype=np.int64)
+        num_grupos = 1
+    else:
+        codigos, uniques = pd.factorize(pd.Series(grupos), use_na_sentinel=False)
+        num_grupos = len(uniques)
+
+    # Solo los programas con leads aportan información sobre la tasa
+    con_leads = leads > 0
+    n = np.where(con_leads, leads, 0)
+    k = np.where(con_leads, matriculas, 0)
+
+    suma_n = np.bincount(codigos, weights=n, minlength=num_grupos)
+    suma_k = np.bincount(codigos, weights=k, minlength=num_grupos)
+    num_programas = np.bincount(codigos, weights=con_leads.astype(float), minlength=num_grupos)
+
+    # Media ponderada por leads
+    mu = np.where(suma_n > 0, suma_k / np.where(suma_n > 0, suma_n, 1), 0)
+    mu = np.clip(mu, 1e-6, 1 - 1e-6)
+
+    # Varianza observada ponderada por leads. Con Var(tasa_i) = v + (mu(1-mu) - v) / n_i,
+    # su esperanza es v (1 - K/N) + mu(1-mu) K/N (K programas, N leads): el ruido
+    # binomial que le corresponde es mu(1-mu) K/N, no el promedio sin ponderar de 1/n
+    tasa = np.where(con_leads, k / np.where(con_leads, n, 1), 0)
+    desvio = n * (tasa - mu[codigos])**2
+    var_observada = np.bincount(codigos, weights=desvio, minlength=num_grupos) / np.where(suma_n > 0, suma_n, 1)
+    programas_por_lead = num_programas / np.where(suma_n > 0, suma_n, 1)
+    var_binomial = mu * (1 - mu) * programas_por_lead
+
+    # alpha + beta = mu(1 - mu) / var_entre_programas - 1
+    # Sin heterogeneidad adicional el prior se vuelve muy concentrado (pooling total)
+    var_entre = (var_observada - var_binomial) / np.maximum(1 - programas_por_lead, 1e-9)
+    concentracion_max = np.maximum(suma_n, 1.0)
+    concentracion = np.where(
+        var_entre > 0,
+        mu * (1 - mu) / np.where(var_entre > 0, var_entre, 1) - 1,
+        concentracion_max
+    )
+    concentracion = np.clip(concentracion, 1.0, concentracion_max)
+
+    alpha = mu * concentracion
+    beta = (1 - mu) * concentracion
+
+    return alpha, beta, codigos
+
+def estimate_program_conversion(tabla_programas, nivel_confianza=0.90, columna_grupo=None):
+    """Estimar tasas de conversión por programa con contracción beta-binomial
+
+    Recibe la tabla de analyze_programs (columnas 'Leads' y 'Matrículas') y
+    devuelve un diccionario con la tabla enriquecida con la tasa ajustada, el
+    intervalo de credibilidad y los parámetros posteriores de cada programa.
+    """
+    # scipy.special (inversa de la beta incompleta) es mucho más liviano de importar que scipy.stats
+    from scipy import special
+
+    result = {}
+
+    df = tabla_programas.copy()
+    if df.empty:
+        for col in ['Tasa Ajustada (%)', 'IC Inferior (%)', 'IC Superior (%)', 'alpha', 'beta']:
+            df[col] = pd.Series(dtype=float)
+        result['tabla'] = df
+        result['hiperparametros'] = pd.DataFrame(columns=['Grupo', 'alpha', 'beta'])
+        return result
+
+    leads = df['Leads'].to_numpy(dtype=float)
+    matriculas = np.minimum(df['Matrículas'].to_numpy(dtype=float), leads)
+    grupos = df[columna_grupo].to_numpy() if columna_grupo is not None else None
+
+    alpha_prior, beta_prior, codigos = fit_beta_prior(leads, matriculas, grupos)
+
+    # Posterior conjugada de cada programa
+    alpha_post = alpha_prior[codigos] + matriculas
+    beta_post = beta_prior[codigos] + (leads - matriculas)
+
+    cola = (1 - nivel_confianza) / 2
+    ic_inferior = special.betaincinv(alpha_post, beta_post, cola)
+    ic_superior = special.betaincinv(alpha_post, beta_post, 1 - cola)
+
+    df['Tasa Ajustada (%)'] = np.round(alpha_post / (alpha_post + beta_post) * 100, 2)
+    df['IC Inferior (%)'] = np.round(ic_inferior * 100, 2)
+    df['IC Superior (%)'] = np.round(ic_superior * 100, 2)
+    df['alpha'] = alpha_post
+    df['beta'] = beta_post
+
+    if grupos is not None:
+        etiquetas = pd.unique(pd.Series(grupos))
+    else:
+        etiquetas = ['Todos']
+
+    result['tabla'] = df
+    result['hiperparametros'] = pd.DataFrame({
+        'Grupo': etiquetas,
+        'alpha': alpha_prior,
+        'beta': beta_prior
+    })
+
+    return result
+
+def project_program_results(metrics, estimacion, pronostico=None, num_simulations=2000, seed=None):
+    """Proyectar matrículas por programa con las tasas posteriores de cada uno
+
+    Reparte los leads simulados de la inversión restante según la participación
+    histórica de leads de cada programa y convierte con la beta posterior del
+    programa. Todas las simulaciones y programas se generan en un solo bloque.
+    La inversión restante y el CPL salen del pronóstico de ritmo, igual que en
+    project_results; sin pronóstico no hay inversión pendiente que proyectar.
+    """
+    # Importación diferida: calculations importa este módulo
+    from utils.calculations import remaining_investment, projected_cpl
+
+    rng = np.random.default_rng(seed)
+    df = estimacion['tabla']
+
+    columnas = ['Programa', 'Matrículas Proyectadas', 'Matrículas P5', 'Matrículas P95']
+    if df.empty:
+        return pd.DataFrame(columns=columnas)
+
+    inversion_restante = remaining_investment(pronostico)
+    cpl_medio = projected_cpl(metrics, pronostico, inversion_restante)
+
+    # Leads totales con el mismo modelo de CPL que project_results
+    cpl_simulado = np.maximum(1, rng.normal(cpl_medio, cpl_medio * 0.15, size=num_simulations))
+    leads_totales = inversion_restante / cpl_simulado
+
+    leads = df['Leads'].to_numpy(dtype=float)
+    participacion = leads / leads.sum() if leads.sum() > 0 else np.full(len(leads), 1 / len(leads))
+
+    tasas = rng.beta(df['alpha'].to_numpy(), df['beta'].to_numpy(), size=(num_simulations, len(df)))
+    matriculas = leads_totales[:, None] * participacion[None, :] * tasas
+
+    p5, p95 = np.percentile(matriculas, [5, 95], axis=0)
+
+    return pd.DataFrame({
+        'Programa': df['Programa'].to_numpy(),
+        'Matrículas Proyectadas': np.round(matriculas.mean(axis=0), 1),
+        'Matrículas P5': np.round(p5, 1),
+        'Matrículas P95': np.round(p95, 1)
+    }).sort_values('Matrículas Proyectadas', ascending=False)
+
+def bootstrap_program_rates(tabla_programas, num_resamples=10000, top_n=5, umbral_conversion=5.0,
+                            nivel_confianza=0.90, seed=None):
+    """Intervalos bootstrap y estabilidad del ranking para la tabla de programas
+
+    En lugar de remuestrear filas, redistribuye el total de leads entre
+    programas con una multinomial y genera las matrículas de cada programa con
+    una binomial, todo sobre arrays (remuestras x programas) en un solo paso.
+    """
+    rng = np.random.default_rng(seed)
+
+    columnas = ['Programa', 'Leads', 'Matrículas', 'Tasa Conversión (%)', 'IC Bootstrap Inferior (%)',
+                'IC Bootstrap Superior (%)', f'Prob. Conversión < {umbral_conversion:g}% (%)',
+                f'Estabilidad Top {top_n} (%)']
+    if tabla_programas.empty:
+        return pd.DataFrame(columns=columnas)
+
+    leads = tabla_programas['Leads'].to_numpy(dtype=np.int64)
+    matriculas = np.minimum(tabla_programas['Matrículas'].to_numpy(dtype=np.int64), leads)
+    total_leads = leads.sum()
+    num_programas = len(leads)
+
+    tasa = np.where(leads > 0, matriculas / np.maximum(leads, 1), 0.0)
+
+    # 1. Remuestreo de leads por programa (multinomial sobre el total)
+    if total_leads > 0:
+        leads_b = rng.multinomial(total_leads, leads / total_leads, size=num_resamples)
+    else:
+        leads_b = np.zeros((num_resamples, num_programas), dtype=np.int64)
+
+    # 2. Matrículas de cada remuestra con la tasa observada del programa
+    matriculas_b = rng.binomial(leads_b, tasa[None, :])
+    tasa_b = np.where(leads_b > 0, matriculas_b / np.maximum(leads_b, 1), tasa[None, :]) * 100
+
+    cola = (1 - nivel_confianza) / 2 * 100
+    ic_inferior, ic_superior = np.percentile(tasa_b, [cola, 100 - cola], axis=0)
+    prob_baja = (tasa_b < umbral_conversion).mean(axis=0) * 100
+
+    # 3. Frecuencia con que cada programa queda en el top por matrículas
+    k = min(top_n, num_programas)
+    if k < num_programas:
+        top = np.argpartition(-matriculas_b, k - 1, axis=1)[:, :k]
+        estabilidad = np.bincount(top.ravel(), minlength=num_programas) / num_resamples * 100
+    else:
+        estabilidad = np.full(num_programas, 100.0)
+
+    return pd.DataFrame({
+        'Programa': tabla_programas['Programa'].to_numpy(),
+        'Leads': leads,
+        'Matrículas': matriculas,
+        'Tasa Conversión (%)': np.round(tasa * 100, 2),
+        'IC Bootstrap Inferior (%)': np.round(ic_inferior, 2),
+        'IC Bootstrap Superior (%)': np.round(ic_superior, 2),
+        f'Prob. Conversión < {umbral_conversion:g}% (%)': np.round(prob_baja, 1),
+        f'Estabilidad Top {top_n} (%)': np.round(estabilidad, 1)
+    })
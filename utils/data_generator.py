@@ -4,15 +4,22 @@ import pandas as pd
 import numpy as np
 import os
 from datetime import datetime, timedelta
-from faker import Faker
 import random
 
-fake = Faker('es_ES')
+_fakers = {}
+
+def _faker(locale=None):
+    """Instancia de Faker por locale, creada al primer uso (Faker es costoso de importar e instanciar)"""
+    if locale not in _fakers:
+        from faker import Faker
+        _fakers[locale] = Faker(locale) if locale else Faker()
+    return _fakers[locale]
 
 def generate_sample_data():
     """
     Genera archivos de muestra para probar la aplicación con datos más realistas
     """
+    fake = _faker('es_ES')
     os.makedirs('sample_data', exist_ok=True)
     
     # Definir marcas y programas con datos más realistas para Colombia
@@ -435,7 +442,7 @@ def generate_demo_data(marca):
     """
     Genera datos de demostración en memoria para la visualización del dashboard
     """
-    fake = Faker()
+    fake = _faker()
     random.seed(42)
     np.random.seed(42)
     
@@ -40,6 +40,34 @@ def normalize_program_name(name):
     
     return normalized
 
+def pack_lead_ids(ids):
+    """Empaquetar los 'ID lead' en claves enteras uint64 (hash estable del texto)
+    
+    Permite unir y comparar leads entre archivos con operaciones numéricas en
+    lugar de comparaciones de cadenas. Los IDs vacíos quedan con clave 0. Un
+    ID leído como flotante entero (101.0, típico de una columna numérica con
+    vacíos) tiene la misma clave que '101'.
+    """
+    serie = pd.Series(ids)
+    nulos = serie.isna().to_numpy()
+    texto = serie.astype(str).str.strip().to_numpy(dtype=object)
+
+    if pd.api.types.is_float_dtype(serie):
+        flotantes = ~nulos
+    elif serie.dtype == object:
+        flotantes = np.fromiter((isinstance(v, (float, np.floating)) for v in serie.to_numpy()),
+                                dtype=bool, count=len(serie)) & ~nulos
+    else:
+        flotantes = np.zeros(len(serie), dtype=bool)
+    if flotantes.any():
+        valores = serie.to_numpy()[flotantes].astype(float)
+        enteros = np.isfinite(valores) & (valores == np.trunc(valores)) & (np.abs(valores) < 2.0 ** 63)
+        texto[np.flatnonzero(flotantes)[enteros]] = [str(v) for v in valores[enteros].astype(np.int64)]
+
+    claves = pd.util.hash_array(texto, categorize=False)
+    claves[nulos] = 0
+    return claves
+
 def validate_dataframe(df, required_columns, source_name):
     """Valida que un DataFrame tenga las columnas requeridas"""
     if df.empty:
@@ -60,23 +88,33 @@ def load_data(file):
         return pd.read_excel(file)
     return None
 
-def process_matriculados(file):
-    """Procesar el archivo de matriculados"""
+def read_sheet(file, sheet_name):
+    """Leer la hoja `sheet_name` de un Excel o, si no existe, la primera hoja"""
     try:
-        # Primero intentamos con la hoja 'matriculados'
-        df = pd.read_excel(file, sheet_name="matriculados")
+        # Primero intentamos con la hoja pedida
+        return pd.read_excel(file, sheet_name=sheet_name)
     except Exception as e:
         # Si falla, mostrar las hojas disponibles y usar la primera
+        if hasattr(file, 'seek'):
+            file.seek(0)
         excel_file = pd.ExcelFile(file)
         sheet_names = excel_file.sheet_names
         
         if not sheet_names:
-            raise ValueError(f"El archivo no contiene hojas de cálculo: {file.name}")
+            raise ValueError(f"El archivo no contiene hojas de cálculo: {getattr(file, 'name', file)}")
         
         # Usar la primera hoja disponible
-        sheet_name = sheet_names[0]
-        print(f"Hoja 'matriculados' no encontrada. Usando primera hoja: '{sheet_name}'")
-        df = pd.read_excel(file, sheet_name=sheet_name)
+        print(f"Hoja '{sheet_name}' no encontrada. Usando primera hoja: '{sheet_names[0]}'")
+        return excel_file.parse(sheet_names[0])
+
+def process_matriculados(file, mapeo_programas=None):
+    """Procesar el archivo de matriculados
+    
+    mapeo_programas: función opcional (p. ej. program_names.program_name_mapper)
+    que lleva los nombres de programa a su forma canónica del calendario.
+    """
+    # Acepta también el DataFrame ya leído con read_sheet (p. ej. tras perfilar su calidad)
+    df = file.copy() if isinstance(file, pd.DataFrame) else read_sheet(file, "matriculados")
     
     # Validar estructura mínima requerida
     required_columns = ["ID lead", "Marca", "Programa"]
@@ -97,26 +135,19 @@ def process_matriculados(file):
         df['Programa'] = df['Programa'].apply(normalize_program_name)
         # Eliminar filas con programa vacío después de normalización
         df = df[df['Programa'] != '']
+        if mapeo_programas is not None:
+            df = df.assign(Programa=mapeo_programas(df['Programa']))
     
     return df
 
-def process_leads(file):
-    """Procesar el archivo de leads activos"""
-    try:
-        # Primero intentamos con la hoja 'leads_activos'
-        df = pd.read_excel(file, sheet_name="leads_activos")
-    except Exception as e:
-        # Si falla, mostrar las hojas disponibles y usar la primera
-        excel_file = pd.ExcelFile(file)
-        sheet_names = excel_file.sheet_names
-        
-        if not sheet_names:
-            raise ValueError(f"El archivo no contiene hojas de cálculo: {file.name}")
-        
-        # Usar la primera hoja disponible
-        sheet_name = sheet_names[0]
-        print(f"Hoja 'leads_activos' no encontrada. Usando primera hoja: '{sheet_name}'")
-        df = pd.read_excel(file, sheet_name=sheet_name)
+def process_leads(file, mapeo_programas=None):
+    """Procesar el archivo de leads activos
+    
+    mapeo_programas: función opcional (p. ej. program_names.program_name_mapper)
+    que lleva los nombres de programa a su forma canónica del calendario.
+    """
+    # Acepta también el DataFrame ya leído con read_sheet (p. ej. tras perfilar su calidad)
+    df = file.copy() if isinstance(file, pd.DataFrame) else read_sheet(file, "leads_activos")
     
     # Validar estructura mínima requerida
     required_columns = ["ID lead", "Marca", "Programa"]
@@ -135,6 +166,8 @@ def process_leads(file):
         df['Programa'] = df['Programa'].apply(normalize_program_name)
         # Eliminar filas con programa vacío después de normalización
         df = df[df['Programa'] != '']
+        if mapeo_programas is not None:
+            df = df.assign(Programa=mapeo_programas(df['Programa']))
     
     return df
 
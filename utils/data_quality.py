@@ -0,0 +1,144 @@
+# utils/data_quality.py
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from utils.data_processor import pack_lead_ids
+
+# Proporción máxima de filas afectadas antes de rechazar el archivo
+UMBRALES_CALIDAD = {
+    'ID vacío': 0.05,
+    'Programa vacío': 0.10,
+    'Fecha inválida': 0.10,
+    'Fecha futura': 0.05,
+    'Matrícula antes del ingreso': 0.05,
+    'ID duplicado': 0.10,
+    'Marca distinta': 0.20,
+}
+
+COLUMNAS_FECHA = ['Fecha ingreso', 'Fecha matrícula', 'Fecha', 'Fecha inicio', 'Fecha fin']
+
+def _es_texto(serie):
+    """Columna de texto o mixta (object), donde pueden venir cadenas vacías"""
+    return serie.dtype == object or pd.api.types.is_string_dtype(serie)
+
+def _fechas(serie):
+    """Fechas como datetime64 y máscara de valores no nulos que no se pudieron convertir"""
+    fechas = pd.to_datetime(serie, errors='coerce')
+    invalidas = fechas.isna().to_numpy() & serie.notna().to_numpy()
+    if _es_texto(serie):
+        # Las cadenas vacías cuentan como nulos, no como fechas inválidas
+        invalidas = invalidas & (serie.astype(str).str.strip().to_numpy() != '')
+    return fechas.to_numpy(dtype='datetime64[ns]'), invalidas
+
+def profile_dataframe(df, fuente, marca=None, fecha_corte=None, umbrales=None):
+    """Perfil de calidad de un archivo cargado, calculado en una sola pasada vectorizada
+
+    Revisa tasas de nulos por columna, fechas que no se pueden interpretar,
+    fechas futuras, matrículas anteriores al ingreso, 'ID lead' repetidos y
+    filas de otra marca distinta de `marca`. Conviene aplicarlo al DataFrame
+    leído antes de process_*, que convierte y descarta filas en silencio.
+    Devuelve los chequeos con filas afectadas y la decisión de aceptar o
+    rechazar según `umbrales` (proporción máxima por chequeo).
+    """
+    umbrales = {**UMBRALES_CALIDAD, **(umbrales or {})}
+    ahora = np.datetime64(pd.Timestamp(fecha_corte if fecha_corte is not None else datetime.now()), 'ns')
+    filas = len(df)
+
+    conteos = {}
+    muestras = {}
+
+    def registrar(chequeo, mascara):
+        conteos[chequeo] = int(mascara.sum())
+        if conteos[chequeo]:
+            muestras[chequeo] = np.flatnonzero(mascara)[:5]
+
+    # 1. Nulos por columna (un solo isna sobre todo el frame)
+    nulos = df.isna()
+    tasa_nulos = nulos.mean() if filas else pd.Series(0.0, index=df.columns)
+
+    if 'ID lead' in df.columns:
+        ids = df['ID lead']
+        vacio = nulos['ID lead'].to_numpy()
+        if _es_texto(ids):
+            vacio = vacio | (ids.astype(str).str.strip().to_numpy() == '')
+        registrar('ID vacío', vacio)
+
+        claves = pack_lead_ids(ids)
+        duplicado = pd.Series(claves).duplicated(keep='first').to_numpy() & ~vacio
+        registrar('ID duplicado', duplicado)
+
+    if 'Programa' in df.columns:
+        programa = df['Programa']
+        vacio = nulos['Programa'].to_numpy()
+        if _es_texto(programa):
+            vacio = vacio | (programa.astype(str).str.strip().to_numpy() == '')
+        registrar('Programa vacío', vacio)
+
+    # 2. Fechas: inválidas tras la conversión y posteriores a la fecha de corte
+    fechas = {}
+    invalidas = np.zeros(filas, dtype=bool)
+    futuras = np.zeros(filas, dtype=bool)
+    for columna in COLUMNAS_FECHA:
+        if columna not in df.columns:
+            continue
+        valores, no_validas = _fechas(df[columna])
+        fechas[columna] = valores
+        invalidas |= no_validas
+        # 'Fecha fin' del calendario puede estar en el futuro
+        if columna not in ('Fecha inicio', 'Fecha fin'):
+            futuras |= ~np.isnat(valores) & (valores > ahora)
+    if fechas:
+        registrar('Fecha inválida', invalidas)
+        registrar('Fecha futura', futuras)
+
+    if 'Fecha ingreso' in fechas and 'Fecha matrícula' in fechas:
+        ingreso, matricula = fechas['Fecha ingreso'], fechas['Fecha matrícula']
+        registrar('Matrícula antes del ingreso', ~np.isnat(ingreso) & ~np.isnat(matricula) & (matricula < ingreso))
+
+    # 3. Marca distinta de la seleccionada
+    if marca is not None and 'Marca' in df.columns:
+        marcas = df['Marca'].astype(str).str.strip().str.upper().to_numpy()
+        registrar('Marca distinta', df['Marca'].notna().to_numpy() & (marcas != str(marca).strip().upper()))
+
+    chequeos = pd.DataFrame({
+        'Chequeo': list(conteos.keys()),
+        'Filas Afectadas': list(conteos.values()),
+    })
+    chequeos['Proporción (%)'] = np.round(chequeos['Filas Afectadas'] / max(filas, 1) * 100, 2)
+    chequeos['Umbral (%)'] = [umbrales.get(c, 1.0) * 100 for c in chequeos['Chequeo']]
+    chequeos['Estado'] = np.where(chequeos['Proporción (%)'] > chequeos['Umbral (%)'], 'Rechazo',
+                                  np.where(chequeos['Filas Afectadas'] > 0, 'Advertencia', 'OK'))
+    chequeos['Filas de Ejemplo'] = [', '.join(str(i + 2) for i in muestras.get(c, [])) for c in chequeos['Chequeo']]
+
+    motivos = [f"{fila['Chequeo']}: {fila['Filas Afectadas']} filas ({fila['Proporción (%)']}%)"
+               for _, fila in chequeos[chequeos['Estado'] == 'Rechazo'].iterrows()]
+    if filas == 0:
+        motivos.append('Archivo sin filas')
+
+    return {
+        'fuente': fuente,
+        'filas': filas,
+        'nulos': (tasa_nulos * 100).round(2),
+        'chequeos': chequeos,
+        'aceptado': not motivos,
+        'motivos': motivos,
+    }
+
+def quality_report(perfiles):
+    """Tabla compacta con los chequeos de varios archivos para mostrar en la app
+
+    perfiles es una lista de resultados de profile_dataframe. Las filas de
+    ejemplo usan la numeración de Excel (la fila 2 es el primer registro).
+    """
+    tablas = []
+    for perfil in perfiles:
+        tabla = perfil['chequeos'].copy()
+        tabla.insert(0, 'Archivo', perfil['fuente'])
+        tabla.insert(1, 'Filas', perfil['filas'])
+        tablas.append(tabla)
+    if not tablas:
+        return pd.DataFrame(columns=['Archivo', 'Filas', 'Chequeo', 'Filas Afectadas', 'Proporción (%)',
+                                     'Umbral (%)', 'Estado', 'Filas de Ejemplo'])
+    return pd.concat(tablas, ignore_index=True)
@@ -0,0 +1,171 @@
+# utils/forecasting.py
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from utils.investment_index import build_investment_index, cumulative_investment
+
+def budget_from_plan(df_plan_mensual):
+    """Presupuesto total por marca a partir de plan_mensual"""
+    if df_plan_mensual is None or df_plan_mensual.empty or 'Presupuesto total mes' not in df_plan_mensual.columns:
+        return pd.Series(dtype=float)
+    presupuesto = pd.to_numeric(df_plan_mensual['Presupuesto total mes'], errors='coerce').fillna(0)
+    return presupuesto.groupby(df_plan_mensual['Marca']).sum()
+
+def convocatoria_end(df_calendario, marca):
+    """Fecha de fin de la convocatoria de una marca
+
+    Usa la fila 'Todos los programas' si existe; si no, la fecha de fin más
+    tardía entre los programas de la marca. Devuelve None si no hay datos.
+    """
+    if df_calendario is None or df_calendario.empty:
+        return None
+    calendario = df_calendario[df_calendario['Marca'] == marca]
+    general = calendario[calendario['Programa'] == 'Todos los programas']
+    if not general.empty:
+        calendario = general
+    fecha_fin = calendario['Fecha fin'].max()
+    return fecha_fin if pd.notna(fecha_fin) else None
+
+def fit_holt(series, alphas=(0.1, 0.2, 0.3, 0.5, 0.7), betas=(0.01, 0.05, 0.1, 0.2)):
+    """Ajustar suavizamiento de Holt (tendencia lineal) a muchas series a la vez
+
+    series es una matriz (series x días). Se evalúa toda la rejilla de
+    parámetros sobre todas las series en un único recorrido temporal y se
+    elige, para cada serie, la combinación con menor error cuadrático de un
+    paso. Devuelve nivel y tendencia finales y los parámetros elegidos.
+    """
+    series = np.asarray(series, dtype=float)
+    num_series, num_dias = series.shape
+
+    rejilla_a, rejilla_b = np.meshgrid(np.asarray(alphas, dtype=float), np.asarray(betas, dtype=float), indexing='ij')
+    a = rejilla_a.ravel()[:, None]
+    b = rejilla_b.ravel()[:, None]
+    num_parametros = a.shape[0]
+
+    # Inicialización con la primera semana
+    inicio = min(7, num_dias)
+    nivel = np.broadcast_to(series[:, :inicio].mean(axis=1), (num_parametros, num_series)).copy()
+    tendencia = np.zeros((num_parametros, num_series))
+    error = np.zeros((num_parametros, num_series))
+
+    for t in range(inicio, num_dias):
+        y = series[:, t]
+        prediccion = nivel + tendencia
+        error += (y - prediccion)**2
+        nivel_nuevo = a * y + (1 - a) * prediccion
+        tendencia = b * (nivel_nuevo - nivel) + (1 - b) * tendencia
+        nivel = nivel_nuevo
+
+    mejor = error.argmin(axis=0)
+    columnas = np.arange(num_series)
+    return {
+        'nivel': nivel[mejor, columnas],
+        'tendencia': tendencia[mejor, columnas],
+        'alpha': a[mejor, 0],
+        'beta': b[mejor, 0],
+        'rmse': np.sqrt(error[mejor, columnas] / max(1, num_dias - inicio)),
+    }
+
+def forecast_holt(ajuste, horizonte):
+    """Suma pronosticada de los próximos días (sin valores negativos) para cada serie"""
+    horizonte = np.broadcast_to(np.asarray(horizonte, dtype=np.int64), ajuste['nivel'].shape)
+    max_h = int(horizonte.max()) if horizonte.size else 0
+    if max_h <= 0:
+        return np.zeros_like(ajuste['nivel'])
+    pasos = np.arange(1, max_h + 1)
+    trayectoria = np.maximum(ajuste['nivel'][:, None] + ajuste['tendencia'][:, None] * pasos[None, :], 0)
+    trayectoria[pasos[None, :] > horizonte[:, None]] = 0
+    return trayectoria.sum(axis=1)
+
+def forecast_pacing(df_leads, df_plan_mensual, df_calendario, df_inversion=None, indice_inversion=None,
+                    fecha_corte=None):
+    """Pronosticar inversión y leads restantes por marca hasta el fin de la convocatoria
+
+    Arma una matriz diaria con los leads de cada marca y el gasto de cada
+    (marca, canal), ajusta Holt a todas las series juntas y proyecta hasta la
+    fecha de fin del calendario. El gasto pronosticado se limita al presupuesto
+    restante del plan, y los leads pronosticados con él. Devuelve un diccionario por marca apto para pasar como
+    `pronostico` a project_results.
+    """
+    if fecha_corte is None:
+        fecha_corte = datetime.now()
+    corte = np.datetime64(pd.Timestamp(fecha_corte), 'D').astype(np.int64)
+
+    if indice_inversion is None:
+        indice_inversion = build_investment_index(df_inversion)
+
+    presupuesto = budget_from_plan(df_plan_mensual)
+    marcas = pd.Index(pd.unique(pd.concat([
+        pd.Series(presupuesto.index, dtype=object),
+        pd.Series(df_leads['Marca'].dropna().unique(), dtype=object)
+    ], ignore_index=True))).astype(str)
+    if len(marcas) == 0:
+        return {}
+
+    # Rango común de días hasta la fecha de corte
+    fechas_leads = pd.to_datetime(df_leads['Fecha ingreso'], errors='coerce').to_numpy(dtype='datetime64[D]').astype(np.int64)
+    validas = (fechas_leads > np.iinfo(np.int64).min) & (fechas_leads <= corte)
+    candidatos = [corte - 27]
+    if validas.any():
+        candidatos.append(fechas_leads[validas].min())
+    if len(indice_inversion['dias']):
+        candidatos.append(indice_inversion['dias'].min())
+    dia_min = int(min(candidatos))
+    num_dias = int(corte - dia_min + 1)
+
+    # Filas 0..M-1: leads por marca; filas M..: gasto por (marca, canal)
+    codigo_marca = marcas.get_indexer(df_leads['Marca'].astype(str))
+    ok = validas & (codigo_marca >= 0)
+    leads = np.bincount(codigo_marca[ok] * num_dias + (fechas_leads[ok] - dia_min),
+                        minlength=len(marcas) * num_dias).reshape(len(marcas), num_dias)
+
+    grupos = indice_inversion['grupos']
+    en_rango = indice_inversion['dias'] <= corte
+    celda = indice_inversion['codigos'][en_rango] * num_dias + (indice_inversion['dias'][en_rango] - dia_min)
+    gasto = np.bincount(celda, weights=indice_inversion['diario'][en_rango],
+                        minlength=len(grupos) * num_dias).reshape(len(grupos), num_dias)
+
+    ajuste = fit_holt(np.vstack([leads, np.maximum(gasto, 0)]))
+
+    # Horizonte de cada serie según la fecha de fin de su marca
+    dias_restantes = np.zeros(len(marcas), dtype=np.int64)
+    fechas_fin = {}
+    for i, marca in enumerate(marcas):
+        fecha_fin = convocatoria_end(df_calendario, marca)
+        fechas_fin[marca] = fecha_fin
+        if fecha_fin is not None:
+            dias_restantes[i] = max(0, int(np.datetime64(pd.Timestamp(fecha_fin), 'D').astype(np.int64) - corte))
+    marca_grupo = marcas.get_indexer(np.asarray(grupos.get_level_values(0)).astype(str)) if len(grupos) else np.array([], dtype=np.int64)
+    horizonte = np.concatenate([dias_restantes, np.where(marca_grupo >= 0, dias_restantes[np.maximum(marca_grupo, 0)], 0)])
+
+    pronostico_series = forecast_holt(ajuste, horizonte)
+    leads_pronosticados = pronostico_series[:len(marcas)]
+    gasto_pronosticado = np.bincount(np.maximum(marca_grupo, 0), weights=np.where(marca_grupo >= 0, pronostico_series[len(marcas):], 0),
+                                     minlength=len(marcas))
+
+    resultado = {}
+    for i, marca in enumerate(marcas):
+        inversion_acumulada = cumulative_investment(indice_inversion, marca, fecha_corte)
+        presupuesto_total = float(presupuesto.get(marca, 0.0))
+        leads_marca = float(leads_pronosticados[i])
+        if presupuesto_total > 0:
+            inversion_restante = min(max(0.0, presupuesto_total - inversion_acumulada), gasto_pronosticado[i])
+            # Si el presupuesto corta el gasto, los leads se reducen en la misma
+            # proporción (se mantiene el CPL del ritmo pronosticado)
+            if gasto_pronosticado[i] > 0 and inversion_restante < gasto_pronosticado[i]:
+                leads_marca *= inversion_restante / gasto_pronosticado[i]
+        else:
+            inversion_restante = float(gasto_pronosticado[i])
+        resultado[marca] = {
+            'presupuesto_total': presupuesto_total,
+            'inversion_acumulada': inversion_acumulada,
+            'fecha_fin': fechas_fin[marca],
+            'dias_restantes': int(dias_restantes[i]),
+            'inversion_pronosticada': float(gasto_pronosticado[i]),
+            'inversion_restante': float(inversion_restante),
+            'leads_pronosticados': leads_marca,
+        }
+
+    return resultado
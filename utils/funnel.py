@@ -0,0 +1,169 @@
+# utils/funnel.py
+
+import pandas as pd
+import numpy as np
+
+from utils.data_processor import pack_lead_ids
+
+# Etapas del embudo en orden de avance (las no listadas se agregan al final)
+ETAPAS_EMBUDO = ['Nuevo', 'En seguimiento', 'Interesado', 'Alta probabilidad']
+
+ETAPA_CERRADA = 'Matriculado'
+
+def _categorias_etapa(*estados):
+    """Etapas conocidas en orden del embudo seguidas de las demás encontradas en los datos"""
+    encontradas = pd.unique(pd.concat([pd.Series(e, dtype=object) for e in estados], ignore_index=True).dropna())
+    extra = sorted(str(e) for e in encontradas if e not in ETAPAS_EMBUDO and e != ETAPA_CERRADA)
+    return ETAPAS_EMBUDO + extra
+
+def funnel_crosstab(df_leads, incluir_matriculados=False):
+    """Tabla Marca x Programa x etapa ('Estado actual') con un único groupby categórico"""
+    if df_leads is None or df_leads.empty or 'Estado actual' not in df_leads.columns:
+        return pd.DataFrame(columns=ETAPAS_EMBUDO)
+
+    leads = df_leads
+    if not incluir_matriculados:
+        leads = leads[leads['Estado actual'] != ETAPA_CERRADA]
+
+    categorias = _categorias_etapa(leads['Estado actual'])
+    if incluir_matriculados:
+        categorias = categorias + [ETAPA_CERRADA]
+    etapa = pd.Categorical(leads['Estado actual'], categories=categorias)
+
+    tabla = (
+        leads.groupby([leads['Marca'].astype('category'), leads['Programa'].astype('category'), etapa],
+                      observed=True)
+        .size()
+        .unstack(fill_value=0)
+        .reindex(columns=categorias, fill_value=0)
+    )
+    tabla.columns = pd.Index(categorias, name='Estado actual')
+    return tabla
+
+def expected_enrollments_by_stage(df_leads, pesos, peso_por_defecto=None):
+    """Matrículas esperadas de los leads abiertos ponderando cada etapa por su probabilidad
+
+    pesos: dict etapa -> probabilidad de matrícula, normalmente estimado con
+    stage_weights a partir de fotos anteriores de leads_activos. Las etapas
+    sin peso usan peso_por_defecto; si no se indica, se lanza ValueError.
+    Devuelve una fila por Marca y Programa con los leads abiertos, las
+    matrículas esperadas y la tasa implícita.
+    """
+    tabla = funnel_crosstab(df_leads)
+    columnas = ['Marca', 'Programa', 'Leads Abiertos', 'Matrículas Esperadas', 'Tasa Esperada (%)']
+    if tabla.empty:
+        return pd.DataFrame(columns=columnas)
+
+    sin_peso = [etapa for etapa in tabla.columns if etapa not in pesos and tabla[etapa].sum() > 0]
+    if sin_peso and peso_por_defecto is None:
+        raise ValueError(f"Etapas sin probabilidad de matrícula: {', '.join(map(str, sin_peso))}")
+    vector = np.array([pesos.get(etapa, peso_por_defecto or 0.0) for etapa in tabla.columns], dtype=float)
+    conteos = tabla.to_numpy(dtype=float)
+    abiertos = conteos.sum(axis=1)
+    esperadas = conteos @ vector
+
+    resultado = pd.DataFrame({
+        'Marca': tabla.index.get_level_values(0).astype(str),
+        'Programa': tabla.index.get_level_values(1).astype(str),
+        'Leads Abiertos': abiertos.astype(int),
+        'Matrículas Esperadas': np.round(esperadas, 2),
+        'Tasa Esperada (%)': np.round(np.where(abiertos > 0, esperadas / np.maximum(abiertos, 1) * 100, 0), 2)
+    })
+    return resultado.sort_values('Matrículas Esperadas', ascending=False).reset_index(drop=True)
+
+def stage_transition_matrix(snapshot_anterior, snapshot_actual):
+    """Matriz de transición de etapas entre dos fotos diarias de leads_activos
+
+    Las fotos se cruzan por la clave empaquetada de 'ID lead' (pack_lead_ids)
+    con searchsorted sobre las claves ordenadas, sin merge de cadenas. La fila
+    'Ingreso' cuenta los leads nuevos de la foto actual y la columna 'Salida'
+    los que ya no aparecen. Devuelve los conteos y las probabilidades por fila.
+    """
+    estados_ant = snapshot_anterior['Estado actual']
+    estados_act = snapshot_actual['Estado actual']
+    etapas = _categorias_etapa(estados_ant, estados_act) + [ETAPA_CERRADA]
+    filas = etapas + ['Ingreso']
+    columnas = etapas + ['Salida']
+    num_etapas = len(etapas)
+
+    codigo_ant = pd.Categorical(estados_ant, categories=etapas).codes.astype(np.int64)
+    codigo_act = pd.Categorical(estados_act, categories=etapas).codes.astype(np.int64)
+    clave_ant = pack_lead_ids(snapshot_anterior['ID lead'])
+    clave_act = pack_lead_ids(snapshot_actual['ID lead'])
+
+    # Se descartan IDs vacíos y estados nulos; ante IDs repetidos vale la última fila
+    validos_ant = (clave_ant != 0) & (codigo_ant >= 0)
+    clave_ant, codigo_ant = clave_ant[validos_ant], codigo_ant[validos_ant]
+    orden = np.argsort(clave_ant, kind='stable')
+    clave_ant, codigo_ant = clave_ant[orden], codigo_ant[orden]
+    ultima = np.append(clave_ant[1:] != clave_ant[:-1], True) if len(clave_ant) else np.array([], dtype=bool)
+    clave_ant, codigo_ant = clave_ant[ultima], codigo_ant[ultima]
+
+    validos_act = (clave_act != 0) & (codigo_act >= 0)
+    clave_act, codigo_act = clave_act[validos_act], codigo_act[validos_act]
+
+    posicion = np.searchsorted(clave_ant, clave_act)
+    posicion_segura = np.minimum(posicion, max(len(clave_ant) - 1, 0))
+    encontrado = (posicion < len(clave_ant)) & (clave_ant[posicion_segura] == clave_act) if len(clave_ant) else np.zeros(len(clave_act), dtype=bool)
+
+    # Origen: etapa anterior o 'Ingreso'; destino: etapa actual
+    origen = np.where(encontrado, codigo_ant[posicion_segura] if len(clave_ant) else 0, num_etapas)
+    celdas = origen * (num_etapas + 1) + codigo_act
+    conteos = np.bincount(celdas, minlength=(num_etapas + 1) * (num_etapas + 1)).reshape(num_etapas + 1, num_etapas + 1)
+
+    # Leads de la foto anterior que no siguen en la actual
+    presente = np.zeros(len(clave_ant), dtype=bool)
+    presente[posicion_segura[encontrado]] = True
+    conteos[:num_etapas, num_etapas] = np.bincount(codigo_ant[~presente], minlength=num_etapas)
+
+    conteos = pd.DataFrame(conteos, index=pd.Index(filas, name='Desde'), columns=pd.Index(columnas, name='Hacia'))
+    totales = conteos.sum(axis=1).to_numpy(dtype=float)
+    probabilidades = conteos.div(np.where(totales > 0, totales, 1), axis=0)
+
+    return {
+        'conteos': conteos,
+        'probabilidades': probabilidades.round(4)
+    }
+
+def stage_weights(transiciones, suavizado=1.0):
+    """Probabilidad de terminar matriculado desde cada etapa abierta
+
+    transiciones: resultado de stage_transition_matrix o una lista de ellos
+    (se suman los conteos de todos los pares de fotos). Las etapas abiertas
+    forman una cadena de Markov en la que 'Matriculado' y 'Salida' son
+    absorbentes; el peso de cada etapa es la probabilidad de absorción en
+    'Matriculado'. A cada etapa se le suman `suavizado` salidas repartidas
+    según la proporción global de matrículas, de modo que las etapas con
+    pocas observaciones tienden a esa proporción y la cadena siempre se
+    resuelve (suavizado > 0). Solo reciben peso las etapas con leads en alguna
+    foto de origen.
+    """
+    if isinstance(transiciones, dict):
+        transiciones = [transiciones]
+    conteos = None
+    for transicion in transiciones:
+        actual = transicion['conteos'].astype(float)
+        conteos = actual if conteos is None else conteos.add(actual, fill_value=0)
+    if conteos is None:
+        return {}
+
+    # La cadena usa las etapas abiertas con leads en alguna foto (de origen o de destino)
+    desde = conteos.sum(axis=1)
+    hacia = conteos.sum(axis=0).reindex(conteos.index, fill_value=0)
+    abiertas = [e for e in conteos.index if e not in (ETAPA_CERRADA, 'Ingreso') and desde[e] + hacia[e] > 0]
+    if not abiertas:
+        return {}
+    conteos = conteos.reindex(index=abiertas, columns=abiertas + [ETAPA_CERRADA, 'Salida'], fill_value=0).fillna(0)
+    entre_etapas = conteos[abiertas].to_numpy()
+    a_matricula = conteos[ETAPA_CERRADA].to_numpy()
+    a_salida = conteos['Salida'].to_numpy()
+
+    cerradas = a_matricula.sum() + a_salida.sum()
+    proporcion = a_matricula.sum() / cerradas if cerradas > 0 else 0.0
+    a_matricula = a_matricula + suavizado * proporcion
+    a_salida = a_salida + suavizado * (1 - proporcion)
+
+    totales = entre_etapas.sum(axis=1) + a_matricula + a_salida
+    transicion = entre_etapas / totales[:, None]
+    pesos = np.linalg.solve(np.eye(len(abiertas)) - transicion, a_matricula / totales)
+    return {etapa: float(peso) for etapa, peso in zip(abiertas, np.clip(pesos, 0, 1)) if desde[etapa] > 0}
@@ -0,0 +1,136 @@
+# utils/id_index.py
+
+import pandas as pd
+import numpy as np
+
+from utils.data_processor import pack_lead_ids
+
+def build_id_index(df_matriculados, df_leads):
+    """Índice de 'ID lead' compartido entre matriculados y leads activos
+
+    Factoriza una sola vez los IDs de ambos archivos (claves empaquetadas con
+    pack_lead_ids) en enteros densos 0..N-1 y guarda, para cada archivo, los
+    códigos únicos ordenados y la primera fila de cada código, de modo que
+    pertenencia, cruce y anti-cruce se resuelven con isin e indexación sobre
+    enteros. Las filas sin ID quedan con código -1.
+    """
+    claves_m = pack_lead_ids(df_matriculados['ID lead']) if len(df_matriculados) else np.array([], dtype=np.uint64)
+    claves_l = pack_lead_ids(df_leads['ID lead']) if len(df_leads) else np.array([], dtype=np.uint64)
+
+    codigos, unicos = pd.factorize(np.concatenate([claves_m, claves_l]))
+    codigos = codigos.astype(np.int64)
+    # La clave 0 corresponde a IDs vacíos
+    vacio = np.flatnonzero(unicos == 0)
+    if len(vacio):
+        codigos[codigos == vacio[0]] = -1
+
+    codigos_m = codigos[:len(claves_m)]
+    codigos_l = codigos[len(claves_m):]
+    primera_m = _primera_fila(codigos_m, len(unicos))
+    primera_l = _primera_fila(codigos_l, len(unicos))
+
+    return {
+        'num_ids': len(unicos),
+        'codigos_m': codigos_m,
+        'codigos_l': codigos_l,
+        'primera_m': primera_m,
+        'primera_l': primera_l,
+        'ordenados_m': np.flatnonzero(primera_m >= 0),
+        'ordenados_l': np.flatnonzero(primera_l >= 0),
+    }
+
+def _primera_fila(codigos, num_ids):
+    """Primera fila de cada código denso (-1 si el ID no está en el archivo)"""
+    primera = np.full(num_ids, -1, dtype=np.int64)
+    filas = np.flatnonzero(codigos >= 0)
+    # En la asignación con índices repetidos gana la última escritura: se recorre al revés
+    primera[codigos[filas[::-1]]] = filas[::-1]
+    return primera
+
+def enrolled_in_leads(indice):
+    """Máscara por fila de matriculados: el ID también aparece en leads activos"""
+    return np.isin(indice['codigos_m'], indice['ordenados_l']) & (indice['codigos_m'] >= 0)
+
+def leads_enrolled(indice):
+    """Máscara por fila de leads activos: el ID ya figura en matriculados"""
+    return np.isin(indice['codigos_l'], indice['ordenados_m']) & (indice['codigos_l'] >= 0)
+
+def enrolled_not_in_leads(indice, df_matriculados):
+    """Matriculados cuyo ID no aparece en leads activos (anti-cruce)"""
+    return df_matriculados[~enrolled_in_leads(indice)]
+
+def join_enrolled_leads(indice, df_matriculados, df_leads, columnas_leads=('Fecha ingreso', 'Estado actual', 'Marca', 'Programa')):
+    """Cruzar cada matrícula con su lead (primera fila del ID en leads activos)
+
+    Devuelve los matriculados con coincidencia, las columnas indicadas del
+    lead con sufijo ' (lead)' y, si hay fechas, los días entre el ingreso
+    del lead y la matrícula.
+    """
+    codigos_m = indice['codigos_m']
+    fila_lead = np.where(codigos_m >= 0, indice['primera_l'][np.maximum(codigos_m, 0)], -1)
+    con_lead = fila_lead >= 0
+
+    resultado = df_matriculados[con_lead].reset_index(drop=True)
+    filas = fila_lead[con_lead]
+    for columna in columnas_leads:
+        if columna in df_leads.columns:
+            resultado[f'{columna} (lead)'] = df_leads[columna].to_numpy()[filas]
+
+    if 'Fecha ingreso (lead)' in resultado.columns:
+        fecha_matricula = resultado['Fecha matrícula'] if 'Fecha matrícula' in resultado.columns else resultado.get('Fecha ingreso')
+        if fecha_matricula is not None:
+            dias = (pd.to_datetime(fecha_matricula, errors='coerce')
+                    - pd.to_datetime(resultado['Fecha ingreso (lead)'], errors='coerce')).dt.days
+            resultado['Días hasta matrícula'] = dias
+
+    return resultado
+
+def duplicates_across_brands(indice, df_matriculados, df_leads):
+    """IDs que aparecen con más de una marca entre ambos archivos
+
+    Cuenta los pares (ID, marca) distintos con una clave entera compuesta y
+    devuelve una fila por ID duplicado con sus marcas y número de registros
+    (las marcas se codifican como bits, hasta 64 marcas distintas).
+    """
+    codigos = np.concatenate([indice['codigos_m'], indice['codigos_l']])
+    marcas_texto = pd.concat([df_matriculados['Marca'], df_leads['Marca']], ignore_index=True).astype(str)
+    codigo_marca, marcas = pd.factorize(marcas_texto, sort=True)
+    num_marcas = max(len(marcas), 1)
+
+    validos = codigos >= 0
+    # Pares distintos marcados sobre una tabla densa (ID x marca), sin ordenar
+    presentes = np.zeros(indice['num_ids'] * num_marcas, dtype=bool)
+    presentes[codigos[validos] * num_marcas + codigo_marca[validos]] = True
+    pares = np.flatnonzero(presentes)
+    id_par = pares // num_marcas
+    marca_par = pares % num_marcas
+    marcas_por_id = np.bincount(id_par, minlength=indice['num_ids'])
+    duplicados = np.flatnonzero(marcas_por_id > 1)
+
+    columnas = ['ID lead', 'Marcas', 'Número de Marcas', 'Registros']
+    if len(duplicados) == 0:
+        return pd.DataFrame(columns=columnas)
+
+    # Conjunto de marcas de cada ID como máscara de bits; el texto se arma
+    # una sola vez por combinación distinta
+    en_duplicados = marcas_por_id[id_par] > 1
+    mascara = np.zeros(indice['num_ids'], dtype=np.uint64)
+    np.bitwise_or.at(mascara, id_par[en_duplicados], np.left_shift(np.uint64(1), marca_par[en_duplicados].astype(np.uint64)))
+    combinaciones, codigo_combinacion = np.unique(mascara[duplicados], return_inverse=True)
+    nombres = np.array([
+        ', '.join(str(marcas[b]) for b in range(len(marcas)) if (int(c) >> b) & 1) for c in combinaciones
+    ], dtype=object)
+
+    primera = np.minimum(
+        np.where(indice['primera_m'][duplicados] >= 0, indice['primera_m'][duplicados], np.iinfo(np.int64).max),
+        np.where(indice['primera_l'][duplicados] >= 0, indice['primera_l'][duplicados] + len(indice['codigos_m']), np.iinfo(np.int64).max)
+    )
+    ids = pd.concat([df_matriculados['ID lead'], df_leads['ID lead']], ignore_index=True).to_numpy()
+    registros = np.bincount(codigos[validos], minlength=indice['num_ids'])[duplicados]
+
+    return pd.DataFrame({
+        'ID lead': ids[primera],
+        'Marcas': nombres[codigo_combinacion],
+        'Número de Marcas': marcas_por_id[duplicados],
+        'Registros': registros
+    })
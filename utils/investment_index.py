@@ -0,0 +1,101 @@
+# utils/investment_index.py
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+def _dia(fecha):
+    """Convertir una fecha a número de día entero"""
+    return np.datetime64(pd.Timestamp(fecha), 'D').astype(np.int64)
+
+def build_investment_index(df_inversion):
+    """Construir un índice de la hoja inversion_acumulada ordenado por (Marca, Canal, Fecha)
+
+    Se construye una sola vez y permite consultar la inversión acumulada de una
+    marca (por canal) a una fecha con una búsqueda binaria, además de derivar el
+    gasto diario con diferencias agrupadas.
+    """
+    columnas = ['Marca', 'Canal', 'Fecha', 'Inversión acumulada']
+    if df_inversion is None or df_inversion.empty or any(c not in df_inversion.columns for c in columnas):
+        df = pd.DataFrame(columns=columnas)
+    else:
+        df = df_inversion[columnas].dropna(subset=['Marca', 'Canal', 'Fecha'])
+
+    df = df.assign(Fecha=pd.to_datetime(df['Fecha'], errors='coerce')).dropna(subset=['Fecha'])
+    df = df.sort_values(['Marca', 'Canal', 'Fecha'], kind='stable').reset_index(drop=True)
+
+    claves = pd.MultiIndex.from_frame(df[['Marca', 'Canal']].astype(str))
+    codigos, grupos = claves.factorize()
+    codigos = np.asarray(codigos, dtype=np.int64)
+    dias = df['Fecha'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    valores = pd.to_numeric(df['Inversión acumulada'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    dia_min = int(dias.min()) if len(dias) else 0
+    dia_max = int(dias.max()) if len(dias) else 0
+    ancho = dia_max - dia_min + 3
+
+    # Gasto diario: diferencia dentro de cada (Marca, Canal); el primer día es el propio acumulado
+    diario = np.diff(valores, prepend=0.0)
+    if len(codigos):
+        inicio_grupo = np.r_[True, codigos[1:] != codigos[:-1]]
+        diario[inicio_grupo] = valores[inicio_grupo]
+
+    # Canales de cada marca como arrays de códigos de grupo
+    marcas_grupo = np.asarray(grupos.get_level_values(0)) if len(grupos) else np.array([], dtype=object)
+    canales_marca = {
+        marca: np.flatnonzero(marcas_grupo == marca)
+        for marca in pd.unique(marcas_grupo)
+    }
+
+    return {
+        'grupos': grupos,
+        'codigos': codigos,
+        'dias': dias,
+        'valores': valores,
+        'diario': diario,
+        'dia_min': dia_min,
+        'ancho': ancho,
+        'compuesto': codigos * ancho + (dias - dia_min + 1),
+        'canales_marca': canales_marca,
+    }
+
+def cumulative_investment(indice, marca, fecha=None, por_canal=False):
+    """Inversión acumulada de una marca a una fecha (último registro de cada canal)
+
+    Devuelve el total de la marca o, con por_canal=True, una Serie por canal.
+    Los canales sin registros hasta la fecha aportan 0.
+    """
+    if fecha is None:
+        fecha = datetime.now()
+
+    grupos_marca = indice['canales_marca'].get(marca, np.array([], dtype=np.int64))
+    if len(grupos_marca) == 0:
+        return pd.Series(dtype=float) if por_canal else 0.0
+
+    desplazamiento = np.clip(_dia(fecha) - indice['dia_min'] + 1, 0, indice['ancho'] - 1)
+    buscado = grupos_marca * indice['ancho'] + desplazamiento
+
+    posicion = np.searchsorted(indice['compuesto'], buscado, side='right') - 1
+    posicion_segura = np.maximum(posicion, 0)
+    encontrado = (posicion >= 0) & (indice['codigos'][posicion_segura] == grupos_marca)
+    acumulado = np.where(encontrado, indice['valores'][posicion_segura], 0.0)
+
+    if por_canal:
+        canales = indice['grupos'].get_level_values(1)[grupos_marca]
+        return pd.Series(acumulado, index=canales, name='Inversión acumulada')
+    return float(acumulado.sum())
+
+def daily_investment(indice, marca=None):
+    """Gasto diario por (Marca, Canal, Fecha) derivado del acumulado con np.diff agrupado"""
+    grupos = indice['grupos']
+    codigos = indice['codigos']
+    df = pd.DataFrame({
+        'Marca': grupos.get_level_values(0)[codigos] if len(codigos) else [],
+        'Canal': grupos.get_level_values(1)[codigos] if len(codigos) else [],
+        'Fecha': indice['dias'].astype('datetime64[D]'),
+        'Inversión diaria': indice['diario'],
+        'Inversión acumulada': indice['valores'],
+    })
+    if marca is not None:
+        df = df[df['Marca'] == marca]
+    return df
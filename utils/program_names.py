@@ -0,0 +1,212 @@
+# utils/program_names.py
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+import pandas as pd
+import numpy as np
+
+from utils.data_processor import normalize_program_name
+
+# Abreviaturas frecuentes en los CRM que no cubre normalize_program_name
+ABREVIATURAS = {
+    r'\bmtria\b': 'maestria',
+    r'\bmaest\b': 'maestria',
+    r'\bmstr\b': 'maestria',
+    r'\bdipl\b': 'diploma',
+    r'\bdiplo\b': 'diplomado',
+    r'\besp\b': 'especializacion',
+    r'\bespec\b': 'especializacion',
+    r'\bdoct\b': 'doctorado',
+    r'\blic\b': 'licenciatura',
+    r'\bing\b': 'ingenieria',
+    r'\bprog\b': 'programa',
+    r'\bejec\b': 'ejecutivo',
+    r'\brrhh\b': 'recursos humanos',
+}
+
+# Palabras que no aportan a la similitud
+PALABRAS_VACIAS = {'de', 'del', 'en', 'la', 'el', 'y', 'e', 'para'}
+
+# Palabras de nivel académico: dos nombres solo se unen si tienen el mismo nivel
+NIVELES = {
+    'maestria': 'maestria', 'mba': 'mba', 'doctorado': 'doctorado', 'especializacion': 'especializacion',
+    'ingenieria': 'ingenieria', 'licenciatura': 'licenciatura', 'diploma': 'diploma', 'diplomado': 'diploma',
+    'curso': 'curso',
+}
+
+UMBRAL_SIMILITUD = 0.6
+# Ventaja mínima del mejor candidato sobre el segundo
+MARGEN_SIMILITUD = 0.1
+# Versión de las reglas de coincidencia: si cambian, la caché se resuelve de nuevo
+VERSION_CRITERIO = 2
+
+def _clave(nombre):
+    """Forma comparable de un nombre: sin tildes, minúsculas, sin puntuación ni palabras vacías"""
+    if pd.isna(nombre):
+        return ''
+    texto = unicodedata.normalize('NFKD', normalize_program_name(nombre))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = re.sub(r'[^a-z0-9 ]+', ' ', texto)
+    for patron, reemplazo in ABREVIATURAS.items():
+        texto = re.sub(patron, reemplazo, texto)
+    return ' '.join(p for p in texto.split() if p not in PALABRAS_VACIAS)
+
+def _trigramas(clave):
+    """Conjunto de trigramas de caracteres (con relleno en los extremos)"""
+    texto = f'  {clave} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def build_program_index(nombres_conocidos):
+    """Índice invertido trigrama -> programas conocidos
+
+    nombres_conocidos suele ser la columna 'Programa' de
+    calendario_convocatoria (sin 'Todos los programas').
+    """
+    nombres = sorted({str(n) for n in pd.Series(nombres_conocidos).dropna() if str(n) not in ('', 'Todos los programas')})
+    trigramas = [_trigramas(_clave(n)) for n in nombres]
+
+    postings = {}
+    for i, conjunto in enumerate(trigramas):
+        for trigrama in conjunto:
+            postings.setdefault(trigrama, []).append(i)
+
+    return {
+        'nombres': nombres,
+        'claves': {_clave(n): n for n in nombres},
+        'postings': {t: np.array(ids, dtype=np.int64) for t, ids in postings.items()},
+        'tamanos': np.array([len(t) for t in trigramas], dtype=np.int64),
+        'huella': hashlib.sha1('\n'.join(nombres).encode('utf-8')).hexdigest(),
+    }
+
+def _palabras_equivalentes(a, b):
+    """Misma palabra, abreviatura (prefijo de al menos 3 letras) o variante cercana"""
+    if a == b or (min(len(a), len(b)) >= 3 and (a.startswith(b) or b.startswith(a))):
+        return True
+    ta, tb = _trigramas(a), _trigramas(b)
+    return 2 * len(ta & tb) / (len(ta) + len(tb)) >= 0.5
+
+def _compatibles(clave_a, clave_b):
+    """Mismo nivel académico y cada palabra de un nombre con equivalente en el otro
+
+    Evita unir programas distintos que comparten buena parte del texto, como
+    'Derecho Penal' y 'Derecho' o 'Ingeniería Ambiental' e 'Ingeniería Industrial'.
+    """
+    palabras_a, palabras_b = clave_a.split(), clave_b.split()
+    if {NIVELES[p] for p in palabras_a if p in NIVELES} != {NIVELES[p] for p in palabras_b if p in NIVELES}:
+        return False
+    resto_a = [p for p in palabras_a if p not in NIVELES]
+    resto_b = [p for p in palabras_b if p not in NIVELES]
+    return (all(any(_palabras_equivalentes(a, b) for b in resto_b) for a in resto_a)
+            and all(any(_palabras_equivalentes(a, b) for a in resto_a) for b in resto_b))
+
+def match_program_name(nombre, indice, umbral=UMBRAL_SIMILITUD, margen=MARGEN_SIMILITUD):
+    """Programa conocido más parecido a `nombre` (coeficiente de Dice sobre trigramas)
+
+    Solo se comparan los programas que comparten algún trigrama con el
+    nombre, contando coincidencias con bincount sobre las listas del índice.
+    Devuelve None si el mejor no alcanza el umbral, si no supera al segundo
+    por `margen` o si no es compatible (nivel y palabras, ver _compatibles):
+    un nombre sin resolver es preferible a unir dos programas distintos.
+    """
+    clave = _clave(nombre)
+    if not clave or not indice['nombres']:
+        return None
+    if clave in indice['claves']:
+        return indice['claves'][clave]
+
+    consulta = _trigramas(clave)
+    listas = [indice['postings'][t] for t in consulta if t in indice['postings']]
+    if not listas:
+        return None
+
+    comunes = np.bincount(np.concatenate(listas), minlength=len(indice['nombres']))
+    candidatos = np.flatnonzero(comunes)
+    similitud = 2 * comunes[candidatos] / (len(consulta) + indice['tamanos'][candidatos])
+    orden = np.argsort(-similitud, kind='stable')
+    mejor = orden[0]
+    if similitud[mejor] < umbral:
+        return None
+    if len(orden) > 1 and similitud[mejor] - similitud[orden[1]] < margen:
+        return None
+    candidato = indice['nombres'][candidatos[mejor]]
+    if not _compatibles(clave, _clave(candidato)):
+        return None
+    return candidato
+
+def _leer_cache(ruta, huella, criterio):
+    """Mapeo guardado; las entradas sin resolver se descartan si cambió el catálogo
+
+    Si cambiaron las reglas de coincidencia (criterio) se descarta todo, así
+    no sobreviven uniones hechas con reglas más permisivas.
+    """
+    if not ruta or not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo leer la caché de programas '{ruta}': {str(e)}")
+        return {}
+    if datos.get('criterio') != criterio:
+        return {}
+    mapeo = datos.get('mapeo', {})
+    if datos.get('huella') != huella:
+        mapeo = {k: v for k, v in mapeo.items() if v is not None}
+    return mapeo
+
+def _guardar_cache(ruta, huella, criterio, mapeo):
+    """Escribir la caché de forma atómica (archivo temporal y reemplazo)"""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'huella': huella, 'criterio': criterio, 'mapeo': mapeo}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temporal, ruta)
+
+def _criterio(umbral, margen):
+    """Identificador de las reglas de coincidencia guardado junto a la caché"""
+    return f'v{VERSION_CRITERIO}|{umbral:g}|{margen:g}'
+
+def canonicalize_program_names(programas, indice, ruta_cache=None, umbral=UMBRAL_SIMILITUD,
+                               margen=MARGEN_SIMILITUD):
+    """Reemplazar cada nombre de programa por su forma canónica del catálogo
+
+    Cada grafía distinta se resuelve una sola vez: primero contra la caché
+    persistente (JSON en ruta_cache) y, si no está, con match_program_name.
+    Los nombres sin coincidencia segura se guardan como None y se conservan
+    tal cual. Los nombres de programas retirados del catálogo se vuelven a
+    resolver.
+    """
+    programas = pd.Series(programas)
+    criterio = _criterio(umbral, margen)
+    mapeo = _leer_cache(ruta_cache, indice['huella'], criterio)
+    conocidos = set(indice['nombres'])
+
+    codigos, distintos = pd.factorize(programas)
+    distintos = [str(n) for n in distintos]
+    nuevos = 0
+    for nombre in distintos:
+        actual = mapeo.get(nombre, '')
+        if nombre in mapeo and (actual is None or actual in conocidos):
+            continue
+        mapeo[nombre] = match_program_name(nombre, indice, umbral, margen)
+        nuevos += 1
+
+    if ruta_cache and nuevos:
+        _guardar_cache(ruta_cache, indice['huella'], criterio, mapeo)
+
+    canonicos = np.array([mapeo.get(n) or n for n in distintos] + [np.nan], dtype=object)
+    return pd.Series(canonicos[codigos], index=programas.index, name=programas.name)
+
+def program_name_mapper(df_calendario, ruta_cache=None, umbral=UMBRAL_SIMILITUD, margen=MARGEN_SIMILITUD):
+    """Función lista para pasar como `mapeo_programas` a process_matriculados/process_leads"""
+    indice = build_program_index(df_calendario['Programa'] if df_calendario is not None and 'Programa' in df_calendario.columns else [])
+
+    def mapear(programas):
+        return canonicalize_program_names(programas, indice, ruta_cache, umbral, margen)
+
+    return mapear
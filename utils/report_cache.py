@@ -0,0 +1,175 @@
+# utils/report_cache.py
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+from datetime import date, datetime
+
+import pandas as pd
+import numpy as np
+
+# Cambiar al modificar el diseño de los reportes para invalidar lo guardado
+VERSION_PLANTILLA = '1'
+
+DIRECTORIO_CACHE = os.environ.get('REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'digitalreportes_cache'))
+MAX_BYTES_CACHE = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# Claves de projections con muestras crudas que no forman parte de la huella
+CLAVES_MUESTRAS = {'simulacion_matriculas', 'simulacion_leads'}
+
+EXTENSIONES = {'excel': 'xlsx', 'pdf': 'pdf', 'pptx': 'pptx', 'zip': 'zip'}
+
+_estadisticas = {'aciertos': 0, 'fallos': 0, 'expulsados': 0}
+
+def _canonico(valor):
+    """Representación estable y serializable de un valor para calcular la huella"""
+    if isinstance(valor, pd.DataFrame):
+        return {
+            'columnas': [str(c) for c in valor.columns],
+            'tipos': [str(t) for t in valor.dtypes],
+            'filas': pd.util.hash_pandas_object(valor, index=False).to_numpy().tobytes().hex()
+                     if len(valor) else '',
+        }
+    if isinstance(valor, pd.Series):
+        return _canonico(valor.to_frame())
+    if isinstance(valor, dict):
+        return {str(k): _canonico(v) for k, v in sorted(valor.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(valor, (list, tuple)):
+        return [_canonico(v) for v in valor]
+    if isinstance(valor, np.ndarray):
+        return hashlib.sha1(np.ascontiguousarray(valor).tobytes()).hexdigest()
+    if isinstance(valor, (np.integer, np.bool_)):
+        return valor.item()
+    if isinstance(valor, (float, np.floating)):
+        # Redondeo para que diferencias de representación no cambien la huella
+        return None if not np.isfinite(valor) else round(float(valor), 9)
+    if isinstance(valor, (datetime, date, pd.Timestamp)):
+        return str(valor)
+    return valor
+
+def report_fingerprint(formato, metrics, projections, program_analysis, comentarios, marca,
+                       version=VERSION_PLANTILLA, **extras):
+    """Huella canónica de un reporte
+
+    Usa el resumen de projections (sin las muestras de la simulación), las
+    tablas de programas, comentarios, marca, versión de plantilla y la fecha
+    del día (los reportes la imprimen). extras permite agregar parámetros del
+    generador, p. ej. optimizacion.
+    """
+    resumen = {k: v for k, v in (projections or {}).items() if k not in CLAVES_MUESTRAS}
+    partes = {
+        'formato': formato,
+        'version': version,
+        'fecha': date.today().isoformat(),
+        'marca': marca,
+        'comentarios': comentarios,
+        'metrics': metrics,
+        'projections': resumen,
+        'program_analysis': program_analysis,
+        'extras': extras,
+    }
+    return artifact_fingerprint(partes)
+
+def artifact_fingerprint(partes):
+    """SHA-256 de la forma canónica de `partes` (dict, listas, DataFrames, escalares)"""
+    texto = json.dumps(_canonico(partes), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def _ruta(clave, formato, directorio):
+    return os.path.join(directorio, f'{clave}.{EXTENSIONES.get(formato, "bin")}')
+
+def _recortar(directorio, max_bytes):
+    """Expulsar los archivos usados hace más tiempo hasta quedar bajo max_bytes"""
+    entradas = []
+    with os.scandir(directorio) as it:
+        for entrada in it:
+            if entrada.is_file() and not entrada.name.endswith('.tmp'):
+                info = entrada.stat()
+                entradas.append((info.st_mtime, info.st_size, entrada.path))
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in sorted(entradas):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+            total -= tamano
+            _estadisticas['expulsados'] += 1
+        except OSError:
+            pass
+
+def cached_artifact(clave, formato, generar, directorio=None, max_bytes=None):
+    """Devolver el artefacto guardado para `clave` o generarlo con `generar()` y guardarlo
+
+    La caché es un directorio con un archivo por artefacto; el orden LRU se
+    lleva con la fecha de modificación (se actualiza en cada acierto) y al
+    superar max_bytes se borran los más antiguos. Devuelve un BytesIO.
+    """
+    directorio = directorio or DIRECTORIO_CACHE
+    max_bytes = MAX_BYTES_CACHE if max_bytes is None else max_bytes
+    ruta = _ruta(clave, formato, directorio)
+
+    try:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        os.utime(ruta)
+        _estadisticas['aciertos'] += 1
+        return io.BytesIO(contenido)
+    except FileNotFoundError:
+        pass
+
+    _estadisticas['fallos'] += 1
+    buffer = generar()
+    contenido = buffer.getvalue()
+
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+        _recortar(directorio, max_bytes)
+    except OSError as e:
+        print(f"No se pudo guardar el reporte en caché: {str(e)}")
+
+    return io.BytesIO(contenido)
+
+def cached_report(formato, metrics, projections, program_analysis, comentarios, marca,
+                  directorio=None, version=VERSION_PLANTILLA, **kwargs):
+    """generate_excel / generate_pdf / generate_pptx con caché en disco
+
+    kwargs se pasan al generador (p. ej. optimizacion para Excel) y forman
+    parte de la huella.
+    """
+    from utils.report_generator import GENERADORES
+
+    if formato not in GENERADORES:
+        raise ValueError(f"Formato no soportado: {formato}")
+    clave = report_fingerprint(formato, metrics, projections, program_analysis, comentarios, marca,
+                               version=version, **kwargs)
+    return cached_artifact(
+        clave, formato,
+        lambda: GENERADORES[formato](metrics, projections, program_analysis, comentarios, marca, **kwargs),
+        directorio=directorio
+    )
+
+def report_cache_stats(directorio=None):
+    """Aciertos, fallos y expulsiones de este proceso, y ocupación actual del directorio"""
+    directorio = directorio or DIRECTORIO_CACHE
+    archivos = 0
+    tamano = 0
+    if os.path.isdir(directorio):
+        with os.scandir(directorio) as it:
+            for entrada in it:
+                if entrada.is_file() and not entrada.name.endswith('.tmp'):
+                    archivos += 1
+                    tamano += entrada.stat().st_size
+    consultas = _estadisticas['aciertos'] + _estadisticas['fallos']
+    return {
+        **_estadisticas,
+        'tasa_aciertos': round(_estadisticas['aciertos'] / consultas * 100, 1) if consultas else 0.0,
+        'archivos': archivos,
+        'bytes': tamano,
+        'max_bytes': MAX_BYTES_CACHE,
+    }
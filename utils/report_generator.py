@@ -2,110 +2,114 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
-from fpdf import FPDF
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.dml.color import RGBColor
 import collections
+import zipfile
 
-def generate_excel(metrics, projections, program_analysis, comentarios, marca):
-    """Generar informe en formato Excel"""
-    buffer = io.BytesIO()
+# fpdf, python-pptx y matplotlib (utils.charts) se importan dentro de cada
+# generador: importar este módulo no debe cargar bibliotecas de documentos
+
+def _hojas_excel(metrics, projections, program_analysis, comentarios, marca, optimizacion=None):
+    """Hojas del informe Excel en orden, como diccionario nombre -> DataFrame"""
+    hojas = collections.OrderedDict()
     
-    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-        # 1. Hoja de resumen
-        metricas_list = [
-            'Leads Acumulados',
-            'Matrículas Acumuladas',
-            'Objetivo de Matrículas',
-            'Tasa de Conversión (%)',
-            '% Matrículas Leads Nuevos',
-            '% Matrículas Remarketing',
-            'Inversión Acumulada',
-            'CPL Promedio'
-        ]
-        
-        valores_list = [
-            metrics['leads_acumulados'],
-            metrics['matriculas_acumuladas'],
-            metrics['objetivo_matriculas'],
-            f"{metrics['tasa_conversion']:.2f}%",
-            f"{metrics['pct_matriculas_nuevos']:.1f}%",
-            f"{metrics['pct_matriculas_remarketing']:.1f}%",
-            f"${metrics['inversion_acumulada']:,.2f}",
-            f"${metrics['cpl_promedio']:,.2f}"
+    # 1. Hoja de resumen
+    metricas_list = [
+        'Leads Acumulados',
+        'Matrículas Acumuladas',
+        'Objetivo de Matrículas',
+        'Tasa de Conversión (%)',
+        '% Matrículas Leads Nuevos',
+        '% Matrículas Remarketing',
+        'Inversión Acumulada',
+        'CPL Promedio'
+    ]
+    
+    valores_list = [
+        metrics['leads_acumulados'],
+        metrics['matriculas_acumuladas'],
+        metrics['objetivo_matriculas'],
+        f"{metrics['tasa_conversion']:.2f}%",
+        f"{metrics['pct_matriculas_nuevos']:.1f}%",
+        f"{metrics['pct_matriculas_remarketing']:.1f}%",
+        f"${metrics['inversion_acumulada']:,.2f}",
+        f"${metrics['cpl_promedio']:,.2f}"
+    ]
+    
+    # Agregar tiempo transcurrido solo si es relevante
+    if marca in ["GRADO", "UNISUD"] and metrics['tiempo_transcurrido'] is not None:
+        metricas_list.insert(0, 'Tiempo Transcurrido (%)')
+        valores_list.insert(0, f"{metrics['tiempo_transcurrido']:.1f}%")
+    
+    hojas['Resumen'] = pd.DataFrame({
+        'Métrica': metricas_list,
+        'Valor': valores_list
+    })
+    
+    # 2. Hoja de proyecciones
+    hojas['Proyecciones'] = pd.DataFrame({
+        'Métrica': [
+            'Leads Proyectados',
+            'Matrículas Proyectadas (Min)',
+            'Matrículas Proyectadas (Max)',
+            '% Cumplimiento Proyectado'
+        ],
+        'Valor': [
+            projections['leads_proyectados'],
+            projections['matriculas_proyectadas_min'],
+            projections['matriculas_proyectadas_max'],
+            f"{projections['pct_cumplimiento_proyectado']:.1f}%"
         ]
-        
-        # Agregar tiempo transcurrido solo si es relevante
-        if marca in ["GRADO", "UNISUD"] and metrics['tiempo_transcurrido'] is not None:
-            metricas_list.insert(0, 'Tiempo Transcurrido (%)')
-            valores_list.insert(0, f"{metrics['tiempo_transcurrido']:.1f}%")
-        
-        df_resumen = pd.DataFrame({
-            'Métrica': metricas_list,
-            'Valor': valores_list
-        })
-        
-        df_resumen.to_excel(writer, sheet_name='Resumen', index=False)
-        
-        # 2. Hoja de proyecciones
-        df_proyecciones = pd.DataFrame({
-            'Métrica': [
-                'Leads Proyectados',
-                'Matrículas Proyectadas (Min)',
-                'Matrículas Proyectadas (Max)',
-                '% Cumplimiento Proyectado'
-            ],
-            'Valor': [
-                projections['leads_proyectados'],
-                projections['matriculas_proyectadas_min'],
-                projections['matriculas_proyectadas_max'],
-                f"{projections['pct_cumplimiento_proyectado']:.1f}%"
-            ]
-        })
-        
-        df_proyecciones.to_excel(writer, sheet_name='Proyecciones', index=False)
-        
-        # 3. Hoja de distribución de resultados
-        # Asegurarnos que program_analysis['tabla_completa'] sea un DataFrame
-        if not isinstance(program_analysis['tabla_completa'], pd.DataFrame):
-            print("Convirtiendo 'tabla_completa' a DataFrame")
-            df_tabla_completa = pd.DataFrame(program_analysis['tabla_completa'])
-        else:
-            df_tabla_completa = program_analysis['tabla_completa']
-            
-        df_tabla_completa.to_excel(writer, sheet_name='Distribución Resultados', index=False)
-        
-        # 4. Hoja de Top 5 programas
-        # Asegurarnos que program_analysis['top_matriculas'] sea un DataFrame
-        if not isinstance(program_analysis['top_matriculas'], pd.DataFrame):
-            print("Convirtiendo 'top_matriculas' a DataFrame")
-            df_top_matriculas = pd.DataFrame(program_analysis['top_matriculas'])
-        else:
-            df_top_matriculas = program_analysis['top_matriculas']
-            
-        df_top_matriculas.to_excel(writer, sheet_name='Top Programas', index=False)
-        
-        # 5. Hoja de programas con menor conversión
-        # Asegurarnos que program_analysis['menor_conversion'] sea un DataFrame
-        if not isinstance(program_analysis['menor_conversion'], pd.DataFrame):
-            print("Convirtiendo 'menor_conversion' a DataFrame")
-            df_menor_conversion = pd.DataFrame(program_analysis['menor_conversion'])
+    })
+    
+    # 3-5. Distribución de resultados, Top 5 programas y menor conversión
+    # Asegurarnos que las tablas de program_analysis sean DataFrames
+    for clave, sheet_name in [('tabla_completa', 'Distribución Resultados'),
+                              ('top_matriculas', 'Top Programas'),
+                              ('menor_conversion', 'Menor Conversión')]:
+        if not isinstance(program_analysis[clave], pd.DataFrame):
+            print(f"Convirtiendo '{clave}' a DataFrame")
+            hojas[sheet_name] = pd.DataFrame(program_analysis[clave])
         else:
-            df_menor_conversion = program_analysis['menor_conversion']
-            
-        df_menor_conversion.to_excel(writer, sheet_name='Menor Conversión', index=False)
-        
-        # 6. Hoja de comentarios
-        df_comentarios = pd.DataFrame({
-            'Fecha': [datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-            'Comentarios': [comentarios]
-        })
-        
-        df_comentarios.to_excel(writer, sheet_name='Comentarios', index=False)
+            hojas[sheet_name] = program_analysis[clave]
+    
+    # Proyección por programa (si el análisis la incluye)
+    if 'proyeccion_programas' in program_analysis:
+        hojas['Proyección Programas'] = program_analysis['proyeccion_programas']
+    
+    # 6. Hoja de comentarios
+    hojas['Comentarios'] = pd.DataFrame({
+        'Fecha': [datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+        'Comentarios': [comentarios]
+    })
+    
+    # 7. Hoja de optimización de presupuesto (opcional)
+    if optimizacion is not None:
+        df_optimizacion = optimizacion['canales']
+        if 'Marca' in df_optimizacion.columns:
+            df_optimizacion = df_optimizacion[df_optimizacion['Marca'] == marca]
+        hojas['Optimización Presupuesto'] = df_optimizacion
+    
+    return hojas
+
+def generate_excel(metrics, projections, program_analysis, comentarios, marca, optimizacion=None):
+    """Generar informe en formato Excel
+    
+    optimizacion es el resultado opcional de optimize_budget_allocation; si se
+    entrega se agrega una hoja con el reparto recomendado por canal.
+    """
+    buffer = io.BytesIO()
+    hojas = _hojas_excel(metrics, projections, program_analysis, comentarios, marca, optimizacion)
+    
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        for sheet_name, df in hojas.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
         
         # Dar formato a las hojas
         workbook = writer.book
@@ -118,24 +122,184 @@ def generate_excel(metrics, projections, program_analysis, comentarios, marca):
             'border': 1
         })
         
-        # Aplicar formato a cada hoja
-        for sheet_name in writer.sheets:
+        # Aplicar formato a cada hoja (los encabezados se reescriben con el formato)
+        for sheet_name, df in hojas.items():
             worksheet = writer.sheets[sheet_name]
             worksheet.set_column('A:A', 30)
             worksheet.set_column('B:Z', 15)
-            
-            # Aplicar formato a los encabezados de forma segura
-            try:
-                for col_num, value in enumerate(writer.sheets[sheet_name].table.columns):
-                    worksheet.write(0, col_num, value, header_format)
-            except AttributeError as e:
-                print(f"Error al formatear encabezados en {sheet_name}: {e}")
+            worksheet.write_row(0, 0, [str(c) for c in df.columns], header_format)
     
     buffer.seek(0)
     return buffer
 
+# Filas de datos por hoja en Excel (la primera fila es el encabezado)
+MAX_FILAS_EXCEL = 1048575
+
+def _columnas_para_excel(df):
+    """Columnas como arrays de objetos listos para xlsxwriter y el tipo de formato de cada una
+
+    Las fechas quedan como datetime (NaT -> None) y los nulos numéricos como
+    None para escribir celdas vacías.
+    """
+    columnas = []
+    tipos = []
+    for columna in df.columns:
+        serie = df[columna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            valores = serie.dt.tz_localize(None) if getattr(serie.dt, 'tz', None) is not None else serie
+            valores = np.where(valores.isna().to_numpy(), None, valores.dt.to_pydatetime())
+            tipos.append('fecha')
+        elif pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            numeros = serie.to_numpy(dtype=float, na_value=np.nan)
+            valores = np.where(np.isfinite(numeros), numeros, None).astype(object)
+            tipos.append('numero')
+        else:
+            valores = serie.astype(object).where(serie.notna(), None).to_numpy(dtype=object)
+            tipos.append('texto')
+        columnas.append(valores)
+    return columnas, tipos
+
+def _escribir_hoja_streaming(workbook, sheet_name, df, formatos):
+    """Escribir un DataFrame fila por fila, en orden, sobre hojas en modo constant_memory
+
+    Si supera el máximo de filas de Excel continúa en hojas '<nombre> (2)', ...
+    """
+    columnas, tipos = _columnas_para_excel(df)
+    formato_columna = [formatos[t] for t in tipos]
+    encabezados = [str(c) for c in df.columns]
+    filas = len(df)
+
+    for parte, inicio in enumerate(range(0, max(filas, 1), MAX_FILAS_EXCEL)):
+        nombre = sheet_name if parte == 0 else f'{sheet_name[:26]} ({parte + 1})'
+        worksheet = workbook.add_worksheet(nombre)
+        worksheet.set_column(0, 0, 30)
+        if len(encabezados) > 1:
+            worksheet.set_column(1, len(encabezados) - 1, 15)
+        for j, tipo in enumerate(tipos):
+            if tipo == 'fecha':
+                worksheet.set_column(j, j, 18 if j else 30, formatos['fecha'])
+        worksheet.write_row(0, 0, encabezados, formatos['encabezado'])
+
+        # Método de escritura por tipo de columna, resuelto una vez por hoja
+        escritores = {'fecha': worksheet.write_datetime, 'numero': worksheet.write_number, 'texto': worksheet.write}
+        escritor_columna = [escritores[t] for t in tipos]
+        
+        fin = min(inicio + MAX_FILAS_EXCEL, filas)
+        bloque = [c[inicio:fin] for c in columnas]
+        for i, fila in enumerate(zip(*bloque), 1):
+            for j, valor in enumerate(fila):
+                if valor is not None:
+                    escritor_columna[j](i, j, valor, formato_columna[j])
+
+def generate_excel_streaming(metrics, projections, program_analysis, comentarios, marca, optimizacion=None,
+                             detalle=None, ruta=None):
+    """Generar el informe Excel en modo de memoria constante
+    
+    Usa xlsxwriter con constant_memory: cada fila se escribe en orden y se
+    vuelca a disco al pasar a la siguiente, así la memoria no crece con el
+    tamaño de las hojas. Los formatos de celda se crean una sola vez.
+    
+    detalle: dict opcional nombre de hoja -> DataFrame con datos crudos
+    (p. ej. {'Detalle Leads': df_leads, 'Detalle Matriculados': df_matriculados})
+    para auditoría. Si se indica `ruta` se escribe directamente en ese archivo
+    y se devuelve la ruta; si no, se devuelve un buffer.
+    """
+    import xlsxwriter
+    
+    hojas = _hojas_excel(metrics, projections, program_analysis, comentarios, marca, optimizacion)
+    if detalle:
+        hojas.update(detalle)
+    
+    destino = ruta if ruta is not None else io.BytesIO()
+    workbook = xlsxwriter.Workbook(destino, {'constant_memory': True, 'in_memory': False})
+    formatos = {
+        'encabezado': workbook.add_format({
+            'bold': True,
+            'bg_color': '#4472C4',
+            'font_color': 'white',
+            'border': 1
+        }),
+        'fecha': workbook.add_format({'num_format': 'yyyy-mm-dd'}),
+        'numero': None,
+        'texto': None,
+    }
+    
+    for sheet_name, df in hojas.items():
+        _escribir_hoja_streaming(workbook, sheet_name, df, formatos)
+    
+    workbook.close()
+    
+    if ruta is not None:
+        return ruta
+    destino.seek(0)
+    return destino
+
+def _texto_pdf(valores):
+    """Valores como cadenas representables en latin-1 (la codificación de FPDF)"""
+    return [str(v).encode('latin-1', 'replace').decode('latin-1') for v in valores]
+
+def _tabla_pdf(pdf, df, columnas=None, encabezados=None, anchos=None, ancho_total=190, alto_fila=7,
+               tamano_fuente=9, muestra_ancho=50):
+    """Escribir una tabla en el PDF con saltos de página y encabezado repetido
+    
+    Las columnas se convierten a listas de texto una sola vez y las filas se
+    recorren con zip sobre esas listas (sin iterrows). Si no se indican
+    anchos, se calculan midiendo con get_string_width solo los textos más
+    largos de cada columna y se escalan a ancho_total; los textos que no
+    caben se recortan.
+    """
+    columnas = list(columnas or df.columns)
+    encabezados = list(encabezados or columnas)
+    textos = [_texto_pdf(df[c].to_numpy()) for c in columnas]
+    alineacion = ['C' if pd.api.types.is_numeric_dtype(df[c]) else 'L' for c in columnas]
+    
+    # Anchos a partir de los textos más largos (por número de caracteres)
+    pdf.set_font('Arial', 'B', tamano_fuente)
+    ancho_encabezado = [pdf.get_string_width(e) for e in _texto_pdf(encabezados)]
+    pdf.set_font('Arial', '', tamano_fuente)
+    if anchos is None:
+        anchos = []
+        for j, valores in enumerate(textos):
+            largos = np.fromiter((len(v) for v in valores), dtype=np.int64, count=len(valores))
+            candidatos = np.argsort(largos)[-muestra_ancho:] if len(largos) else []
+            ancho_datos = max([pdf.get_string_width(valores[i]) for i in candidatos], default=0)
+            anchos.append(max(ancho_encabezado[j], ancho_datos) + 4)
+        escala = ancho_total / sum(anchos)
+        anchos = [a * escala for a in anchos]
+    
+    # Recorte de los textos que no caben en su columna
+    ancho_caracter = pdf.get_string_width('n')
+    for j, valores in enumerate(textos):
+        maximo = max(1, int((anchos[j] - 2) / ancho_caracter))
+        largos = [i for i, v in enumerate(valores) if len(v) > maximo]
+        for i in largos:
+            texto = valores[i]
+            while len(texto) > 1 and pdf.get_string_width(texto + '...') > anchos[j] - 2:
+                texto = texto[:-1]
+            valores[i] = texto + '...'
+    
+    def encabezado():
+        pdf.set_font('Arial', 'B', tamano_fuente)
+        for j, texto in enumerate(_texto_pdf(encabezados)):
+            pdf.cell(anchos[j], alto_fila, texto, 1, 0, 'C')
+        pdf.ln(alto_fila)
+        pdf.set_font('Arial', '', tamano_fuente)
+    
+    encabezado()
+    limite = pdf.page_break_trigger
+    ultima = len(columnas) - 1
+    for fila in zip(*textos):
+        if pdf.get_y() + alto_fila > limite:
+            pdf.add_page()
+            encabezado()
+        for j, texto in enumerate(fila):
+            pdf.cell(anchos[j], alto_fila, texto, 1, 1 if j == ultima else 0, alineacion[j])
+
 def generate_pdf(metrics, projections, program_analysis, comentarios, marca):
     """Generar informe en formato PDF"""
+    from fpdf import FPDF
+    from utils.charts import enrollment_histogram, chart_file
+
     pdf = FPDF()
     pdf.add_page()
     
@@ -183,34 +347,46 @@ def generate_pdf(metrics, projections, program_analysis, comentarios, marca):
     pdf.cell(190, 10, f"% Cumplimiento Proyectado: {projections['pct_cumplimiento_proyectado']:.1f}%", 0, 1, 'L')
     pdf.ln(10)
     
+    # Distribución de la simulación (misma imagen que en la presentación)
+    if projections.get('simulacion_matriculas'):
+        grafico = enrollment_histogram(projections['simulacion_matriculas'], metrics['objetivo_matriculas'])
+        pdf.image(chart_file(grafico), w=170, type='PNG')
+        pdf.ln(5)
+    
     # 4. Top 5 Programas
     pdf.set_font('Arial', 'B', 14)
     pdf.cell(190, 10, "Top 5 Programas con Más Matrículas", 0, 1, 'L')
     pdf.ln(5)
     
-    # Crear tabla de top 5 programas
-    pdf.set_font('Arial', 'B', 10)
-    pdf.cell(95, 10, "Programa", 1, 0, 'C')
-    pdf.cell(30, 10, "Leads", 1, 0, 'C')
-    pdf.cell(30, 10, "Matrículas", 1, 0, 'C')
-    pdf.cell(35, 10, "Tasa Conv. (%)", 1, 1, 'C')
-    
     # Asegurarnos que program_analysis['top_matriculas'] sea un DataFrame
     if not isinstance(program_analysis['top_matriculas'], pd.DataFrame):
         df_top_matriculas = pd.DataFrame(program_analysis['top_matriculas'])
     else:
         df_top_matriculas = program_analysis['top_matriculas']
     
-    pdf.set_font('Arial', '', 10)
-    for _, row in df_top_matriculas.iterrows():
-        pdf.cell(95, 10, str(row['Programa']), 1, 0, 'L')
-        pdf.cell(30, 10, str(row['Leads']), 1, 0, 'C')
-        pdf.cell(30, 10, str(row['Matrículas']), 1, 0, 'C')
-        pdf.cell(35, 10, str(row['Tasa Conversión (%)']), 1, 1, 'C')
+    # Crear tabla de top 5 programas
+    if not df_top_matriculas.empty:
+        _tabla_pdf(pdf, df_top_matriculas, columnas=['Programa', 'Leads', 'Matrículas', 'Tasa Conversión (%)'],
+                   encabezados=['Programa', 'Leads', 'Matrículas', 'Tasa Conv. (%)'],
+                   anchos=[95, 30, 30, 35], alto_fila=10, tamano_fuente=10)
     
     pdf.ln(10)
     
-    # 5. Comentarios
+    # 5. Distribución completa por programa
+    if not isinstance(program_analysis['tabla_completa'], pd.DataFrame):
+        df_tabla_completa = pd.DataFrame(program_analysis['tabla_completa'])
+    else:
+        df_tabla_completa = program_analysis['tabla_completa']
+    
+    if not df_tabla_completa.empty:
+        pdf.add_page()
+        pdf.set_font('Arial', 'B', 14)
+        pdf.cell(190, 10, f"Distribución de Resultados por Programa ({len(df_tabla_completa)})", 0, 1, 'L')
+        pdf.ln(5)
+        _tabla_pdf(pdf, df_tabla_completa)
+        pdf.ln(10)
+    
+    # 6. Comentarios
     pdf.set_font('Arial', 'B', 14)
     pdf.cell(190, 10, "Comentarios", 0, 1, 'L')
     pdf.ln(5)
@@ -225,8 +401,22 @@ def generate_pdf(metrics, projections, program_analysis, comentarios, marca):
     
     return buffer
 
-def generate_pptx(metrics, projections, program_analysis, comentarios, marca):
-    """Generar presentación en formato PowerPoint en formato horizontal"""
+def generate_pptx(metrics, projections, program_analysis, comentarios, marca, graficos_nativos=False,
+                  ruta_plantilla=None):
+    """Generar presentación en formato PowerPoint en formato horizontal
+    
+    Por defecto dibuja las barras con formas y cuadros de texto. Con
+    graficos_nativos=True delega en generate_pptx_charts (gráficos editables
+    de python-pptx sobre la plantilla ruta_plantilla).
+    """
+    if graficos_nativos:
+        return generate_pptx_charts(metrics, projections, program_analysis, comentarios, marca, ruta_plantilla)
+
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+    from pptx.dml.color import RGBColor
+    from utils.charts import enrollment_histogram
+
     prs = Presentation()
     
     # Cambiar orientación a horizontal (16:9)
@@ -448,20 +638,21 @@ def generate_pptx(metrics, projections, program_analysis, comentarios, marca):
         text_frame.text = f"{projections[prob_key]:.1f}% prob."
     
     # Agregar imagen de la distribución a la derecha
-    # (Esto requeriría crear y guardar una imagen temporalmente, lo cual es complejo)
-    # En su lugar, añadimos un texto explicativo
-    text_box = slide.shapes.add_textbox(Inches(7), Inches(2), Inches(5), Inches(4))
+    if projections.get('simulacion_matriculas'):
+        grafico = enrollment_histogram(projections['simulacion_matriculas'], metrics['objetivo_matriculas'])
+        slide.shapes.add_picture(io.BytesIO(grafico), Inches(6.8), Inches(1.5), width=Inches(6))
+    
+    text_box = slide.shapes.add_textbox(Inches(7), Inches(5.0), Inches(5.5), Inches(2))
     text_frame = text_box.text_frame
-    p = text_frame.add_paragraph()
-    p.text = "Distribución de Matrículas Proyectadas"
-    p.font.bold = True
-    p.font.size = Pt(14)
+    text_frame.word_wrap = True
     
-    p = text_frame.add_paragraph()
+    p = text_frame.paragraphs[0]
     p.text = f"La simulación Monte Carlo muestra que con un nivel de confianza del 90%, se espera obtener entre {projections['matriculas_proyectadas_min']} y {projections['matriculas_proyectadas_max']} matrículas al cierre de la convocatoria."
+    p.font.size = Pt(12)
     
     p = text_frame.add_paragraph()
     p.text = f"Si el objetivo es {metrics['objetivo_matriculas']} matrículas, la probabilidad de alcanzarlo es del {projections['prob_meta_100']:.1f}%."
+    p.font.size = Pt(12)
     
     # 5. Top 5 Programas
     slide = prs.slides.add_slide(prs.slide_layouts[1])
@@ -600,4 +791,389 @@ def generate_pptx(metrics, projections, program_analysis, comentarios, marca):
     prs.save(buffer)
     buffer.seek(0)
     
-    return buffer 
\ No newline at end of file
+    return buffer
+
+# Plantilla base de las presentaciones (bytes), cargada una vez por proceso
+_PLANTILLAS_PPTX = {}
+
+def _plantilla_pptx(ruta_plantilla=None):
+    """Bytes de la presentación base; se leen o construyen solo la primera vez
+    
+    Sin ruta se usa la plantilla por defecto de python-pptx en formato 16:9.
+    """
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    clave = ruta_plantilla or ''
+    if clave not in _PLANTILLAS_PPTX:
+        if ruta_plantilla:
+            with open(ruta_plantilla, 'rb') as f:
+                _PLANTILLAS_PPTX[clave] = f.read()
+        else:
+            prs = Presentation()
+            prs.slide_width = Inches(13.33)
+            prs.slide_height = Inches(7.5)
+            buffer = io.BytesIO()
+            prs.save(buffer)
+            _PLANTILLAS_PPTX[clave] = buffer.getvalue()
+    return _PLANTILLAS_PPTX[clave]
+
+def _grafico_barras(slide, categorias, series, left, top, width, height, colores=None,
+                    maximo=None, formato='0.0"%"', apiladas=False, leyenda=False):
+    """Gráfico de barras horizontales nativo a partir de arrays
+    
+    series: dict nombre -> valores. colores: lista RGBColor por serie o, con una
+    sola serie, por punto.
+    """
+    from pptx.chart.data import CategoryChartData
+    from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION, XL_LABEL_POSITION
+    from pptx.util import Pt
+    
+    datos = CategoryChartData(number_format=formato)
+    datos.categories = list(categorias)
+    for nombre, valores in series.items():
+        datos.add_series(nombre, [float(v) for v in valores])
+    
+    tipo = XL_CHART_TYPE.BAR_STACKED if apiladas else XL_CHART_TYPE.BAR_CLUSTERED
+    chart = slide.shapes.add_chart(tipo, left, top, width, height, datos).chart
+    chart.has_legend = leyenda
+    if leyenda:
+        chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        chart.legend.include_in_layout = False
+    chart.font.size = Pt(12)
+    
+    plot = chart.plots[0]
+    plot.gap_width = 60
+    if apiladas:
+        plot.overlap = 100
+    plot.has_data_labels = True
+    plot.data_labels.number_format = formato
+    plot.data_labels.number_format_is_linked = False
+    if not apiladas:
+        plot.data_labels.position = XL_LABEL_POSITION.OUTSIDE_END
+    
+    eje = chart.value_axis
+    eje.minimum_scale = 0
+    if maximo is not None:
+        eje.maximum_scale = maximo
+    eje.has_major_gridlines = False
+    eje.visible = False
+    chart.category_axis.reverse_order = True
+    chart.category_axis.format.line.fill.background()
+    
+    if colores is not None:
+        if len(series) == 1:
+            for punto, color in zip(plot.series[0].points, colores):
+                punto.format.fill.solid()
+                punto.format.fill.fore_color.rgb = color
+        else:
+            for serie, color in zip(plot.series, colores):
+                serie.format.fill.solid()
+                serie.format.fill.fore_color.rgb = color
+    return chart
+
+def _tabla_programas(slide, df, color_encabezado):
+    """Tabla de programas (Programa, Leads, Matrículas, Tasa) con columnas leídas como arrays"""
+    from pptx.util import Inches
+    from pptx.dml.color import RGBColor
+
+    if df.empty:
+        slide.placeholders[1].text_frame.text = "No hay datos disponibles para mostrar"
+        return
+    
+    # El marcador de contenido no se usa con la tabla
+    slide.placeholders[1].element.getparent().remove(slide.placeholders[1].element)
+    
+    rows = len(df) + 1
+    table = slide.shapes.add_table(rows, 4, Inches(1), Inches(2), Inches(11), Inches(0.5 * rows)).table
+    for j, ancho in enumerate([6, 1.5, 1.5, 2]):
+        table.columns[j].width = Inches(ancho)
+    
+    encabezados = ["Programa", "Leads", "Matrículas", "Tasa Conv. (%)"]
+    columnas = [df[c].astype(str).to_numpy() for c in ['Programa', 'Leads', 'Matrículas', 'Tasa Conversión (%)']]
+    for j, texto in enumerate(encabezados):
+        cell = table.cell(0, j)
+        cell.text = texto
+        cell.fill.solid()
+        cell.fill.fore_color.rgb = color_encabezado
+        cell.text_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)
+        cell.text_frame.paragraphs[0].font.bold = True
+    for i in range(1, rows):
+        for j in range(4):
+            cell = table.cell(i, j)
+            cell.text = columnas[j][i - 1]
+            if i % 2 == 0:
+                cell.fill.solid()
+                cell.fill.fore_color.rgb = RGBColor(240, 240, 240)
+
+def generate_pptx_charts(metrics, projections, program_analysis, comentarios, marca, ruta_plantilla=None):
+    """Generar presentación en formato PowerPoint en formato horizontal, con gráficos nativos
+    
+    Parte de los bytes de la plantilla (leída una vez por proceso) en lugar de
+    un Presentation() nuevo, y dibuja el avance, la composición y las
+    probabilidades como gráficos de python-pptx alimentados con arrays en
+    lugar de rectángulos y cuadros de texto sueltos.
+    """
+    from pptx import Presentation
+    from pptx.util import Inches
+    from pptx.dml.color import RGBColor
+
+    prs = Presentation(io.BytesIO(_plantilla_pptx(ruta_plantilla)))
+    con_convocatoria = marca in ["GRADO", "UNISUD"] and metrics['tiempo_transcurrido'] is not None
+    
+    # 1. Portada
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    slide.shapes.title.text = f"Reporte Status Semanal - {marca}"
+    slide.placeholders[1].text = f"Fecha: {datetime.now().strftime('%Y-%m-%d')}"
+    
+    # 2. Estado Actual
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "Estado Actual"
+    lineas = []
+    if con_convocatoria:
+        lineas.append(f"Tiempo Transcurrido: {metrics['tiempo_transcurrido']:.1f}%")
+    lineas += [
+        f"Leads Acumulados: {metrics['leads_acumulados']}",
+        f"Matrículas vs Objetivo: {metrics['matriculas_acumuladas']}/{metrics['objetivo_matriculas']}",
+        f"Tasa de Conversión: {metrics['tasa_conversion']:.2f}%",
+        f"Proyección de Cumplimiento: {projections['pct_cumplimiento_proyectado']:.1f}%",
+    ]
+    slide.placeholders[1].text_frame.text = "\n".join(lineas)
+    
+    if con_convocatoria:
+        pct_objetivo = min(100.0, metrics['matriculas_acumuladas'] / max(1, metrics['objetivo_matriculas']) * 100)
+        _grafico_barras(
+            slide, ["Tiempo Transcurrido", "Matrículas vs Objetivo"],
+            {'Avance': [metrics['tiempo_transcurrido'], pct_objetivo]},
+            Inches(7), Inches(1.8), Inches(5.5), Inches(2.5),
+            colores=[RGBColor(0, 112, 192), RGBColor(112, 173, 71)], maximo=100
+        )
+    
+    # 3. Composición de Resultados
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "Composición de Resultados"
+    slide.placeholders[1].text_frame.text = (
+        "Distribución de Matrículas por tipo de Lead:\n\n"
+        f"Leads Nuevos: {metrics['pct_matriculas_nuevos']:.1f}%\n"
+        f"Remarketing: {metrics['pct_matriculas_remarketing']:.1f}%"
+    )
+    _grafico_barras(
+        slide, ["Matrículas"],
+        {'Leads Nuevos': [metrics['pct_matriculas_nuevos']], 'Remarketing': [metrics['pct_matriculas_remarketing']]},
+        Inches(7), Inches(2), Inches(5.5), Inches(2),
+        colores=[RGBColor(0, 112, 192), RGBColor(255, 153, 0)], maximo=100, apiladas=True, leyenda=True
+    )
+    
+    # 4. Estimación de Cierre
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "Estimación de Cierre"
+    slide.placeholders[1].text_frame.text = (
+        f"Leads Proyectados: {projections['leads_proyectados']} ± {int(projections['leads_proyectados_std'])}\n"
+        f"Matrículas Proyectadas: {projections['matriculas_proyectadas_mean']} ± {int(projections['matriculas_proyectadas_std'])}\n"
+        f"Intervalo 90% Confianza: {projections['matriculas_proyectadas_min']} - {projections['matriculas_proyectadas_max']}\n\n"
+        f"Si el objetivo es {metrics['objetivo_matriculas']} matrículas, la probabilidad de alcanzarlo es del {projections['prob_meta_100']:.1f}%."
+    )
+    
+    umbrales = np.array([80, 90, 100, 110, 120])
+    probabilidades = np.array([projections[f'prob_meta_{u}'] for u in umbrales], dtype=float)
+    colores = [RGBColor(112, 173, 71) if p >= 75 else RGBColor(255, 192, 0) if p >= 50 else RGBColor(237, 125, 49)
+               for p in probabilidades]
+    _grafico_barras(
+        slide, [f"{u}% del Objetivo" for u in umbrales], {'Probabilidad': probabilidades},
+        Inches(7), Inches(1.8), Inches(5.5), Inches(4.5), colores=colores, maximo=100
+    )
+    
+    # 5. Distribución simulada de matrículas (gráfico Agg en caché)
+    if projections.get('simulacion_matriculas'):
+        from utils.charts import enrollment_histogram
+
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = "Distribución de Matrículas Proyectadas"
+        grafico = enrollment_histogram(projections['simulacion_matriculas'], metrics['objetivo_matriculas'])
+        slide.shapes.add_picture(io.BytesIO(grafico), Inches(2.4), Inches(1.5), width=Inches(8.5))
+    
+    # 6-7. Tablas de programas
+    for clave, titulo, color in [('top_matriculas', "Top 5 Programas con Más Matrículas", RGBColor(0, 112, 192)),
+                                 ('menor_conversion', "Programas con Menor Conversión", RGBColor(192, 0, 0))]:
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = titulo
+        df = program_analysis[clave]
+        if not isinstance(df, pd.DataFrame):
+            df = pd.DataFrame(df)
+        _tabla_programas(slide, df, color)
+    
+    # 8. Comentarios
+    if comentarios and comentarios.strip():
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = "Comentarios"
+        slide.placeholders[1].text_frame.text = comentarios
+    
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+GENERADORES = {
+    'excel': generate_excel,
+    'pdf': generate_pdf,
+    'pptx': generate_pptx,
+}
+
+EXTENSIONES = {'excel': 'xlsx', 'pdf': 'pdf', 'pptx': 'pptx'}
+
+def report_filename(marca, formato, fecha=None):
+    """Nombre del archivo de reporte de una marca, común al lote, al ZIP y a la app"""
+    fecha = fecha or datetime.now().strftime('%Y%m%d')
+    return f"reporte_{marca.lower()}_{fecha}.{EXTENSIONES[formato]}"
+
+def _render_formato(formato, argumentos):
+    """Generar un formato en un proceso del pool; devuelve bytes para no enviar el BytesIO"""
+    inicio = time.perf_counter()
+    buffer = GENERADORES[formato](*argumentos)
+    return formato, buffer.getvalue(), time.perf_counter() - inicio
+
+def export_reports(metrics, projections, program_analysis, comentarios, marca,
+                   formatos=('excel', 'pdf', 'pptx'), executor=None, max_workers=None, optimizacion=None):
+    """Generar varios formatos de reporte en paralelo en un pool de procesos
+
+    python-pptx y fpdf consumen CPU, así que cada formato se genera en un
+    proceso distinto. Se puede pasar un executor existente para reutilizarlo
+    entre marcas; si no, se crea uno temporal. optimizacion (resultado de
+    optimize_budget_allocation) se agrega como hoja del Excel. Devuelve los
+    buffers por formato y los tiempos de cada uno (segundos) junto con el total.
+    """
+    desconocidos = [f for f in formatos if f not in GENERADORES]
+    if desconocidos:
+        raise ValueError(f"Formatos no soportados: {desconocidos}")
+
+    argumentos = (metrics, projections, program_analysis, comentarios, marca)
+    inicio = time.perf_counter()
+
+    propio = executor is None
+    if propio:
+        executor = ProcessPoolExecutor(max_workers=max_workers or len(formatos))
+    try:
+        futuros = [
+            executor.submit(_render_formato, formato,
+                            argumentos + (optimizacion,) if formato == 'excel' and optimizacion is not None else argumentos)
+            for formato in formatos
+        ]
+        resultados = [futuro.result() for futuro in futuros]
+    finally:
+        if propio:
+            executor.shutdown()
+
+    return {
+        'marca': marca,
+        'buffers': {formato: io.BytesIO(contenido) for formato, contenido, _ in resultados},
+        'tiempos': {formato: tiempo for formato, _, tiempo in resultados},
+        'total': time.perf_counter() - inicio,
+    }
+
+def export_reports_batch(trabajos, formatos=('excel', 'pdf', 'pptx'), max_workers=None, max_en_vuelo=None):
+    """Generar los reportes de muchas marcas con memoria acotada
+
+    trabajos es un iterable de tuplas (metrics, projections, program_analysis,
+    comentarios, marca) que se consume de forma perezosa. Nunca hay más de
+    max_en_vuelo formatos pendientes (por defecto dos por proceso), y cada
+    marca se entrega con yield apenas terminan todos sus formatos, así los
+    buffers ya entregados pueden liberarse mientras avanza el lote.
+    """
+    desconocidos = [f for f in formatos if f not in GENERADORES]
+    if desconocidos:
+        raise ValueError(f"Formatos no soportados: {desconocidos}")
+
+    max_workers = max_workers or os.cpu_count() or 1
+    limite = max_en_vuelo or 2 * max_workers
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        trabajos = iter(trabajos)
+        pendientes = {}
+        parciales = {}
+        agotado = False
+
+        while True:
+            # Enviar trabajos hasta llenar el cupo
+            while not agotado and len(pendientes) + len(formatos) <= max(limite, len(formatos)):
+                try:
+                    argumentos = tuple(next(trabajos))
+                except StopIteration:
+                    agotado = True
+                    break
+                marca = argumentos[4]
+                parciales[marca] = {'inicio': time.perf_counter(), 'faltan': len(formatos), 'buffers': {}, 'tiempos': {}}
+                for formato in formatos:
+                    pendientes[executor.submit(_render_formato, formato, argumentos)] = marca
+
+            if not pendientes:
+                break
+
+            listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                marca = pendientes.pop(futuro)
+                formato, contenido, tiempo = futuro.result()
+                parcial = parciales[marca]
+                parcial['buffers'][formato] = io.BytesIO(contenido)
+                parcial['tiempos'][formato] = tiempo
+                parcial['faltan'] -= 1
+                if parcial['faltan'] == 0:
+                    del parciales[marca]
+                    yield {
+                        'marca': marca,
+                        'buffers': parcial['buffers'],
+                        'tiempos': parcial['tiempos'],
+                        'total': time.perf_counter() - parcial['inicio'],
+                    }
+
+# Extensiones que ya son contenedores comprimidos: se guardan sin volver a comprimir
+_SIN_COMPRIMIR = ('.xlsx', '.pptx', '.png', '.zip')
+
+def write_zip_bundle(entradas, destino=None):
+    """Escribir un ZIP agregando los archivos a medida que llegan
+
+    entradas es un iterable (puede ser un generador) de tuplas (nombre,
+    contenido), donde contenido son bytes, un archivo binario (BytesIO o
+    abierto en disco) o una función sin argumentos que devuelve cualquiera de
+    ellos; los archivos se copian por bloques y cada uno se libera antes de
+    pedir el siguiente. destino es una ruta o un archivo binario; por defecto
+    un archivo temporal, así el ZIP no crece en memoria con el número de
+    marcas. xlsx y pptx ya vienen comprimidos y se guardan tal cual.
+    """
+    destino = tempfile.TemporaryFile() if destino is None else destino
+    with zipfile.ZipFile(destino, 'w') as archivo_zip:
+        for nombre, contenido in entradas:
+            if callable(contenido):
+                contenido = contenido()
+            compresion = zipfile.ZIP_STORED if nombre.lower().endswith(_SIN_COMPRIMIR) else zipfile.ZIP_DEFLATED
+            if isinstance(contenido, (bytes, bytearray)):
+                archivo_zip.writestr(nombre, contenido, compress_type=compresion)
+                continue
+            info = zipfile.ZipInfo(nombre, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = compresion
+            contenido.seek(0)
+            with archivo_zip.open(info, 'w') as archivo:
+                shutil.copyfileobj(contenido, archivo)
+    if not isinstance(destino, (str, os.PathLike)):
+        destino.seek(0)
+    return destino
+
+def export_reports_bundle(trabajos, formatos=('excel', 'pdf', 'pptx'), destino=None, max_workers=None,
+                          max_en_vuelo=None):
+    """Un ZIP con todos los formatos de todas las marcas, armado mientras se generan
+
+    Consume export_reports_batch, así que cada marca se agrega al ZIP apenas
+    termina y sus buffers se liberan. Devuelve el destino y los tiempos por marca.
+    """
+    fecha = datetime.now().strftime('%Y%m%d')
+    tiempos = {}
+
+    def entradas():
+        for resultado in export_reports_batch(trabajos, formatos, max_workers, max_en_vuelo):
+            marca = resultado['marca']
+            tiempos[marca] = resultado['total']
+            for formato in formatos:
+                yield (f"{marca.lower()}/{report_filename(marca, formato, fecha)}",
+                       resultado['buffers'].pop(formato))
+
+    destino = write_zip_bundle(entradas(), destino)
+    return {'destino': destino, 'tiempos': tiempos}
@@ -0,0 +1,286 @@
+# utils/sketches.py
+
+import os
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+from utils.data_processor import pack_lead_ids
+
+# Claves de hash (16 bytes) de cada fila del count-min
+SEMILLAS_COUNT_MIN = ['cmsketch-fila-00', 'cmsketch-fila-01', 'cmsketch-fila-02', 'cmsketch-fila-03',
+                      'cmsketch-fila-04', 'cmsketch-fila-05', 'cmsketch-fila-06', 'cmsketch-fila-07']
+
+def _bits_significativos(valores):
+    """Número de bits significativos de enteros < 2**32 (0 para el cero), exacto vía frexp"""
+    _, exponente = np.frexp(valores.astype(np.float64))
+    return exponente.astype(np.int64)
+
+def _ceros_iniciales(valores):
+    """Ceros a la izquierda de enteros uint64, separando en dos mitades de 32 bits
+
+    Cada mitad cabe exactamente en un float64, así que no hay errores de
+    redondeo como al aplicar log2 al número completo.
+    """
+    alta = valores >> np.uint64(32)
+    baja = valores & np.uint64(0xFFFFFFFF)
+    return np.where(alta > 0, 32 - _bits_significativos(alta), 64 - _bits_significativos(baja))
+
+def create_lead_sketches(precision=11, ancho_count_min=2048, profundidad_count_min=4):
+    """Estructura vacía de sketches de leads
+
+    - HyperLogLog (2**precision registros) por (Marca, Programa, día) para
+      contar 'ID lead' distintos; error típico 1.04 / sqrt(2**precision).
+      Cada fila empieza dispersa (solo los registros ocupados, en 'dispersos'
+      y 'rangos') y pasa a la matriz densa 'registros' cuando así ocupa menos;
+      'densas' da la fila densa de cada clave o -1.
+    - Count-min (profundidad x ancho) con la frecuencia de cada (Marca, Programa).
+    """
+    if not 4 <= precision <= 16:
+        raise ValueError("La precisión del HyperLogLog debe estar entre 4 y 16")
+    if profundidad_count_min > len(SEMILLAS_COUNT_MIN):
+        raise ValueError(f"La profundidad del count-min no puede superar {len(SEMILLAS_COUNT_MIN)}")
+    return {
+        'precision': precision,
+        'claves': pd.DataFrame({'Marca': pd.Series(dtype=object), 'Programa': pd.Series(dtype=object),
+                                'Día': pd.Series(dtype=np.int64)}),
+        'densas': np.zeros(0, dtype=np.int64),
+        'registros': np.zeros((0, 2 ** precision), dtype=np.uint8),
+        'dispersos': np.zeros(0, dtype=np.int64),
+        'rangos': np.zeros(0, dtype=np.uint8),
+        'count_min': np.zeros((profundidad_count_min, ancho_count_min), dtype=np.int64),
+    }
+
+def _agregar_registros(sketches, fila, registro, rango):
+    """Máximo de rango por (fila, registro) sobre la parte densa y la dispersa
+
+    Las entradas dispersas se guardan ordenadas como fila << precision |
+    registro. Una fila con más de m/8 registros ocupados ya ocupa más en forma
+    dispersa (9 bytes por entrada) que densa (1 byte por registro) y se mueve
+    a la matriz densa, que crece al doble cuando se llena.
+    """
+    precision = sketches['precision']
+    m = 1 << precision
+    densa = sketches['densas'][fila]
+    en_densa = densa >= 0
+    np.maximum.at(sketches['registros'], (densa[en_densa], registro[en_densa]), rango[en_densa])
+    if en_densa.all():
+        return
+
+    codigo = np.concatenate([sketches['dispersos'], (fila[~en_densa] << precision) | registro[~en_densa]])
+    rangos = np.concatenate([sketches['rangos'], rango[~en_densa]])
+    codigo, inversa = np.unique(codigo, return_inverse=True)
+    maximo = np.zeros(len(codigo), dtype=np.uint8)
+    np.maximum.at(maximo, inversa, rangos)
+
+    fila_codigo = codigo >> precision
+    promover = np.flatnonzero(np.bincount(fila_codigo, minlength=len(sketches['densas'])) > m // 8)
+    if len(promover):
+        usadas = int((sketches['densas'] >= 0).sum())
+        if usadas + len(promover) > len(sketches['registros']):
+            capacidad = max(2 * len(sketches['registros']), usadas + len(promover), 16)
+            registros = np.zeros((capacidad, m), dtype=np.uint8)
+            registros[:usadas] = sketches['registros'][:usadas]
+            sketches['registros'] = registros
+        sketches['densas'][promover] = usadas + np.arange(len(promover))
+        sale = sketches['densas'][fila_codigo] >= 0
+        sketches['registros'][sketches['densas'][fila_codigo[sale]], codigo[sale] & (m - 1)] = maximo[sale]
+        codigo, maximo = codigo[~sale], maximo[~sale]
+
+    sketches['dispersos'] = codigo
+    sketches['rangos'] = maximo
+
+def _entradas_registros(sketches):
+    """Todos los registros ocupados como arrays (fila, registro, rango)"""
+    precision = sketches['precision']
+    filas_densas = np.flatnonzero(sketches['densas'] >= 0)
+    densos = sketches['registros'][sketches['densas'][filas_densas]]
+    posicion, registro = np.nonzero(densos)
+    return (
+        np.concatenate([filas_densas[posicion], sketches['dispersos'] >> precision]),
+        np.concatenate([registro, sketches['dispersos'] & ((1 << precision) - 1)]),
+        np.concatenate([densos[posicion, registro], sketches['rangos']]),
+    )
+
+def _acumular_registros(sketches, grupo_fila, num_grupos):
+    """Registros densos por grupo: máximo de las filas de cada grupo (-1 excluye la fila)"""
+    precision = sketches['precision']
+    registros = np.zeros((num_grupos, 1 << precision), dtype=np.uint8)
+
+    filas = np.flatnonzero((grupo_fila >= 0) & (sketches['densas'] >= 0))
+    np.maximum.at(registros, grupo_fila[filas], sketches['registros'][sketches['densas'][filas]])
+
+    grupo = grupo_fila[sketches['dispersos'] >> precision]
+    en_grupo = grupo >= 0
+    np.maximum.at(registros, (grupo[en_grupo], sketches['dispersos'][en_grupo] & ((1 << precision) - 1)),
+                  sketches['rangos'][en_grupo])
+    return registros
+
+def _celdas_count_min(etiquetas, profundidad, ancho):
+    """Columna de cada etiqueta en cada fila del count-min (profundidad x n)"""
+    etiquetas = np.asarray(etiquetas, dtype=object)
+    return np.vstack([
+        pd.util.hash_array(etiquetas, hash_key=SEMILLAS_COUNT_MIN[i], categorize=True) % np.uint64(ancho)
+        for i in range(profundidad)
+    ]).astype(np.int64)
+
+def update_lead_sketches(sketches, chunk):
+    """Agregar un bloque de leads (ID lead, Fecha ingreso, Marca, Programa) a los sketches
+
+    Pensado para procesar el histórico por bloques: la memoria depende del
+    número de (Marca, Programa, día) y de sus registros ocupados, no del
+    número de leads.
+    """
+    precision = sketches['precision']
+    fechas = pd.to_datetime(chunk['Fecha ingreso'], errors='coerce').to_numpy(dtype='datetime64[D]')
+    claves_id = pack_lead_ids(chunk['ID lead'])
+    validos = ~np.isnat(fechas) & (claves_id != 0) & chunk['Marca'].notna().to_numpy() & chunk['Programa'].notna().to_numpy()
+    if not validos.any():
+        return sketches
+
+    marca = chunk['Marca'].to_numpy(dtype=object)[validos].astype(str)
+    programa = chunk['Programa'].to_numpy(dtype=object)[validos].astype(str)
+    dia = fechas[validos].astype(np.int64)
+    claves_id = claves_id[validos]
+
+    # Fila de registros de cada (Marca, Programa, día), agregando las nuevas
+    existentes = pd.MultiIndex.from_frame(sketches['claves'])
+    entrantes = pd.MultiIndex.from_arrays([marca, programa, dia])
+    fila = existentes.get_indexer(entrantes) if len(existentes) else np.full(len(entrantes), -1)
+    if (fila < 0).any():
+        nuevas = entrantes[fila < 0].unique()
+        sketches['claves'] = pd.concat([sketches['claves'], nuevas.to_frame(index=False, name=['Marca', 'Programa', 'Día'])],
+                                       ignore_index=True)
+        sketches['densas'] = np.concatenate([sketches['densas'], np.full(len(nuevas), -1, dtype=np.int64)])
+        fila = pd.MultiIndex.from_frame(sketches['claves']).get_indexer(entrantes)
+
+    # HyperLogLog: los primeros `precision` bits eligen el registro y el
+    # resto aporta la posición del primer 1
+    registro = (claves_id >> np.uint64(64 - precision)).astype(np.int64)
+    resto = claves_id << np.uint64(precision)
+    rango = np.minimum(_ceros_iniciales(resto) + 1, 64 - precision + 1).astype(np.uint8)
+    _agregar_registros(sketches, fila.astype(np.int64), registro, rango)
+
+    # Count-min de frecuencias por (Marca, Programa)
+    profundidad, ancho = sketches['count_min'].shape
+    celdas = _celdas_count_min(np.char.add(np.char.add(marca, '|'), programa), profundidad, ancho)
+    for i in range(profundidad):
+        sketches['count_min'][i] += np.bincount(celdas[i], minlength=ancho)
+
+    return sketches
+
+def build_lead_sketches(chunks, precision=11, ancho_count_min=2048, profundidad_count_min=4):
+    """Construir los sketches recorriendo un iterable de DataFrames de leads"""
+    sketches = create_lead_sketches(precision, ancho_count_min, profundidad_count_min)
+    for chunk in chunks:
+        update_lead_sketches(sketches, chunk)
+    return sketches
+
+def merge_sketches(a, b):
+    """Unir dos sketches (días o marcas distintas): máximo de registros y suma del count-min"""
+    if a['precision'] != b['precision'] or a['count_min'].shape != b['count_min'].shape:
+        raise ValueError("Solo se pueden unir sketches con la misma precisión y dimensiones")
+
+    claves = pd.concat([a['claves'], b['claves']], ignore_index=True)
+    codigos, unicas = pd.MultiIndex.from_frame(claves).factorize()
+
+    profundidad, ancho = a['count_min'].shape
+    resultado = create_lead_sketches(a['precision'], ancho, profundidad)
+    resultado['claves'] = unicas.to_frame(index=False, name=['Marca', 'Programa', 'Día'])
+    resultado['densas'] = np.full(len(unicas), -1, dtype=np.int64)
+    for sketch, filas in [(a, codigos[:len(a['claves'])]), (b, codigos[len(a['claves']):])]:
+        fila, registro, rango = _entradas_registros(sketch)
+        _agregar_registros(resultado, np.asarray(filas, dtype=np.int64)[fila], registro, rango)
+    resultado['count_min'] = a['count_min'] + b['count_min']
+
+    return resultado
+
+def save_sketches(sketches, ruta):
+    """Guardar los sketches en un .npz comprimido (junto a los datos de origen)"""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    claves = sketches['claves']
+    np.savez_compressed(
+        ruta,
+        precision=np.int64(sketches['precision']),
+        marca=claves['Marca'].to_numpy(dtype=str),
+        programa=claves['Programa'].to_numpy(dtype=str),
+        dia=claves['Día'].to_numpy(dtype=np.int64),
+        densas=sketches['densas'],
+        registros=sketches['registros'][:int((sketches['densas'] >= 0).sum())],
+        dispersos=sketches['dispersos'],
+        rangos=sketches['rangos'],
+        count_min=sketches['count_min'],
+    )
+
+def load_sketches(ruta):
+    """Leer sketches guardados con save_sketches
+
+    Los archivos anteriores a los registros dispersos traen una fila densa
+    por clave y se leen como tales.
+    """
+    with np.load(ruta, allow_pickle=False) as datos:
+        registros = datos['registros']
+        if 'densas' in datos:
+            densas, dispersos, rangos = datos['densas'], datos['dispersos'], datos['rangos']
+        else:
+            densas = np.arange(len(registros), dtype=np.int64)
+            dispersos, rangos = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        return {
+            'precision': int(datos['precision']),
+            'claves': pd.DataFrame({'Marca': datos['marca'].astype(object), 'Programa': datos['programa'].astype(object),
+                                    'Día': datos['dia']}),
+            'densas': densas,
+            'registros': registros,
+            'dispersos': dispersos,
+            'rangos': rangos,
+            'count_min': datos['count_min'],
+        }
+
+def _estimar_hll(registros):
+    """Estimación HyperLogLog por fila, con conteo lineal para cardinalidades bajas"""
+    m = registros.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    bruta = alpha * m * m / np.ldexp(1.0, -registros.astype(np.int64)).sum(axis=1)
+    ceros = (registros == 0).sum(axis=1)
+    with np.errstate(divide='ignore'):
+        lineal = m * np.log(m / np.maximum(ceros, 1))
+    return np.where((bruta <= 2.5 * m) & (ceros > 0), lineal, bruta)
+
+def unique_leads(sketches, dias=90, fecha_corte=None, por=('Marca', 'Programa')):
+    """Leads distintos en los últimos `dias` días hasta fecha_corte, agrupados por `por`
+
+    Une los registros de todos los días de la ventana de cada grupo (máximo
+    por registro) y estima la cardinalidad; un lead activo varios días cuenta
+    una sola vez.
+    """
+    por = list(por)
+    if fecha_corte is None:
+        fecha_corte = datetime.now()
+    corte = np.datetime64(pd.Timestamp(fecha_corte), 'D').astype(np.int64)
+
+    claves = sketches['claves']
+    en_ventana = ((claves['Día'] > corte - dias) & (claves['Día'] <= corte)).to_numpy()
+    if not en_ventana.any():
+        return pd.DataFrame(columns=por + ['Leads Únicos'])
+
+    seleccion = claves[en_ventana]
+    if por:
+        codigos, grupos = pd.MultiIndex.from_frame(seleccion[por]).factorize()
+    else:
+        codigos, grupos = np.zeros(len(seleccion), dtype=np.int64), None
+    num_grupos = int(codigos.max()) + 1
+    grupo_fila = np.full(len(claves), -1, dtype=np.int64)
+    grupo_fila[en_ventana] = codigos
+    registros = _acumular_registros(sketches, grupo_fila, num_grupos)
+
+    resultado = grupos.to_frame(index=False, name=por) if por else pd.DataFrame(index=[0])
+    resultado['Leads Únicos'] = np.round(_estimar_hll(registros)).astype(np.int64)
+    return resultado.sort_values('Leads Únicos', ascending=False).reset_index(drop=True)
+
+def program_frequency(sketches, marca, programa):
+    """Frecuencia estimada (cota superior del count-min) de leads de un (Marca, Programa)"""
+    profundidad, ancho = sketches['count_min'].shape
+    celdas = _celdas_count_min([f'{marca}|{programa}'], profundidad, ancho)[:, 0]
+    return int(sketches['count_min'][np.arange(profundidad), celdas].min())
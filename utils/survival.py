@@ -0,0 +1,207 @@
+# utils/survival.py
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+def _dias(fechas):
+    """Convertir una serie de fechas a días enteros (NaT -> -1)"""
+    valores = pd.to_datetime(fechas, errors='coerce').to_numpy(dtype='datetime64[D]')
+    dias = valores.astype(np.int64)
+    return np.where(np.isnat(valores), -1, dias)
+
+def build_lag_data(df_matriculados, df_leads, fecha_corte=None, columna_grupo=None):
+    """Construir duraciones (días) y eventos para el análisis de supervivencia
+
+    Las matrículas aportan eventos con duración Fecha matrícula - Fecha ingreso.
+    Los leads activos que aún no se matriculan quedan censurados con la edad
+    que tienen a la fecha de corte. Devuelve arrays de duración, evento y
+    código de grupo, junto con las etiquetas de los grupos.
+    """
+    if fecha_corte is None:
+        fecha_corte = datetime.now()
+    corte = np.datetime64(pd.Timestamp(fecha_corte).normalize(), 'D').astype(np.int64)
+
+    # Eventos: matrículas con ambas fechas válidas
+    ingreso_m = _dias(df_matriculados['Fecha ingreso']) if 'Fecha ingreso' in df_matriculados.columns else np.full(len(df_matriculados), -1)
+    matricula = _dias(df_matriculados['Fecha matrícula']) if 'Fecha matrícula' in df_matriculados.columns else np.full(len(df_matriculados), -1)
+    validos_m = (ingreso_m >= 0) & (matricula >= 0)
+    lag_m = np.maximum(matricula - ingreso_m, 0)
+
+    # Censurados: leads activos que no aparecen como matriculados
+    ingreso_l = _dias(df_leads['Fecha ingreso']) if 'Fecha ingreso' in df_leads.columns else np.full(len(df_leads), -1)
+    abiertos = ingreso_l >= 0
+    if 'ID lead' in df_leads.columns and 'ID lead' in df_matriculados.columns:
+        abiertos &= ~df_leads['ID lead'].isin(df_matriculados['ID lead']).to_numpy()
+    if 'Estado actual' in df_leads.columns:
+        abiertos &= (df_leads['Estado actual'] != 'Matriculado').to_numpy()
+    edad_l = np.maximum(corte - ingreso_l, 0)
+
+    duraciones = np.concatenate([lag_m[validos_m], edad_l[abiertos]])
+    eventos = np.concatenate([np.ones(validos_m.sum(), dtype=bool), np.zeros(abiertos.sum(), dtype=bool)])
+
+    if columna_grupo is None:
+        codigos = np.zeros(len(duraciones), dtype=np.int64)
+        etiquetas = np.array(['Todos'], dtype=object)
+    else:
+        columnas = [columna_grupo] if isinstance(columna_grupo, str) else list(columna_grupo)
+        grupos = pd.concat([
+            df_matriculados.loc[validos_m, columnas],
+            df_leads.loc[abiertos, columnas]
+        ], ignore_index=True)
+        if len(columnas) == 1:
+            codigos, etiquetas = pd.factorize(grupos[columnas[0]])
+        else:
+            codigos, etiquetas = pd.MultiIndex.from_frame(grupos).factorize()
+        codigos = np.asarray(codigos, dtype=np.int64)
+        # Filas sin grupo (NaN) no participan
+        validos = codigos >= 0
+        duraciones, eventos, codigos = duraciones[validos], eventos[validos], codigos[validos]
+
+    return duraciones, eventos, codigos, etiquetas
+
+def lag_histograms(duraciones, eventos, codigos, num_grupos, max_dias=None):
+    """Histograma de días hasta la matrícula por grupo (matriz grupos x días)"""
+    lags = duraciones[eventos]
+    grupos = codigos[eventos]
+    if max_dias is None:
+        max_dias = int(lags.max()) if len(lags) else 0
+    lags = np.minimum(lags, max_dias)
+    plano = np.bincount(grupos * (max_dias + 1) + lags, minlength=num_grupos * (max_dias + 1))
+    return plano.reshape(num_grupos, max_dias + 1)
+
+def kaplan_meier(duraciones, eventos, codigos, num_grupos, max_dias=None):
+    """Curva Kaplan-Meier de conversión por grupo con bincount/cumsum
+
+    Devuelve la supervivencia S[g, t] = P(no matricularse hasta el día t) para
+    t = 0..max_dias y el número en riesgo por día. La probabilidad acumulada de
+    conversión es 1 - S.
+    """
+    if max_dias is None:
+        max_dias = int(duraciones.max()) if len(duraciones) else 0
+    duraciones = np.minimum(duraciones, max_dias)
+    ancho = max_dias + 1
+
+    indice = codigos * ancho + duraciones
+    total = num_grupos * ancho
+    eventos_dia = np.bincount(indice[eventos], minlength=total).reshape(num_grupos, ancho)
+    salidas_dia = np.bincount(indice, minlength=total).reshape(num_grupos, ancho)
+
+    # En riesgo al inicio del día t: todos los que salen en t o después
+    en_riesgo = np.cumsum(salidas_dia[:, ::-1], axis=1)[:, ::-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        riesgo = np.where(en_riesgo > 0, eventos_dia / np.maximum(en_riesgo, 1), 0.0)
+    supervivencia = np.cumprod(1 - riesgo, axis=1)
+
+    return supervivencia, en_riesgo
+
+def analyze_enrollment_lag(df_matriculados, df_leads, fecha_corte=None, max_dias=None):
+    """Analizar el tiempo hasta la matrícula por marca y por programa
+
+    Devuelve un diccionario con histogramas y curvas de conversión acumulada
+    (1 - Kaplan-Meier) por marca y por (marca, programa), listos para ponderar
+    los leads abiertos con probabilidad_conversion_restante. Por defecto las
+    curvas llegan hasta la mayor duración observada.
+    """
+    result = {}
+
+    for nivel, columna in [('marca', 'Marca'), ('programa', ['Marca', 'Programa'])]:
+        duraciones, eventos, codigos, etiquetas = build_lag_data(
+            df_matriculados, df_leads, fecha_corte, columna_grupo=columna
+        )
+        num_grupos = len(etiquetas)
+        supervivencia, en_riesgo = kaplan_meier(duraciones, eventos, codigos, num_grupos, max_dias)
+
+        result[nivel] = {
+            'etiquetas': etiquetas,
+            'histograma': lag_histograms(duraciones, eventos, codigos, num_grupos, max_dias),
+            'supervivencia': supervivencia,
+            'conversion_acumulada': 1 - supervivencia,
+            'en_riesgo': en_riesgo,
+        }
+
+    # Resumen legible por marca
+    hist = result['marca']['histograma']
+    conversion = result['marca']['conversion_acumulada']
+    dias = np.arange(hist.shape[1])
+    total = hist.sum(axis=1)
+    mediana = (np.cumsum(hist, axis=1) >= (total[:, None] / 2)).argmax(axis=1)
+    result['resumen'] = pd.DataFrame({
+        'Marca': result['marca']['etiquetas'],
+        'Matrículas': total,
+        'Días promedio a matrícula': np.round((hist * dias).sum(axis=1) / np.maximum(total, 1), 1),
+        'Días mediana a matrícula': np.where(total > 0, mediana, np.nan),
+        'Conversión acumulada 30 días (%)': np.round(conversion[:, min(30, conversion.shape[1] - 1)] * 100, 2),
+    })
+
+    return result
+
+def _riesgo_cola(supervivencia, ventana=30):
+    """Riesgo diario medio del último tramo de cada curva
+
+    Se mide sobre los últimos `ventana` días antes del final de la curva; el
+    último día se excluye porque acumula las duraciones recortadas a max_dias.
+    """
+    fin = supervivencia.shape[1] - 2
+    inicio = max(fin - ventana, 0)
+    if fin <= inicio:
+        return np.zeros(supervivencia.shape[0])
+    s_inicio = supervivencia[:, inicio]
+    s_fin = supervivencia[:, fin]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        razon = np.where(s_inicio > 0, s_fin / s_inicio, 1.0)
+    return 1 - razon ** (1 / (fin - inicio))
+
+def probabilidad_conversion_restante(supervivencia, codigos, edades, horizonte, ventana=30):
+    """Probabilidad de que un lead abierto se matricule dentro del horizonte
+
+    P(matrícula antes de edad + horizonte | no matriculado a la edad actual)
+    = (S(edad) - S(edad + horizonte)) / S(edad), evaluada para todos los leads
+    a la vez. codigos indica la fila de supervivencia de cada lead. Más allá del
+    final de la curva se prolonga el riesgo diario de su último tramo, de modo
+    que los leads más antiguos que la curva no quedan con probabilidad cero.
+    """
+    max_dia = supervivencia.shape[1] - 1
+    edades = np.maximum(np.asarray(edades, dtype=np.int64), 0)
+    fin = edades + np.maximum(np.asarray(horizonte, dtype=np.int64), 0)
+    persistencia = 1 - _riesgo_cola(supervivencia, ventana)[codigos]
+
+    def _s(dias):
+        dentro = np.minimum(dias, max_dia)
+        return supervivencia[codigos, dentro] * persistencia ** (dias - dentro)
+
+    s_actual = _s(edades)
+    s_final = _s(fin)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prob = np.where(s_actual > 0, (s_actual - s_final) / s_actual, 0.0)
+    return np.clip(prob, 0, 1)
+
+def expected_conversions_open_leads(df_matriculados, df_leads, fecha_fin, fecha_corte=None,
+                                    max_dias=None, columna_grupo='Marca'):
+    """Matrículas esperadas de los leads abiertos antes de la fecha de fin
+
+    Pondera cada lead abierto por su probabilidad de conversión restante según
+    la curva de su grupo. Devuelve el total esperado y el detalle por grupo.
+    """
+    if fecha_corte is None:
+        fecha_corte = datetime.now()
+    duraciones, eventos, codigos, etiquetas = build_lag_data(
+        df_matriculados, df_leads, fecha_corte, columna_grupo=columna_grupo
+    )
+    supervivencia, _ = kaplan_meier(duraciones, eventos, codigos, len(etiquetas), max_dias)
+
+    horizonte = max(0, (pd.Timestamp(fecha_fin) - pd.Timestamp(fecha_corte)).days)
+    abiertos = ~eventos
+    prob = probabilidad_conversion_restante(supervivencia, codigos[abiertos], duraciones[abiertos], horizonte)
+
+    esperado = np.bincount(codigos[abiertos], weights=prob, minlength=len(etiquetas))
+    abiertos_grupo = np.bincount(codigos[abiertos], minlength=len(etiquetas))
+
+    detalle = pd.DataFrame({
+        'Grupo': list(etiquetas),
+        'Leads abiertos': abiertos_grupo,
+        'Matrículas esperadas': np.round(esperado, 1)
+    })
+
+    return {'matriculas_esperadas': float(esperado.sum()), 'detalle': detalle}